@@ -0,0 +1,164 @@
+import csv
+import fnmatch
+import json
+import os
+import re
+from utils import split_extension
+
+# Champs de métadonnées qu'une règle ou une surcharge CSV peut fournir
+METADATA_FIELDS = ('prefix', 'source', 'year', 'scale')
+
+# Colonnes du rapport des groupes à vérifier manuellement
+REVIEW_COLUMNS = ['folder', 'base_name', 'files', 'reason']
+
+
+def to_relative_key(path, root):
+    """
+    Convertit un chemin en clé relative au dossier racine, avec des séparateurs '/'.
+    Les chemins déjà relatifs sont considérés comme relatifs à la racine.
+    """
+    relative = os.path.relpath(path, root) if os.path.isabs(path) else os.path.normpath(path)
+    relative = relative.replace('\\', '/').strip('/')
+    return '' if relative == '.' else relative
+
+
+class BatchRules:
+    """
+    Règles de métadonnées pour le mode batch, chargées depuis un fichier JSON et/ou un CSV de surcharges.
+
+    Le fichier JSON a la forme suivante (toutes les clés sont optionnelles) :
+
+        {
+            "defaults": {"source": "ign", "year": "2023", "scale": "inconnue"},
+            "rules": [
+                {"glob": "livrable/hydro*", "prefix": "hydro", "source": "bdtopo"},
+                {"regex": "(?i)cadastre", "name": "parcelle*", "prefix": "cad", "year": "2022"}
+            ],
+            "overrides": "surcharges.csv"
+        }
+
+    `glob` et `regex` portent sur le chemin du dossier relatif à la racine traitée, `name` sur le nom de base.
+    La première règle qui correspond l'emporte. Le CSV de surcharges contient une colonne `path`
+    (chemin relatif du fichier, avec ou sans extension) et les colonnes `prefix`, `source`, `year`,
+    `scale` et éventuellement `base_name` ; il est prioritaire sur les règles.
+    """
+
+    def __init__(self, root, defaults=None, rules=None, overrides=None):
+        self.root = root
+        self.defaults = defaults or {}
+        self.rules = []
+        for rule in rules or []:
+            compiled = dict(rule)
+            if 'regex' in rule:
+                compiled['regex'] = re.compile(rule['regex'])
+            self.rules.append(compiled)
+        self.overrides = overrides or {}
+
+    def match_rule(self, relative_folder, base_name):
+        """
+        Retourne la première règle correspondant au dossier et au nom de base, ou None.
+        """
+        for rule in self.rules:
+            if 'glob' in rule and not fnmatch.fnmatch(relative_folder, rule['glob']):
+                continue
+            if 'regex' in rule and not rule['regex'].search(relative_folder):
+                continue
+            if 'name' in rule and not fnmatch.fnmatch(base_name, rule['name']):
+                continue
+            return rule
+        return None
+
+    def resolve(self, folder, base_name):
+        """
+        Calcule les métadonnées d'un groupe à partir des valeurs par défaut, des règles et des surcharges.
+
+        Args:
+            folder (str): Le dossier contenant le groupe.
+            base_name (str): Le nom de base du groupe.
+
+        Returns:
+            dict: Les champs trouvés parmi `prefix`, `source`, `year`, `scale` et `base_name`,
+            ou None si aucune règle ni surcharge ne s'applique.
+        """
+        relative_folder = to_relative_key(os.path.relpath(folder, self.root), self.root)
+        key = f"{relative_folder}/{base_name}" if relative_folder else base_name
+
+        override = self.overrides.get(key)
+        rule = self.match_rule(relative_folder, base_name)
+        if override is None and rule is None:
+            return None
+
+        resolved = {field: value for field, value in self.defaults.items() if field in METADATA_FIELDS}
+        for source in (rule, override):
+            if source:
+                resolved.update({field: source[field] for field in METADATA_FIELDS if source.get(field)})
+        if override and override.get('base_name'):
+            resolved['base_name'] = override['base_name']
+        return resolved
+
+
+def load_overrides_csv(file_path, root):
+    """
+    Charge un CSV de surcharges par fichier et l'indexe par chemin relatif sans extension.
+    """
+    overrides = {}
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            path = (row.get('path') or '').strip()
+            if not path:
+                continue
+            key = to_relative_key(split_extension(path)[0], root)
+            overrides[key] = {field: (value or '').strip() for field, value in row.items() if field != 'path'}
+    return overrides
+
+
+def load_rules(root, rules_path=None, overrides_path=None):
+    """
+    Construit les règles du mode batch à partir d'un fichier JSON et/ou d'un CSV de surcharges.
+
+    Args:
+        root (str): Le dossier racine traité, base des chemins relatifs.
+        rules_path (str, optional): Chemin du fichier de règles JSON.
+        overrides_path (str, optional): Chemin du CSV de surcharges ; remplace la clé `overrides` du JSON.
+
+    Returns:
+        BatchRules: Les règles chargées.
+    """
+    config = {}
+    if rules_path:
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    overrides_path = overrides_path or config.get('overrides')
+    if overrides_path and rules_path and not os.path.isabs(overrides_path) and not os.path.exists(overrides_path):
+        # Un CSV référencé dans le JSON est relatif au fichier de règles
+        overrides_path = os.path.join(os.path.dirname(rules_path), overrides_path)
+
+    overrides = load_overrides_csv(overrides_path, root) if overrides_path else {}
+    return BatchRules(root, config.get('defaults'), config.get('rules'), overrides)
+
+
+class ReviewReport:
+    """
+    Rapport CSV des groupes que les règles ne permettent pas de traiter et qui sont ignorés.
+    Chaque ligne est écrite immédiatement pour que le rapport reste exploitable en cas d'interruption.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.count = 0
+        self._file = open(file_path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(REVIEW_COLUMNS)
+
+    def add(self, folder, base_name, files, reason):
+        """
+        Ajoute un groupe à vérifier au rapport.
+        """
+        names = ';'.join(os.path.basename(f) for f in files)
+        self._writer.writerow([folder, base_name, names, reason])
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,456 @@
+# benchmark.py
+
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import metadata
+from file_processor import collect_files_by_extension, process_files_in_directory
+from metadata_handler import detect_prefix
+from naming_convention import apply_naming_convention, identify_suffix
+from prefetch import Prefetcher
+from rename_journal import RenameJournal
+from run_context import RunContext
+import run_log
+
+# Phases mesurées, dans l'ordre d'exécution
+PHASES = ['collect_files_by_extension', 'identify_suffix', 'detect_prefix', 'apply_naming_convention', 'rename']
+
+# Dossier du programme, dans lequel le démarrage à froid est mesuré (metadata.json y est lu)
+PROGRAM_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Mesure, dans un nouvel interpréteur, de la durée d'importation de main.py
+STARTUP_SCRIPT = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+# Durée maximale tolérée pour le démarrage à froid d'un processus (secondes)
+DEFAULT_STARTUP_BUDGET = 1.0
+
+# Types de shapefiles générés : code ESRI et taille du contenu d'un enregistrement (octets)
+SHAPE_KINDS = {'point': (1, 20), 'line': (3, 76), 'polygon': (5, 92), 'empty': (5, 0)}
+
+# Répartition des jeux de données générés
+DATASET_WEIGHTS = {'shapefile': 70, 'gpkg': 10, 'geojson': 10, 'kml': 10}
+
+# Fichiers compagnons ajoutés aléatoirement aux shapefiles
+SIDECARS = ['.prj', '.cpg', '.shp.xml', '.qml']
+
+# Mots utilisés pour les noms générés, avec accents et mots de liaison pour exercer la normalisation
+NAME_WORDS = ['réseau', 'route', 'limite', 'zone', 'périmètre', 'de', 'la', 'des', 'cours', 'eau', 'bâti',
+              'Parcelle', 'PLU', 'secteur', 'étude', '2019', 'v2', 'final', 'export', 'île']
+
+# Réponses fournies aux questions interactives, selon le texte de la question
+SCRIPTED_ANSWERS = [
+    ("modifier le nom de base", "n"),
+    ("renommer le fichier", "o"),
+    ("valider ce préfixe", "o"),
+    ("ajouter à la liste des mots-clés", "n"),
+    ("Source", "bench"),
+    ("Année", "2024"),
+    ("Echelle", "25K"),
+]
+
+
+class ScriptedInput:
+    """
+    Remplace input() par des réponses scriptées choisies d'après le texte de la question.
+    Les demandes de préfixe reçoivent le premier préfixe connu.
+    """
+
+    def __init__(self):
+        self.prompts = 0
+
+    def __call__(self, prompt=""):
+        self.prompts += 1
+        if "préfixe" in prompt and "Veuillez entrer" in prompt:
+            return next(iter(metadata.keywords))
+        for fragment, answer in SCRIPTED_ANSWERS:
+            if fragment in prompt:
+                return answer
+        return ""
+
+
+def write_shapefile(stem, kind, feature_count, rng):
+    """
+    Écrit un shapefile synthétique (.shp, .shx, .dbf) dont les en-têtes sont valides.
+    """
+    shape_type, content_size = SHAPE_KINDS[kind]
+    if kind == 'empty':
+        feature_count = 0
+    record_size = 8 + content_size
+
+    def header(file_size):
+        return (struct.pack('>i', 9994) + b'\0' * 20 + struct.pack('>i', file_size // 2)
+                + struct.pack('<ii', 1000, shape_type) + b'\0' * 64)
+
+    with open(stem + '.shp', 'wb') as f:
+        f.write(header(100 + feature_count * record_size))
+        for number in range(1, feature_count + 1):
+            f.write(struct.pack('>ii', number, content_size // 2) + struct.pack('<i', shape_type)
+                    + bytes(rng.getrandbits(8) for _ in range(content_size - 4)))
+
+    with open(stem + '.shx', 'wb') as f:
+        f.write(header(100 + feature_count * 8))
+        offset = 50
+        for _ in range(feature_count):
+            f.write(struct.pack('>ii', offset, content_size // 2))
+            offset += record_size // 2
+
+    field = b'NOM'.ljust(11, b'\0') + b'C' + b'\0' * 4 + bytes([20, 0]) + b'\0' * 14
+    header_length = 32 + len(field) + 1
+    with open(stem + '.dbf', 'wb') as f:
+        f.write(bytes([3, 124, 1, 1]) + struct.pack('<IHH', feature_count, header_length, 21) + b'\0' * 20)
+        f.write(field + b'\r')
+        for _ in range(feature_count):
+            f.write(b' ' + b'x' * 20)
+        f.write(b'\x1a')
+
+
+def write_geopackage(path, kind, feature_count):
+    """
+    Écrit un GeoPackage minimal avec une table d'entités déclarée dans gpkg_contents et gpkg_geometry_columns.
+    """
+    geometry_type = {'point': 'POINT', 'line': 'LINESTRING', 'polygon': 'POLYGON', 'empty': 'POLYGON'}[kind]
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("PRAGMA application_id = 1196444487")
+        connection.execute("CREATE TABLE gpkg_contents (table_name TEXT PRIMARY KEY, data_type TEXT NOT NULL, "
+                           "identifier TEXT, srs_id INTEGER)")
+        connection.execute("CREATE TABLE gpkg_geometry_columns (table_name TEXT, column_name TEXT, "
+                           "geometry_type_name TEXT, srs_id INTEGER, z TINYINT, m TINYINT)")
+        connection.execute("CREATE TABLE couche (fid INTEGER PRIMARY KEY, geom BLOB)")
+        connection.execute("INSERT INTO gpkg_contents VALUES ('couche', 'features', 'couche', 2154)")
+        connection.execute("INSERT INTO gpkg_geometry_columns VALUES ('couche', 'geom', ?, 2154, 0, 0)", (geometry_type,))
+        if kind != 'empty':
+            connection.executemany("INSERT INTO couche (geom) VALUES (?)", [(b'GP',)] * feature_count)
+    connection.close()
+
+
+def write_geojson(path, kind, feature_count):
+    """
+    Écrit une FeatureCollection GeoJSON synthétique.
+    """
+    geometry = {'point': {'type': 'Point', 'coordinates': [2.35, 48.85]},
+                'line': {'type': 'LineString', 'coordinates': [[2.35, 48.85], [2.36, 48.86]]},
+                'polygon': {'type': 'Polygon', 'coordinates': [[[2.35, 48.85], [2.36, 48.86], [2.35, 48.86], [2.35, 48.85]]]}}
+    features = [] if kind == 'empty' else [
+        {'type': 'Feature', 'properties': {'id': i}, 'geometry': geometry[kind]} for i in range(feature_count)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+
+def write_kml(path, kind, feature_count):
+    """
+    Écrit un document KML synthétique contenant des Placemarks.
+    """
+    element = {'point': '<Point><coordinates>2.35,48.85</coordinates></Point>',
+               'line': '<LineString><coordinates>2.35,48.85 2.36,48.86</coordinates></LineString>',
+               'polygon': '<Polygon><outerBoundaryIs><LinearRing><coordinates>2.35,48.85 2.36,48.86 2.35,48.86 '
+                          '2.35,48.85</coordinates></LinearRing></outerBoundaryIs></Polygon>'}
+    placemarks = '' if kind == 'empty' else ''.join(
+        f'<Placemark><name>{i}</name>{element[kind]}</Placemark>' for i in range(feature_count))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?><kml xmlns="http://www.opengis.net/kml/2.2">'
+                f'<Document>{placemarks}</Document></kml>')
+
+
+def generate_tree(root, groups=1000, depth=3, fanout=4, max_features=50, seed=0):
+    """
+    Génère une arborescence synthétique de données géographiques, reproductible pour une graine donnée.
+
+    Les dossiers portent pour partie des mots-clés de metadata.json afin de déclencher la détection de préfixe.
+    Les jeux de données mélangent shapefiles (point, ligne, polygone, vide, avec fichiers compagnons),
+    GeoPackages, GeoJSON et KML.
+
+    Args:
+        root (str): Le dossier à créer.
+        groups (int): Le nombre de jeux de données.
+        depth (int): La profondeur de l'arborescence.
+        fanout (int): Le nombre de sous-dossiers par dossier.
+        max_features (int): Le nombre maximal d'entités par jeu de données.
+        seed (int): La graine du générateur aléatoire.
+
+    Returns:
+        dict: Le nombre de dossiers, de groupes et de fichiers générés.
+    """
+    rng = random.Random(seed)
+    keyword_names = [keyword for keyword_list in metadata.keywords.values() for keyword in keyword_list]
+
+    directories = [root]
+    frontier = [root]
+    for _ in range(depth):
+        next_frontier = []
+        for parent in frontier:
+            for _ in range(fanout):
+                name = rng.choice(keyword_names) if rng.random() < 0.5 else f"dossier_{rng.randrange(10 ** 6)}"
+                path = os.path.join(parent, name)
+                if path not in directories:
+                    directories.append(path)
+                    next_frontier.append(path)
+        frontier = next_frontier
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    kinds = list(DATASET_WEIGHTS)
+    weights = list(DATASET_WEIGHTS.values())
+    file_count = 0
+    for number in range(groups):
+        directory = rng.choice(directories)
+        name = ' '.join(rng.choice(NAME_WORDS) for _ in range(rng.randint(1, 4))) + f" {number}"
+        stem = os.path.join(directory, name)
+        dataset = rng.choices(kinds, weights)[0]
+        kind = rng.choice(list(SHAPE_KINDS))
+        feature_count = rng.randint(1, max_features)
+
+        if dataset == 'shapefile':
+            write_shapefile(stem, kind, feature_count, rng)
+            file_count += 3
+            for sidecar in SIDECARS:
+                if rng.random() < 0.6:
+                    with open(stem + sidecar, 'w', encoding='utf-8') as f:
+                        f.write('UTF-8' if sidecar == '.cpg' else '')
+                    file_count += 1
+        elif dataset == 'gpkg':
+            write_geopackage(stem + '.gpkg', kind, feature_count)
+            file_count += 1
+        elif dataset == 'geojson':
+            write_geojson(stem + '.geojson', kind, feature_count)
+            file_count += 1
+        else:
+            write_kml(stem + '.kml', kind, feature_count)
+            file_count += 1
+
+    return {'directories': len(directories), 'groups': groups, 'files': file_count}
+
+
+def time_phase(function):
+    """
+    Exécute une phase en masquant ses messages et retourne (durée en secondes, résultat).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function()
+        return time.perf_counter() - start, result
+
+
+def measure_group_memory(root):
+    """
+    Mesure la mémoire occupée par l'ensemble des groupes de l'arborescence, une fois collectés.
+
+    Returns:
+        tuple: (octets alloués au total, nombre de groupes).
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            file_groups_by_folder = collect_files_by_extension(root)
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return allocated, sum(len(file_groups) for file_groups in file_groups_by_folder.values())
+
+
+def run_phases(root, work_dir):
+    """
+    Mesure chaque phase du traitement sur l'arborescence générée.
+
+    Returns:
+        dict: {phase: {'seconds': durée, 'items': nombre d'éléments traités}}.
+    """
+    results = {}
+
+    seconds, file_groups_by_folder = time_phase(lambda: collect_files_by_extension(root))
+    groups = [(folder, base_name, group) for folder, file_groups in file_groups_by_folder.items()
+              for base_name, group in file_groups.items()]
+    allocated, group_count = measure_group_memory(root)
+    results['collect_files_by_extension'] = {'seconds': seconds, 'items': len(groups),
+                                             'bytes_per_group': allocated / group_count if group_count else None}
+
+    primary_files = [path for path in (group.primary_file() for _, _, group in groups) if path]
+    seconds, _ = time_phase(lambda: [identify_suffix(path, verbose=False) for path in primary_files])
+    results['identify_suffix'] = {'seconds': seconds, 'items': len(primary_files)}
+
+    seconds, _ = time_phase(lambda: [detect_prefix(folder, base_name) for folder, base_name, _ in groups])
+    results['detect_prefix'] = {'seconds': seconds, 'items': len(groups)}
+
+    all_files = [file for _, _, group in groups for file in group.files]
+    seconds, _ = time_phase(lambda: [apply_naming_convention(file, 'hydro', 'pt', 'bench', '2024', '25K')
+                                     for file in all_files])
+    results['apply_naming_convention'] = {'seconds': seconds, 'items': len(all_files)}
+
+    # Traitement complet avec réponses scriptées : les fichiers sont réellement renommés
+    scripted_input = ScriptedInput()
+    journal = RenameJournal(os.path.join(work_dir, 'journal'))
+    run_log.configure(os.path.join(work_dir, 'process.log'), journal.run_id)
+    context = RunContext(root, journal=journal, prefetcher=Prefetcher())
+    original_input = builtins.input
+    builtins.input = scripted_input
+    try:
+        seconds, _ = time_phase(lambda: process_files_in_directory(root, context))
+    finally:
+        builtins.input = original_input
+        context.close()
+        run_log.close_logger()
+    results['rename'] = {'seconds': seconds, 'items': len(groups), 'prompts': scripted_input.prompts}
+
+    return results
+
+
+def measure_startup(repeat=3):
+    """
+    Mesure le démarrage à froid : chaque essai lance un nouvel interpréteur qui importe main.py.
+
+    Returns:
+        tuple: (durées d'importation de main.py, durées totales des processus), en secondes.
+    """
+    import_durations = []
+    process_durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=PROGRAM_DIR, capture_output=True,
+                                text=True, check=True).stdout
+        process_durations.append(time.perf_counter() - start)
+        import_durations.append(float(output.strip().splitlines()[-1]))
+    return import_durations, process_durations
+
+
+def summarize_durations(durations, items):
+    best = min(durations)
+    return {
+        'min_seconds': best,
+        'median_seconds': statistics.median(durations),
+        'items': items,
+        'items_per_second': items / best if best else None,
+    }
+
+
+def run_benchmark(groups=1000, depth=3, fanout=4, max_features=50, seed=0, repeat=3):
+    """
+    Génère l'arborescence et mesure les phases `repeat` fois ; l'arborescence est régénérée à chaque
+    répétition puisque la dernière phase renomme les fichiers. Le démarrage à froid est mesuré à part.
+
+    Returns:
+        dict: Les paramètres, l'environnement et, pour chaque phase, la durée minimale et médiane.
+    """
+    runs = []
+    tree_stats = None
+    for _ in range(repeat):
+        work_dir = tempfile.mkdtemp(prefix="geofilerenamer_bench_")
+        try:
+            root = os.path.join(work_dir, 'arbre')
+            tree_stats = generate_tree(root, groups, depth, fanout, max_features, seed)
+            runs.append(run_phases(root, work_dir))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    import_durations, process_durations = measure_startup(repeat)
+    phases = {
+        'startup_import': summarize_durations(import_durations, 1),
+        'startup_process': summarize_durations(process_durations, 1),
+    }
+    for phase in PHASES:
+        phases[phase] = summarize_durations([run[phase]['seconds'] for run in runs], runs[-1][phase]['items'])
+    phases['collect_files_by_extension']['bytes_per_group'] = runs[-1]['collect_files_by_extension']['bytes_per_group']
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'groups': groups, 'depth': depth, 'fanout': fanout, 'max_features': max_features,
+                       'seed': seed, 'repeat': repeat},
+        'tree': tree_stats,
+        'phases': phases,
+    }
+
+
+def compare_results(results, baseline, threshold):
+    """
+    Compare les durées minimales aux résultats de référence.
+
+    Returns:
+        list: Les phases ralenties au-delà du seuil, sous la forme (phase, référence, actuel, ratio).
+    """
+    regressions = []
+    for phase, stats in results['phases'].items():
+        reference = baseline.get('phases', {}).get(phase)
+        if not reference or not reference.get('min_seconds'):
+            continue
+        ratio = stats['min_seconds'] / reference['min_seconds']
+        if ratio > 1 + threshold:
+            regressions.append((phase, reference['min_seconds'], stats['min_seconds'], ratio))
+    return regressions
+
+
+def print_summary(results):
+    print(f"{'Phase':<28}{'min (s)':>12}{'médiane (s)':>14}{'éléments':>10}{'éléments/s':>14}")
+    for phase, stats in results['phases'].items():
+        rate = f"{stats['items_per_second']:.0f}" if stats['items_per_second'] else '-'
+        print(f"{phase:<28}{stats['min_seconds']:>12.4f}{stats['median_seconds']:>14.4f}{stats['items']:>10}{rate:>14}")
+    bytes_per_group = results['phases']['collect_files_by_extension'].get('bytes_per_group')
+    if bytes_per_group:
+        print(f"Mémoire des groupes collectés : {bytes_per_group:.0f} octets par groupe")
+
+
+def main(argv=None):
+    """
+    Point d'entrée du banc d'essai : génère une arborescence synthétique et mesure chaque phase.
+    """
+    parser = argparse.ArgumentParser(description="Banc d'essai de GeoFileRenamer sur une arborescence synthétique.")
+    parser.add_argument("--groups", type=int, default=1000, help="Nombre de jeux de données générés (défaut : 1000).")
+    parser.add_argument("--depth", type=int, default=3, help="Profondeur de l'arborescence (défaut : 3).")
+    parser.add_argument("--fanout", type=int, default=4, help="Sous-dossiers par dossier (défaut : 4).")
+    parser.add_argument("--max-features", type=int, default=50, help="Entités maximales par jeu (défaut : 50).")
+    parser.add_argument("--seed", type=int, default=0, help="Graine du générateur (défaut : 0).")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions (défaut : 3).")
+    parser.add_argument("--output", help="Fichier JSON où écrire les résultats.")
+    parser.add_argument("--compare", help="Résultats JSON de référence à comparer.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Ralentissement toléré par rapport à la référence (défaut : 0.2, soit 20 %%).")
+    parser.add_argument("--startup-budget", type=float, default=DEFAULT_STARTUP_BUDGET,
+                        help=f"Durée maximale du démarrage à froid, en secondes (défaut : {DEFAULT_STARTUP_BUDGET}).")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.groups, args.depth, args.fanout, args.max_features, args.seed, args.repeat)
+    print_summary(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+        print(f"Résultats écrits dans {args.output}")
+
+    status = 0
+    startup = results['phases']['startup_process']['min_seconds']
+    if startup > args.startup_budget:
+        print(f"Démarrage à froid trop lent : {startup:.3f}s (budget {args.startup_budget:.3f}s)")
+        status = 1
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        for phase, reference, current, ratio in regressions:
+            print(f"Régression : {phase} {reference:.4f}s -> {current:.4f}s (x{ratio:.2f})")
+        if regressions:
+            return 1
+        print("Aucune régression au-delà du seuil.")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
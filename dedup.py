@@ -0,0 +1,250 @@
+import csv
+import hashlib
+import os
+
+from metrics import get_metrics
+from naming_convention import identify_suffix
+from shapefile_header import HEADER_SIZE
+from utils import split_extension
+
+# Fichiers qui portent les données d'un groupe shapefile ; les fichiers compagnons (.prj, .qml, etc.)
+# peuvent manquer ou différer d'une copie à l'autre sans que les données changent
+SHAPEFILE_DATA_EXTENSIONS = ('.shp', '.shx', '.dbf')
+
+# Octets lus au début et à la fin de chaque fichier pour l'empreinte partielle, et taille des blocs du hachage complet
+DEFAULT_SAMPLE_SIZE = 64 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Traitement des doublons : reprise de la décision du premier exemplaire, ou simple signalement
+MODE_REUSE = 'reuse'
+MODE_SKIP = 'skip'
+
+DUPLICATE_COLUMNS = ['folder', 'base_name', 'original_folder', 'original_base_name', 'action']
+
+
+def data_files(group):
+    """
+    Retourne les fichiers de données d'un groupe, comparés pour reconnaître un doublon :
+    .shp, .shx et .dbf pour un shapefile, le fichier principal sinon. Liste vide si le groupe n'en a pas.
+    """
+    if group.path('.shp') is not None:
+        return [path for path in (group.path(ext) for ext in SHAPEFILE_DATA_EXTENSIONS) if path is not None]
+    primary_file = group.primary_file()
+    return [primary_file] if primary_file else []
+
+
+def is_empty_dataset(group, key):
+    """
+    Indique si un groupe ne contient aucune entité. Des jeux vides sont identiques octet pour octet sans être
+    le même jeu de données : ils ne sont jamais rapprochés comme doublons.
+    Pour un shapefile, la taille du .shp (déjà connue par `key`) suffit ; sinon la géométrie est lue.
+    """
+    sizes = dict(key)
+    if '.shp' in sizes:
+        return sizes['.shp'] <= HEADER_SIZE
+    primary_file = group.primary_file()
+    return primary_file is None or identify_suffix(primary_file, verbose=False) == 'empty'
+
+
+def partial_hash(paths, sample_size=DEFAULT_SAMPLE_SIZE):
+    """
+    Empreinte des premiers et derniers `sample_size` octets de chaque fichier (taille comprise).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            digest.update(size.to_bytes(8, 'little'))
+            digest.update(f.read(sample_size))
+            if size > sample_size:
+                f.seek(max(sample_size, size - sample_size))
+                digest.update(f.read(sample_size))
+    return digest.digest()
+
+
+def full_hash(paths):
+    """
+    Empreinte du contenu complet des fichiers.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    for path in paths:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(HASH_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        digest.update(b'\0')
+    return digest.digest()
+
+
+class Candidate:
+    """
+    Premier exemplaire d'un jeu de données, auquel les groupes suivants de même taille sont comparés.
+    Ses empreintes ne sont calculées qu'au premier groupe de même taille, et gardées ensuite.
+    La décision prise pour lui (suffixe, métadonnées) y est gardée pour être reprise par ses doublons.
+    """
+
+    __slots__ = ('group', 'paths', 'partial', 'full', 'decision')
+
+    def __init__(self, group, paths):
+        self.group = group
+        # Chemins des fichiers de données ; remplacés par les nouveaux chemins dès que le groupe est renommé
+        self.paths = paths
+        self.partial = None
+        self.full = None
+        self.decision = None
+
+    def hash(self, function):
+        """
+        Calcule une empreinte des fichiers de données, à leurs nouveaux chemins s'ils ont été renommés,
+        sinon à leurs chemins d'origine (renommage seulement planifié, ou annulé).
+        """
+        try:
+            return function(self.paths)
+        except OSError:
+            original_paths = data_files(self.group)
+            if original_paths == self.paths:
+                raise
+            return function(original_paths)
+
+
+class DuplicateDetector:
+    """
+    Reconnaît, au fil du parcours, les groupes dont les données sont identiques à celles d'un groupe déjà vu
+    (même jeu copié dans plusieurs dossiers, ex: livrable/, archive/, backup/). Seuls des groupes de dossiers
+    différents sont rapprochés, et les jeux sans entité ne le sont jamais.
+
+    Les groupes sont d'abord comparés sur les extensions et tailles de leurs fichiers de données, ce qui coûte
+    un stat par fichier de données (le parcours par os.scandir ne lit pas les tailles) ; une empreinte partielle
+    (début et fin des fichiers) n'est calculée qu'en cas de tailles égales, et une empreinte complète qu'en cas
+    d'empreintes partielles égales.
+
+    Les décisions prises pour le premier exemplaire (suffixe et métadonnées) sont enregistrées pour être reprises
+    par ses doublons (mode 'reuse'), ou les doublons sont seulement signalés et ignorés (mode 'skip').
+
+    Un doublon pouvant se trouver n'importe où dans la suite du parcours, chaque premier exemplaire reste en mémoire
+    jusqu'à la fin de l'exécution : un Candidate (groupe, chemins des fichiers de données, empreintes calculées et
+    décision) par jeu de données distinct, soit de l'ordre d'un kilo-octet par groupe.
+    """
+
+    def __init__(self, mode=MODE_REUSE, report_path=None, sample_size=DEFAULT_SAMPLE_SIZE):
+        self.mode = mode
+        self.sample_size = sample_size
+        # {(extensions et tailles des fichiers de données): [Candidate, ...]}
+        self.candidates = {}
+        # {(dossier, nom de base) du premier exemplaire: Candidate}
+        self.by_key = {}
+        self.count = 0
+        self.report_path = report_path
+        self._file = None
+        self._writer = None
+        if report_path is not None:
+            self._file = open(report_path, 'w', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(DUPLICATE_COLUMNS)
+
+    def size_key(self, paths):
+        """
+        Clé de comparaison d'un groupe : extension et taille de chacun de ses fichiers de données (un stat par fichier).
+        """
+        return tuple((split_extension(path)[1], os.path.getsize(path)) for path in paths)
+
+    def find_original(self, group):
+        """
+        Retourne le premier exemplaire dont le groupe est un doublon, ou None ; un groupe sans doublon
+        connu devient lui-même un exemplaire de référence.
+        """
+        paths = data_files(group)
+        if not paths:
+            return None
+        try:
+            key = self.size_key(paths)
+        except OSError:
+            return None
+        candidates = self.candidates.get(key)
+        if candidates is None:
+            self.register(key, group, paths)
+            return None
+        # Un jeu vide n'est le doublon d'aucun autre, et deux groupes d'un même dossier sont deux jeux distincts
+        if is_empty_dataset(group, key):
+            return None
+        candidates = [candidate for candidate in candidates if candidate.group.directory != group.directory]
+        if not candidates:
+            self.register(key, group, paths)
+            return None
+        # Entre plusieurs exemplaires identiques, celui qui porte le même nom est comparé en premier
+        candidates.sort(key=lambda candidate: candidate.group.base_name != group.base_name)
+
+        metrics = get_metrics()
+        try:
+            partial = partial_hash(paths, self.sample_size)
+            metrics.increment('dedup_partial_hashes')
+            full = None
+            for candidate in candidates:
+                if candidate.partial is None:
+                    candidate.partial = candidate.hash(lambda files: partial_hash(files, self.sample_size))
+                    metrics.increment('dedup_partial_hashes')
+                if candidate.partial != partial:
+                    continue
+                if full is None:
+                    full = full_hash(paths)
+                    metrics.increment('dedup_full_hashes')
+                if candidate.full is None:
+                    candidate.full = candidate.hash(full_hash)
+                    metrics.increment('dedup_full_hashes')
+                if candidate.full == full:
+                    return candidate.group
+        except OSError:
+            return None
+        self.register(key, group, paths, partial, full)
+        return None
+
+    def register(self, key, group, paths, partial=None, full=None):
+        candidate = Candidate(group, paths)
+        candidate.partial, candidate.full = partial, full
+        self.candidates.setdefault(key, []).append(candidate)
+        self.by_key[group.key] = candidate
+
+    def record(self, group, suffix, metadata, plan=()):
+        """
+        Enregistre la décision prise pour un groupe, reprise ensuite par ses doublons.
+        Les chemins de ses fichiers de données suivent le plan de renommage, pour les comparaisons suivantes.
+        """
+        candidate = self.by_key.get(group.key)
+        if candidate is None:
+            # Doublon ou groupe sans fichier de données : sa décision ne sera jamais reprise
+            return
+        candidate.decision = (suffix, metadata)
+        if plan:
+            new_path_by_file = dict(plan)
+            candidate.paths = [new_path_by_file.get(path, path) for path in candidate.paths]
+
+    def forget_plan(self, group):
+        """
+        Ramène les chemins d'un groupe à ses chemins d'origine, lorsque son renommage a échoué et a été annulé.
+        """
+        candidate = self.by_key.get(group.key)
+        if candidate is not None:
+            candidate.paths = data_files(group)
+
+    def decision(self, original):
+        """
+        Retourne la décision (suffixe, métadonnées) prise pour le premier exemplaire, ou None.
+        """
+        candidate = self.by_key.get(original.key)
+        return candidate.decision if candidate is not None else None
+
+    def report(self, group, original, action):
+        """
+        Ajoute un doublon au rapport.
+        """
+        self.count += 1
+        get_metrics().increment('groups_duplicate')
+        if self._writer is not None:
+            self._writer.writerow([group.directory, group.base_name, original.directory, original.base_name, action])
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
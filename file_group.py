@@ -0,0 +1,84 @@
+import os
+import sys
+
+from utils import is_primary_file, split_extension, PRIMARY_EXTENSIONS
+
+
+class FileGroup:
+    """
+    Groupe de fichiers partageant le même nom de base dans le même dossier, sous forme compacte.
+
+    Seuls le dossier (chaîne internée, partagée par tous les groupes du dossier), le nom de base et le tuple
+    des extensions présentes (telles qu'écrites sur disque, internées elles aussi) sont gardés en mémoire.
+    Les chemins complets ne sont construits qu'à la demande. Le fichier principal, dont la recherche peut lire
+    le début d'un .json, n'est cherché qu'une fois puis gardé.
+    """
+
+    __slots__ = ('directory', 'base_name', 'extensions', 'primary')
+
+    def __init__(self, directory, base_name, extensions=()):
+        self.directory = sys.intern(directory)
+        self.base_name = base_name
+        self.extensions = tuple(sys.intern(ext) for ext in extensions)
+        # Chemin du fichier principal, '' si le groupe n'en a pas, None tant qu'il n'a pas été cherché
+        self.primary = None
+
+    @classmethod
+    def from_paths(cls, paths):
+        """
+        Construit un groupe à partir des chemins de ses fichiers (même dossier, même nom de base).
+        """
+        directory = os.path.dirname(paths[0])
+        base_name = split_extension(os.path.basename(paths[0]))[0]
+        return cls(directory, base_name, [os.path.basename(path)[len(base_name):] for path in paths])
+
+    def add(self, name):
+        """
+        Ajoute au groupe un fichier de son dossier, donné par son nom.
+        """
+        self.extensions += (sys.intern(name[len(self.base_name):]),)
+        self.primary = None
+
+    @property
+    def key(self):
+        return self.directory, self.base_name
+
+    @property
+    def files(self):
+        """
+        Les chemins des fichiers du groupe, construits à chaque appel.
+        """
+        prefix = os.path.join(self.directory, self.base_name)
+        return [prefix + ext for ext in self.extensions]
+
+    def path(self, extension):
+        """
+        Retourne le chemin du premier fichier ayant l'extension donnée (en minuscules), ou None.
+        """
+        for ext in self.extensions:
+            if ext.lower() == extension:
+                return os.path.join(self.directory, self.base_name + ext)
+        return None
+
+    def primary_file(self):
+        """
+        Retourne le fichier principal du groupe, le premier trouvé dans l'ordre de PRIMARY_EXTENSIONS, ou None.
+        Un .json n'est retenu que si son contenu est du GeoJSON. Le résultat est gardé pour les appels suivants.
+        """
+        if self.primary is None:
+            found = ''
+            normalized = [ext.lower() for ext in self.extensions]
+            for primary in PRIMARY_EXTENSIONS:
+                if primary in normalized:
+                    path = os.path.join(self.directory, self.base_name + self.extensions[normalized.index(primary)])
+                    if is_primary_file(path, primary):
+                        found = path
+                        break
+            self.primary = found
+        return self.primary or None
+
+    def __len__(self):
+        return len(self.extensions)
+
+    def __repr__(self):
+        return f"FileGroup({self.directory!r}, {self.base_name!r}, {self.extensions!r})"
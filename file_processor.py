@@ -1,107 +1,414 @@
 import os
-from metadata_handler import get_metadata_for_file
-from naming_convention import apply_naming_convention, identify_suffix
-from utils import log_info, is_file_already_renamed, load_prefixes_from_json
-
-# Liste des extensions prises en charge, y compris shapefiles et autres formats géospatiaux courants
-SUPPORTED_EXTENSIONS = ['.shp', '.shx', '.dbf', '.prj', '.sbn', '.sbx', '.lyr', '.sld', '.cpg', '.CPG', '.shp.xml', '.xml', '.qml', '.qlr', '.gpkg', 
-                        '.json', '.geojson', '.csv', '.kmz', '.KMZ', '.kml', '.KML', '.dwg', '.DWG', '.qpj', '.cst', '.sbn', '.sbx']
+import sys
+import time
+import metadata
+import run_log
+from dedup import MODE_SKIP
+from file_group import FileGroup
+from metrics import get_metrics
+from metadata_handler import detect_prefix, get_metadata_for_file, get_metadata_from_rules
+from naming_convention import identify_suffix
+from prefetch import Prefetcher
+from rename_executor import RenameExecutor
+from rename_planner import RenamePlanner
+from scan_index import STATE_RENAMED, STATE_SKIPPED
+from utils import ask, split_extension, PrefixMatcher, PRIMARY_EXTENSIONS
+
+# Extensions prises en charge (en minuscules), y compris shapefiles et autres formats géospatiaux courants.
+# La comparaison se fait sur l'extension du fichier ramenée en minuscules, donc .CPG, .KML, etc. sont couverts.
+SUPPORTED_EXTENSIONS = frozenset(['.shp', '.shx', '.dbf', '.prj', '.sbn', '.sbx', '.lyr', '.sld', '.cpg', '.shp.xml', '.xml', '.qml',
+                                  '.qlr', '.gpkg', '.json', '.geojson', '.csv', '.kmz', '.kml', '.dwg', '.qpj', '.cst'])
 
 # Extensions spécifiques aux fichiers composant un groupe de shapefiles
-SHAPEFILE_EXTENSIONS = ['.shp', '.shx', '.dbf', '.prj', '.sbn', '.sbx', '.lyr', '.sld', '.cpg', '.CPG', '.shp.xml', '.xml', '.qml', '.qlr', '.qpj', '.cst']
+SHAPEFILE_EXTENSIONS = frozenset(['.shp', '.shx', '.dbf', '.prj', '.sbn', '.sbx', '.lyr', '.sld', '.cpg', '.shp.xml', '.xml', '.qml',
+                                  '.qlr', '.qpj', '.cst'])
+
+# Vérificateur de la convention de nommage partagé pendant toute l'exécution.
+# Ses préfixes sont resynchronisés avec metadata.keywords lorsque ceux-ci changent.
+renamed_matcher = PrefixMatcher(metadata.keywords)
+renamed_matcher_version = metadata.keywords_version
+
+# Planificateur des renommages, qui garde en mémoire les noms des derniers dossiers traités
+rename_planner = RenamePlanner()
 
-# Charger les préfixes dynamiques une fois depuis le fichier metadata.json
-dynamic_prefixes = load_prefixes_from_json()
+# Exécution des renommages par défaut (sans contexte) : groupe par groupe, dans le thread principal
+rename_executor = RenameExecutor(planner=rename_planner)
 
 # Variables globales pour réutiliser les dernières valeurs saisies par l'utilisateur
 last_source = None
 last_year = None
 last_scale = None
 
-def collect_files_by_extension(folder, extensions):
+def get_renamed_matcher():
     """
-    Parcourt un dossier et regroupe les fichiers selon leur extension. Traite chaque dossier indépendamment,
-    regroupant les fichiers qui partagent le même nom de base dans le même dossier.
+    Retourne le vérificateur de convention partagé, à jour avec les préfixes de la session
+    et ceux ajoutés entre-temps par d'autres sessions.
     """
-    file_groups_by_folder = {}
+    global renamed_matcher_version
+    metadata.refresh_keywords()
+    if renamed_matcher_version != metadata.keywords_version:
+        renamed_matcher.set_prefixes(metadata.keywords)
+        renamed_matcher_version = metadata.keywords_version
+    return renamed_matcher
+
+def iter_file_groups(folder, extensions=SUPPORTED_EXTENSIONS, index=None, recursive=True):
+    """
+    Parcourt un dossier avec os.scandir et produit les groupes de fichiers dossier par dossier,
+    dès que chaque dossier a été lu. Les fichiers qui partagent le même nom de base dans le même
+    dossier forment un groupe. Seule la pile des sous-dossiers restant à visiter est gardée en mémoire.
+
+    Args:
+        folder (str): Le dossier racine à parcourir.
+        extensions (frozenset): Les extensions acceptées, en minuscules.
+        index (ScanIndex, optional): Index persistant ; les dossiers dont le mtime n'a pas changé
+            sont servis depuis l'index sans être relus.
+        recursive (bool): Parcourir aussi les sous-dossiers ; sinon seuls les fichiers du dossier sont lus.
+
+    Yields:
+        tuple: (chemin du dossier, dictionnaire {nom de base: FileGroup}). Le chemin du dossier est interné
+        et partagé par tous ses groupes.
+    """
+    pending_dirs = [folder]
+    metrics = get_metrics()
+
+    while pending_dirs:
+        # Le temps de lecture de chaque dossier est comptabilisé dans la phase « scan »
+        start = time.perf_counter()
+        root = sys.intern(pending_dirs.pop())
+        file_groups = {}
+        subdirs = []
+        group_members = {}
 
-    for root, dirs, files in os.walk(folder):
-        valid_files = [file for file in files if any(file.endswith(ext) for ext in extensions)]
-        if not valid_files:
+        if index is not None:
+            try:
+                mtime_ns, cached = index.lookup_directory(root)
+            except OSError as e:
+                metrics.error(f"scan:{type(e).__name__}")
+                print(f"Impossible de lire le dossier {root} : {e}")
+                continue
+            if cached is not None:
+                subdirs, file_groups = cached
+                if recursive:
+                    pending_dirs.extend(reversed(subdirs))
+                metrics.add_time('scan', time.perf_counter() - start)
+                metrics.increment('directories_cached')
+                if file_groups:
+                    yield root, file_groups
+                continue
+
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            # Ne pas suivre les liens symboliques vers des dossiers, comme os.walk
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+                    except OSError:
+                        continue
+
+                    base_name, ext = split_extension(entry.name)
+                    if ext in extensions:
+                        group = file_groups.get(base_name)
+                        if group is None:
+                            group = file_groups[base_name] = FileGroup(root, base_name)
+                        group.add(entry.name)
+                        if index is not None:
+                            stat = entry.stat()
+                            group_members.setdefault(base_name, []).append(
+                                (entry.name, stat.st_size, stat.st_mtime_ns))
+        except OSError as e:
+            metrics.error(f"scan:{type(e).__name__}")
+            print(f"Impossible de lire le dossier {root} : {e}")
             continue
 
-        # Grouper les fichiers par dossier (root) et nom de base
-        file_groups = {}
-        for file in valid_files:
-            if file.endswith('.shp.xml'):
-                base_name = file[:-8]  # Retire ".shp.xml" du nom du fichier
-            else:
-                base_name, ext = os.path.splitext(file)
+        if index is not None:
+            index.record_directory(root, mtime_ns, subdirs, group_members)
 
-            if base_name not in file_groups:
-                file_groups[base_name] = []
-            file_groups[base_name].append(os.path.join(root, file))
+        # Empiler les sous-dossiers en ordre inverse pour les visiter dans l'ordre de lecture
+        if recursive:
+            pending_dirs.extend(reversed(subdirs))
+        metrics.add_time('scan', time.perf_counter() - start)
+        metrics.increment('directories')
 
-        # Ajouter les groupes de fichiers au dossier correspondant
-        file_groups_by_folder[root] = file_groups
-    
-    return file_groups_by_folder
+        if file_groups:
+            yield root, file_groups
 
-def process_files_in_directory(folder):
+def collect_files_by_extension(folder, extensions=SUPPORTED_EXTENSIONS):
+    """
+    Parcourt un dossier et regroupe les fichiers selon leur extension. Traite chaque dossier indépendamment,
+    regroupant les fichiers qui partagent le même nom de base dans le même dossier.
+    Construit l'ensemble des groupes en mémoire ; préférer iter_file_groups pour les grandes arborescences.
+    """
+    return dict(iter_file_groups(folder, extensions))
+
+def process_files_in_directory(folder, context=None, recursive=True):
     """
     Traite les fichiers dans chaque dossier spécifié, en regroupant les fichiers de même base
     et en les renommant selon les conventions définies, dossier par dossier.
-    """
-    file_groups_by_folder = collect_files_by_extension(folder, SUPPORTED_EXTENSIONS)
+    Le traitement d'un dossier commence dès qu'il a été lu, sans attendre la fin du parcours.
 
-    if not file_groups_by_folder:
+    Args:
+        folder (str): Le dossier racine à traiter.
+        context (RunContext, optional): Les options de l'exécution (mode batch, rapports, etc.).
+            Le traitement s'arrête avant le groupe suivant dès que son événement `stop` est positionné.
+        recursive (bool): Traiter aussi les sous-dossiers.
+    """
+    index = context.index if context is not None else None
+    prefetcher = context.prefetcher if context is not None else Prefetcher()
+    executor = get_executor(context)
+    found_any = False
+    current_folder = None
+
+    # Traiter chaque dossier indépendamment ; la détection des groupes suivants se fait en arrière-plan
+    stop = context.stop if context is not None else None
+    items = iter_group_items(folder, index, context.dedup if context is not None else None, recursive)
+    for (group, already_renamed, original), prefetched in prefetcher.iterate(
+            items, lambda item: make_detection_job(item, index)):
+        if stop is not None and stop.is_set():
+            break
+        found_any = True
+        if group.directory != current_folder:
+            current_folder = group.directory
+            print(f"Traitement des fichiers dans le dossier : {current_folder}")
+        process_group_item(group, already_renamed, context, prefetched, original)
+        executor.drain()
+
+    # Attendre les renommages encore en cours avant de rendre la main
+    executor.shutdown()
+
+    if not found_any:
         print(f"Aucun fichier valide trouvé dans le dossier {folder}.")
+
+def process_group_item(group, already_renamed, context=None, prefetched=None, original=None):
+    """
+    Traite un groupe (FileGroup) issu du parcours : signale les groupes déjà conformes,
+    écarte ceux en quarantaine, traite les doublons d'un groupe déjà vu (original) et renomme les autres.
+    """
+    folder_path, base_name = group.key
+    index = context.index if context is not None else None
+    quarantine = context.quarantine if context is not None else set()
+    get_metrics().increment('groups')
+    if already_renamed:
+        skip_renamed_group(folder_path, base_name, index)
+    elif (folder_path, base_name) in quarantine:
+        print(f"Groupe '{base_name}' en quarantaine (contrôle d'intégrité), fichiers ignorés.")
+        if index is not None:
+            index.update_group(folder_path, base_name, state=STATE_SKIPPED)
+    elif original is None or not process_duplicate_group(group, original, context):
+        process_file_group(group, context, prefetched)
+
+def process_duplicate_group(group, original, context):
+    """
+    Traite un groupe identique à un groupe déjà vu : il est ignoré (mode 'skip') ou renommé avec
+    le suffixe et les métadonnées retenus pour le premier exemplaire (mode 'reuse').
+
+    Returns:
+        bool: False si aucune décision n'a été prise pour le premier exemplaire ; le groupe est alors traité normalement.
+    """
+    dedup = context.dedup
+    folder_path, base_name = group.key
+    original_path = os.path.join(original.directory, original.base_name)
+    if dedup.mode == MODE_SKIP:
+        print(f"Groupe '{base_name}' identique à '{original_path}', ignoré.")
+        dedup.report(group, original, 'ignoré')
+        if context.index is not None:
+            context.index.update_group(folder_path, base_name, state=STATE_SKIPPED)
+        return True
+
+    decision = dedup.decision(original)
+    if decision is None:
+        return False
+    suffix, chosen = decision
+    print(f"Groupe '{base_name}' identique à '{original_path}', décision reprise.")
+    dedup.report(group, original, 'repris')
+    # Le nom de base n'est repris que s'il avait été modifié pour le premier exemplaire
+    new_base_name = chosen['base_name'] if chosen['base_name'] != original.base_name else base_name
+    rename_file_group(group.files, chosen['prefix'], chosen['source'], chosen['year'], chosen['scale'], suffix,
+                      new_base_name, context.journal, get_executor(context),
+                      index_updater(context.index, folder_path, base_name), reason=f"doublon de {original_path}")
+    return True
+
+def record_decision(group, suffix, chosen, base_name, plan, context=None):
+    """
+    Enregistre la décision prise pour un groupe (suffixe, métadonnées retenues et nom de base),
+    pour la reprendre sur ses doublons.
+    """
+    if context is None or context.dedup is None:
         return
+    context.dedup.record(group, suffix, {'prefix': chosen['prefix'], 'source': chosen['source'],
+                                         'year': chosen['year'], 'scale': chosen['scale'],
+                                         'base_name': base_name}, plan)
+
+def get_executor(context=None):
+    """
+    Retourne l'exécuteur de renommages du contexte, ou l'exécuteur séquentiel par défaut.
+    """
+    if context is not None and context.executor is not None:
+        return context.executor
+    return rename_executor
 
-    # Traiter chaque dossier indépendamment
-    for folder_path, file_groups in file_groups_by_folder.items():
-        print(f"Traitement des fichiers dans le dossier : {folder_path}")
-        for base_name, files in file_groups.items():
-            process_file_group(base_name, files)
+def iter_group_items(folder, index=None, dedup=None, recursive=True):
+    """
+    Produit les groupes de l'arborescence dans l'ordre des dossiers, en signalant ceux déjà conformes
+    et, avec un détecteur de doublons, ceux identiques à un groupe déjà vu.
 
-def process_file_group(base_name, files):
+    Yields:
+        tuple: (FileGroup, True si le groupe est déjà renommé, premier exemplaire s'il s'agit d'un doublon ou None).
+    """
+    for _, file_groups in iter_file_groups(folder, index=index, recursive=recursive):
+        # Écarter les groupes déjà conformes avant toute détection de géométrie
+        renamed = set(get_renamed_matcher().classify(file_groups)[0])
+        for base_name, group in file_groups.items():
+            already_renamed = base_name in renamed
+            original = dedup.find_original(group) if dedup is not None and not already_renamed else None
+            yield group, already_renamed, original
+
+def make_detection_job(item, index=None):
     """
-    Traite un groupe de fichiers ayant le même nom de base dans le même dossier. 
+    Prépare la détection anticipée d'un groupe (suffixe et préfixe), exécutée en arrière-plan.
+    Appelée dans le thread principal ; retourne None si le groupe n'a rien à détecter.
+    """
+    group, already_renamed, original = item
+    folder_path, base_name = group.key
+    primary_file = group.primary_file()
+    # Les doublons reprennent en principe la décision de leur premier exemplaire : rien à détecter à l'avance
+    if already_renamed or original is not None or not primary_file:
+        return None
+
+    # Inutile de relire la géométrie si l'index connaît déjà le suffixe
+    needs_suffix = index is None or index.get_group(folder_path, base_name)[0] is None
+
+    def detect():
+        keywords_version = metadata.keywords_version
+        return {
+            'suffix': identify_suffix(primary_file, verbose=False) if needs_suffix else None,
+            'prefix': detect_prefix(folder_path, base_name),
+            'base_name': base_name,
+            'keywords_version': keywords_version
+        }
+    return detect
+
+def prefetched_prefix(prefetched, base_name):
+    """
+    Retourne le préfixe détecté à l'avance s'il est encore valable pour ce nom de base, sinon None.
+    """
+    if (prefetched is None or prefetched['base_name'] != base_name
+            or prefetched['keywords_version'] != metadata.keywords_version):
+        return None
+    return prefetched['prefix']
+
+def rebuild_index(folder, index):
+    """
+    Reconstruit l'index à partir de zéro : parcourt toute l'arborescence, détecte le suffixe
+    et l'état « déjà renommé » de chaque groupe, sans rien renommer ni poser de question.
+    """
+    index.clear()
+    group_count = 0
+    for folder_path, file_groups in iter_file_groups(folder, index=index):
+        for base_name, group in file_groups.items():
+            primary_file = group.primary_file()
+            if not primary_file:
+                continue
+            group_count += 1
+            if get_renamed_matcher().matches(base_name):
+                index.update_group(folder_path, base_name, state=STATE_RENAMED)
+            else:
+                index.update_group(folder_path, base_name, suffix=identify_suffix(primary_file))
+    print(f"Index reconstruit : {group_count} groupe(s) indexé(s).")
+
+def skip_renamed_group(folder_path, base_name, index=None):
+    """
+    Signale un groupe déjà conforme à la convention et enregistre son état dans l'index.
+    """
+    print(f"Le fichier '{base_name}' est déjà renommé selon la convention.")
+    get_metrics().increment('groups_already_renamed')
+    if index is None:
+        return
+    if index.get_group(folder_path, base_name)[1] == STATE_RENAMED:
+        index.cache_hits += 1
+    else:
+        index.recomputed += 1
+        index.update_group(folder_path, base_name, state=STATE_RENAMED)
+
+def process_file_group(group, context=None, prefetched=None):
+    """
+    Traite un groupe de fichiers (FileGroup) ayant le même nom de base dans le même dossier.
     Collecte les métadonnées, détecte le suffixe si nécessaire et renomme chaque fichier dans le groupe.
+    En mode batch (contexte avec règles), les métadonnées viennent des règles et aucune question n'est posée.
+    Le suffixe et le préfixe détectés à l'avance (prefetched) sont réutilisés s'ils sont fournis.
+    Les chemins des fichiers ne sont construits que pour les groupes effectivement renommés.
     """
     global last_source, last_year, last_scale  # Réutiliser les dernières valeurs saisies
-    file_dir = os.path.dirname(files[0])
+    file_dir, base_name = group.key
     print(f"Renommage des fichiers dans le dossier : {file_dir}")
 
-    # Identifier le fichier .shp comme représentant principal du groupe shapefile
-    shp_file = next((f for f in files if f.endswith('.shp')), None)
+    # Identifier le fichier principal du groupe (.shp, .gpkg, etc.), dont on lit la géométrie
+    primary_file = group.primary_file()
 
-    # Ignorer les groupes sans fichier .shp
-    if not shp_file:
-        print(f"Aucun fichier .shp trouvé pour le groupe '{base_name}', fichiers ignorés.")
+    # Ignorer les groupes sans fichier principal
+    if not primary_file:
+        print(f"Aucun fichier principal ({', '.join(PRIMARY_EXTENSIONS)}) trouvé pour le groupe '{base_name}', fichiers ignorés.")
         return
 
-    base_name_with_extension = os.path.basename(shp_file)
+    base_name_with_extension = os.path.basename(primary_file)
+    index = context.index if context is not None else None
+
+    # Réutiliser le suffixe et l'état connus de l'index si les fichiers du groupe n'ont pas changé
+    cached_suffix, cached_state = index.get_group(file_dir, base_name) if index is not None else (None, None)
+    if cached_state == STATE_RENAMED:
+        index.cache_hits += 1
+        print(f"Le fichier '{base_name}' est déjà renommé selon la convention.")
+        get_metrics().increment('groups_already_renamed')
+        return
 
     # Vérifier si le fichier est déjà renommé selon les préfixes dynamiques
-    if is_file_already_renamed(base_name, dynamic_prefixes):
+    if get_renamed_matcher().matches(base_name):
         print(f"Le fichier '{base_name}' est déjà renommé selon la convention.")
+        get_metrics().increment('groups_already_renamed')
+        if index is not None:
+            index.recomputed += 1
+            index.update_group(file_dir, base_name, state=STATE_RENAMED)
         return
 
-    # Si un fichier .shp est trouvé, détecter le suffixe
-    suffix = identify_suffix(shp_file)
+    # Détecter le suffixe à partir du fichier principal
+    if cached_suffix is not None:
+        index.cache_hits += 1
+        suffix = cached_suffix
+    else:
+        if prefetched is not None and prefetched['suffix'] is not None:
+            suffix = prefetched['suffix']
+        else:
+            suffix = identify_suffix(primary_file)
+        if index is not None:
+            index.recomputed += 1
+            index.update_group(file_dir, base_name, suffix=suffix)
+    if suffix is None:
+        print(f"Groupe '{base_name}' ignoré : le fichier principal n'a pas le contenu attendu.")
+        get_metrics().increment('groups_skipped')
+        if index is not None:
+            index.update_group(file_dir, base_name, state=STATE_SKIPPED)
+        return
     print(f"Suffixe détecté : {suffix}")
 
+    if context is not None and context.batch:
+        process_file_group_from_rules(group, suffix, context, prefetched)
+        return
+
+    files = group.files
+
     # Proposer la modification du nom de base
     base_name_modified = ask_if_change_base_name(base_name_with_extension, base_name, files, file_dir)
 
-    # Appliquer le changement de nom de base avant d'obtenir les métadonnées
-    rename_files_with_new_base_name(base_name, base_name_modified, files, file_dir)
-
-    # Obtenir les métadonnées après modification du nom
-    metadata = get_metadata_for_file(base_name_modified, files, last_source, last_year, last_scale)
+    # Obtenir les métadonnées avec le nom modifié ; les fichiers ne seront renommés qu'une fois, à la fin
+    metadata = get_metadata_for_file(base_name_modified, files, last_source, last_year, last_scale,
+                                     prefetched_prefix(prefetched, base_name_modified))
 
     if metadata is None:
+        get_metrics().increment('groups_skipped')
+        if index is not None:
+            index.update_group(file_dir, base_name, state=STATE_SKIPPED)
         return
 
     # Mémoriser les métadonnées pour les prochaines utilisations
@@ -110,64 +417,110 @@ def process_file_group(base_name, files):
     last_scale = metadata['scale']
 
     # Renommer le groupe de fichiers en fonction des métadonnées et du suffixe détecté
-    rename_file_group(files, metadata['prefix'], metadata['source'], metadata['year'], metadata['scale'], suffix)
+    journal = context.journal if context is not None else None
+    plan = rename_file_group(files, metadata['prefix'], metadata['source'], metadata['year'], metadata['scale'], suffix,
+                             base_name_modified, journal, get_executor(context),
+                             index_updater(index, file_dir, base_name), failure_handler(group, context), 'interactif')
+    record_decision(group, suffix, metadata, base_name_modified, plan, context)
 
-def rename_files_with_new_base_name(base_name, base_name_modified, files, file_dir):
+def process_file_group_from_rules(group, suffix, context, prefetched=None):
     """
-    Renomme temporairement les fichiers avec le nouveau nom de base en prenant en compte toutes les extensions
-    associées aux shapefiles (.shp, .shx, .dbf, .prj, .sbn, .sbx, .xml, etc.).
+    Renomme un groupe sans interaction à partir des règles du mode batch.
+    Les groupes pour lesquels les règles ne suffisent pas sont ajoutés au rapport de vérification et ignorés.
     """
-    if base_name_modified != base_name:
-        for i, file in enumerate(files):
-            if file.endswith('.shp.xml'):
-                new_file_name = f"{base_name_modified}.shp.xml"
-            else:
-                extension = os.path.splitext(file)[1]
-                new_file_name = f"{base_name_modified}{extension}"
+    file_dir, base_name = group.key
+    files = group.files
+    metadata, reason = get_metadata_from_rules(base_name, files, context.rules, prefetched_prefix(prefetched, base_name))
+
+    if metadata is None:
+        print(f"Groupe '{base_name}' ignoré, à vérifier : {reason}.")
+        get_metrics().increment('groups_skipped')
+        if context.review is not None:
+            context.review.add(file_dir, base_name, files, reason)
+        if context.index is not None:
+            context.index.update_group(file_dir, base_name, state=STATE_SKIPPED)
+        return
 
-            new_file_path = os.path.join(file_dir, new_file_name)
+    plan = rename_file_group(files, metadata['prefix'], metadata['source'], metadata['year'], metadata['scale'], suffix,
+                             metadata['base_name'], context.journal, get_executor(context),
+                             index_updater(context.index, file_dir, base_name), failure_handler(group, context), 'règles')
+    record_decision(group, suffix, metadata, metadata['base_name'], plan, context)
 
-            # Vérifier si le fichier cible existe déjà et l'ignorer si c'est le cas
-            if os.path.exists(new_file_path):
-                print(f"Le fichier '{os.path.basename(new_file_path)}' existe déjà. Ignoré.")
-                continue  # Ne pas essayer de renommer si le fichier existe déjà
+def failure_handler(group, context=None):
+    """
+    Retourne la fonction appelée si le renommage d'un groupe échoue, ou None sans détecteur de doublons :
+    les fichiers du groupe, restés sous leur ancien nom, servent alors aux comparaisons suivantes.
+    """
+    if context is None or context.dedup is None:
+        return None
+    return lambda: context.dedup.forget_plan(group)
 
-            try:
-                os.rename(file, new_file_path)
-                files[i] = new_file_path  # Mettre à jour la liste avec le nouveau chemin
-                # Afficher seulement le nom de base, sans le chemin complet
-                print(f"Renommage temporaire de '{os.path.basename(file)}' en '{os.path.basename(new_file_path)}'")
-            except OSError as e:
-                print(f"Erreur lors du renommage de '{os.path.basename(file)}' : {e}")
+def index_updater(index, file_dir, base_name):
+    """
+    Retourne la fonction qui enregistre dans l'index les nouveaux chemins d'un groupe renommé, ou None sans index.
+    """
+    if index is None:
+        return None
+    return lambda new_paths: index.mark_renamed(file_dir, base_name, new_paths)
 
 def ask_if_change_base_name(base_name_with_extension, base_name, files, file_dir):
     """
     Demande à l'utilisateur s'il souhaite modifier le nom de base d'un fichier.
     """
-    change_base_name = input(f"Souhaitez-vous modifier le nom de base '{base_name_with_extension}' ? (o/n) [n] : ").lower()
+    change_base_name = ask(f"Souhaitez-vous modifier le nom de base '{base_name_with_extension}' ? (o/n) [n] : ").lower()
 
     if change_base_name in ['o', 'oui']:
-        base_name_modified_input = input(f"Entrez le nouveau nom de base pour '{base_name_with_extension}' : ").strip()
+        base_name_modified_input = ask(f"Entrez le nouveau nom de base pour '{base_name_with_extension}' : ").strip()
         if base_name_modified_input:
             print(f"Le nom de base '{base_name}' a été modifié en '{base_name_modified_input}'.")
             return base_name_modified_input
 
     return base_name
 
-def rename_file_group(files, prefix, source, year, scale, suffix):
+def rename_file_group(files, prefix, source, year, scale, suffix, base_name=None, journal=None, executor=None,
+                      on_complete=None, on_failure=None, reason=None):
     """
     Renomme un groupe de fichiers en fonction des métadonnées fournies et du suffixe détecté.
+    Le nom final de chaque fichier est calculé à l'avance (y compris un éventuel nouveau nom de base),
+    puis le groupe est confié à l'exécuteur, qui renomme chaque fichier une seule fois.
+
+    Args:
+        files (list): Les chemins des fichiers du groupe.
+        prefix, source, year, scale, suffix (str): Les éléments de la convention de nommage.
+        base_name (str, optional): Nouveau nom de base choisi par l'utilisateur ; par défaut celui du groupe.
+        journal (RenameJournal, optional): Journal dans lequel les renommages sont enregistrés avant exécution.
+        executor (RenameExecutor, optional): L'exécuteur des renommages ; par défaut, exécution immédiate.
+        on_complete (callable, optional): Appelée dans le thread principal avec les chemins des fichiers
+            du groupe après renommage ; elle n'est pas appelée si le groupe a échoué.
+        on_failure (callable, optional): Appelée sans argument dans le thread principal si le groupe a échoué.
+        reason (str, optional): Le motif de la décision (règles, saisie interactive, doublon), consigné avec le renommage.
+
+    Returns:
+        list: Le plan de renommage, couples (ancien chemin, nouveau chemin).
     """
-    for file in files:
-        if not is_file_already_renamed(file, dynamic_prefixes):
-            new_name = apply_naming_convention(file, prefix, suffix, source, year, scale)
-
-            if isinstance(new_name, str):
-                os.rename(file, os.path.join(os.path.dirname(file), new_name))
-                
-                # Afficher uniquement le fichier .shp lors du renommage
-                if file.endswith('.shp'):
-                    log_info(f"Renommage de {os.path.basename(file)} en {new_name}")
-                    print(f"Renommage de '{os.path.basename(file)}' en '{new_name}'")
-            else:
-                print(f"Erreur : Le nouveau nom pour le fichier '{os.path.basename(file)}' n'est pas valide : {new_name}")
+    if base_name is None:
+        base_name = split_extension(os.path.basename(files[0]))[0]
+
+    metrics = get_metrics()
+    with metrics.timer('naming'):
+        plan = rename_planner.plan_group(files, base_name, prefix, suffix, source, year, scale, get_renamed_matcher())
+    if plan is None:
+        # Collision ou nom invalide : aucun fichier du groupe n'est renommé
+        metrics.increment('groups_collision')
+        run_log.get_logger().log('group_skipped', files=[os.path.abspath(file) for file in files], reason='collision')
+        return []
+    details = {'prefix': prefix, 'suffix': suffix, 'source': source, 'year': year, 'scale': scale, 'reason': reason}
+
+    def complete(done):
+        # Un plan non vide sans aucun renommage effectué signifie que le groupe a échoué et a été annulé
+        if plan and not done:
+            if on_failure is not None:
+                on_failure()
+            return
+        if on_complete is None:
+            return
+        new_path_by_file = dict(done)
+        on_complete([new_path_by_file.get(file, file) for file in files])
+
+    (executor or rename_executor).submit(plan, journal, details, complete)
+    return plan
@@ -0,0 +1,208 @@
+import re
+
+from gpkg_reader import MIXED_SUFFIX
+
+# Taille des blocs lus dans le fichier (octets)
+CHUNK_SIZE = 64 * 1024
+
+# Nombre de géométries examinées au plus avant de conclure
+DEFAULT_SAMPLE_CAP = 1000
+
+# Correspondance entre les types de géométrie GeoJSON et les suffixes de la convention de nommage
+GEOMETRY_TYPE_SUFFIXES = {
+    'Point': 'pt', 'MultiPoint': 'pt',
+    'LineString': 'line', 'MultiLineString': 'line',
+    'Polygon': 'poly', 'MultiPolygon': 'poly',
+}
+
+# Types d'objet qui suffisent à reconnaître un document GeoJSON (à la racine ou dans `features`).
+# Une GeometryCollection n'est pas comptée elle-même : ses membres le sont individuellement.
+FEATURE_TYPES = frozenset(['Feature', 'FeatureCollection'])
+
+# Jetons structurels du flux : chaîne (suivie de « : » pour une clé), ou accolade/crochet.
+# Les nombres, booléens et null sont sautés par la recherche elle-même.
+TOKEN_PATTERN = re.compile(rb'"([^"\\]*(?:\\.[^"\\]*)*)"(\s{0,16}:)?|([{}\[\]])|"')
+
+# Contenu d'un tableau de coordonnées (nombres, virgules, crochets), sauté en un seul appel
+COORDINATES_PATTERN = re.compile(rb'[-+0-9.eE\s,\[\]]*')
+
+# Objet sans objet imbriqué, sauté en un seul appel : attributs à plat (sans tableau), ou géométrie simple
+# (tableaux de coordonnées permis) dont le type est ensuite cherché dans le texte de l'objet
+FLAT_PROPERTIES_PATTERN = re.compile(rb'\{[^{}\[\]"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}\[\]"]*)*\}')
+FLAT_GEOMETRY_PATTERN = re.compile(rb'\{[^{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}"]*)*\}')
+GEOMETRY_TYPE_PATTERN = re.compile(rb'"type"\s{0,16}:\s{0,16}"([A-Za-z]+)"')
+
+# Longueur maximale d'une clé courte (type, geometry...) : une chaîne plus proche de la fin du bloc est relue
+# avec le bloc suivant, le « : » qui la suit pouvant s'y trouver
+TAIL_MARGIN = 17
+
+
+# Types de géométrie tels qu'écrits dans le flux
+GEOMETRY_TYPE_NAMES = {name.encode('ascii'): name for name in GEOMETRY_TYPE_SUFFIXES}
+FEATURE_TYPE_NAMES = frozenset(name.encode('ascii') for name in FEATURE_TYPES)
+
+
+def iter_geojson_events(f):
+    """
+    Lit un flux JSON par blocs et produit les éléments GeoJSON reconnus, en suivant l'imbrication des objets :
+    seuls les `type` des objets de géométrie (valeur d'une clé `geometry`, membre de `geometries`, ou objet racine)
+    sont comptés, jamais ceux des attributs (`properties`).
+
+    Yields:
+        str or None: Le type de géométrie rencontré, None pour une géométrie nulle, ou '' pour un élément
+        de structure GeoJSON (Feature, FeatureCollection, GeometryCollection).
+    """
+    # Objets et tableaux ouverts : (clé sous laquelle ils se trouvent, ignoré car situé sous `properties`)
+    stack = []
+    key = None          # Dernière clé lue, dont la valeur est attendue si expect_value
+    expect_value = False
+    coordinates_depth = 0
+    pending = b''
+
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        final = not chunk
+        data = pending + chunk
+        pending = b''
+        position = 0
+        limit = len(data) if final else len(data) - TAIL_MARGIN
+
+        if coordinates_depth:
+            run = COORDINATES_PATTERN.match(data, position).group()
+            coordinates_depth = max(0, coordinates_depth + run.count(b'[') - run.count(b']'))
+            position = len(run)
+            if coordinates_depth > 0:
+                if final:
+                    return
+                continue
+
+        while True:
+            match = TOKEN_PATTERN.search(data, position)
+            if match is None:
+                break
+            text, colon, bracket = match.groups()
+            if bracket is None and (match.end() > limit or (text is None and not final)):
+                # Chaîne coupée par la fin du bloc, ou dont le « : » peut se trouver dans le bloc suivant
+                pending = data[match.start():]
+                break
+            position = match.end()
+
+            if text is not None:
+                if colon is not None:
+                    # Valeur non structurée (null, nombre) de la clé précédente : géométrie nulle
+                    if expect_value and key == b'geometry' and stack and not stack[-1][1]:
+                        yield None
+                    key, expect_value = text, True
+                    continue
+                if expect_value and key == b'type' and stack and not stack[-1][1]:
+                    frame_key = stack[-1][0]
+                    parent_key = stack[-2][0] if frame_key is None and len(stack) > 1 else None
+                    is_root = len(stack) == 1
+                    in_geometry = is_root or frame_key == b'geometry' or parent_key == b'geometries'
+                    if text in FEATURE_TYPE_NAMES and (is_root or parent_key == b'features'):
+                        yield ''
+                    elif text == b'GeometryCollection' and in_geometry:
+                        yield ''
+                    elif in_geometry and text in GEOMETRY_TYPE_NAMES:
+                        yield GEOMETRY_TYPE_NAMES[text]
+                expect_value = False
+                continue
+            if bracket is None:
+                # Guillemet isolé en fin de fichier
+                continue
+
+            if bracket == b'{' or bracket == b'[':
+                parent_ignored = stack[-1][1] if stack else False
+                frame_key = key if expect_value else None
+                expect_value = False
+                if frame_key == b'properties' and bracket == b'{':
+                    flat = FLAT_PROPERTIES_PATTERN.match(data, match.start())
+                    if flat is not None:
+                        # Attributs à plat entièrement dans le bloc : sautés sans les parcourir jeton par jeton
+                        position = flat.end()
+                        continue
+                elif frame_key == b'geometry' and bracket == b'{':
+                    flat = FLAT_GEOMETRY_PATTERN.match(data, match.start())
+                    if flat is not None:
+                        # Géométrie simple entièrement dans le bloc : seul son type est cherché
+                        position = flat.end()
+                        geometry_type = GEOMETRY_TYPE_PATTERN.search(flat.group())
+                        if not parent_ignored and geometry_type is not None \
+                                and geometry_type.group(1) in GEOMETRY_TYPE_NAMES:
+                            yield GEOMETRY_TYPE_NAMES[geometry_type.group(1)]
+                        continue
+                elif frame_key == b'coordinates' and bracket == b'[':
+                    # Les coordonnées ne contiennent ni chaîne ni objet : elles sont sautées d'un bloc
+                    run = COORDINATES_PATTERN.match(data, position)
+                    coordinates_depth = 1 + run.group().count(b'[') - run.group().count(b']')
+                    position = run.end()
+                    if coordinates_depth > 0:
+                        break
+                    continue
+                stack.append((frame_key, parent_ignored or frame_key == b'properties'))
+            else:
+                if expect_value and key == b'geometry' and stack and not stack[-1][1]:
+                    yield None
+                expect_value = False
+                if stack:
+                    stack.pop()
+        if final:
+            return
+
+
+def sniff_geojson(file_path, sample_cap=DEFAULT_SAMPLE_CAP):
+    """
+    Identifie les géométries d'un fichier GeoJSON en le lisant par blocs depuis le début, sans le charger
+    ni le décoder entièrement. La lecture s'arrête dès que deux familles de géométrie différentes
+    ont été vues (`mixed`) ou que `sample_cap` géométries ont été examinées ; la mémoire utilisée
+    ne dépend pas de la taille du fichier.
+
+    Args:
+        file_path (str): Chemin du fichier .geojson ou .json.
+        sample_cap (int, optional): Nombre maximal de géométries examinées ; None pour lire tout le fichier.
+
+    Returns:
+        tuple: (types de géométrie vus, nombre de géométries examinées, suffixe). Le suffixe vaut
+        pt/line/poly, `mixed`, `empty` (GeoJSON sans géométrie) ou None si le fichier n'est pas du GeoJSON.
+
+    Raises:
+        OSError: Si le fichier ne peut pas être lu.
+    """
+    geometry_types = set()
+    suffixes = set()
+    samples = 0
+    is_geojson = False
+
+    with open(file_path, 'rb') as f:
+        for geometry_type in iter_geojson_events(f):
+            is_geojson = True
+            if geometry_type == '':
+                continue
+            samples += 1
+            if geometry_type is not None:
+                geometry_types.add(geometry_type)
+                suffixes.add(GEOMETRY_TYPE_SUFFIXES[geometry_type])
+            if len(suffixes) > 1 or (sample_cap is not None and samples >= sample_cap):
+                break
+
+    return sorted(geometry_types), samples, classify(suffixes, is_geojson)
+
+
+def is_geojson_file(file_path):
+    """
+    Indique si un fichier (.json par exemple) a une structure GeoJSON ; la lecture s'arrête au premier
+    élément reconnu. Un fichier illisible n'est pas considéré comme du GeoJSON.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return next(iter_geojson_events(f), False) is not False
+    except OSError:
+        return False
+
+
+def classify(suffixes, is_geojson):
+    if len(suffixes) > 1:
+        return MIXED_SUFFIX
+    if suffixes:
+        return next(iter(suffixes))
+    return 'empty' if is_geojson else None
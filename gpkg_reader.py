@@ -0,0 +1,122 @@
+import os
+import sqlite3
+from urllib.request import pathname2url
+
+# Correspondance entre les types de géométrie GeoPackage (en majuscules) et les suffixes de la convention de nommage
+GEOMETRY_TYPE_SUFFIXES = {
+    'POINT': 'pt', 'MULTIPOINT': 'pt',
+    'LINESTRING': 'line', 'MULTILINESTRING': 'line', 'CIRCULARSTRING': 'line', 'COMPOUNDCURVE': 'line',
+    'CURVE': 'line', 'MULTICURVE': 'line',
+    'POLYGON': 'poly', 'MULTIPOLYGON': 'poly', 'CURVEPOLYGON': 'poly', 'SURFACE': 'poly', 'MULTISURFACE': 'poly',
+    'POLYHEDRALSURFACE': 'poly', 'TIN': 'poly', 'TRIANGLE': 'poly',
+}
+
+# Suffixe d'un GeoPackage dont les couches non vides ont des types de géométrie différents
+MIXED_SUFFIX = 'mixed'
+
+
+class GeoPackageError(ValueError):
+    """
+    Levée lorsque le fichier n'est pas un GeoPackage lisible (base SQLite invalide ou tables système absentes).
+    """
+
+
+def open_readonly(geopackage):
+    """
+    Ouvre un GeoPackage en lecture seule, sans créer de journal ni verrouiller le fichier en écriture.
+    """
+    uri = f"file:{pathname2url(os.path.abspath(geopackage))}?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_exists(connection, table_name):
+    return connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone() is not None
+
+
+def read_layers(geopackage):
+    """
+    Liste les couches vectorielles d'un GeoPackage à partir des tables gpkg_contents et gpkg_geometry_columns.
+    Le nombre d'entités vient de gpkg_ogr_contents lorsque cette table est tenue à jour, sinon d'un COUNT(*).
+
+    Args:
+        geopackage (str): Chemin du fichier .gpkg.
+
+    Returns:
+        list: Un dictionnaire par couche : `table_name`, `geometry_type` (en majuscules) et `feature_count`.
+
+    Raises:
+        GeoPackageError: Si le fichier n'est pas un GeoPackage lisible.
+    """
+    try:
+        connection = open_readonly(geopackage)
+    except sqlite3.Error as e:
+        raise GeoPackageError(f"Ouverture impossible : {e}") from e
+
+    try:
+        if not table_exists(connection, 'gpkg_contents') or not table_exists(connection, 'gpkg_geometry_columns'):
+            raise GeoPackageError("Tables gpkg_contents ou gpkg_geometry_columns absentes")
+
+        rows = connection.execute(
+            "SELECT c.table_name, g.geometry_type_name FROM gpkg_contents c "
+            "JOIN gpkg_geometry_columns g ON g.table_name = c.table_name "
+            "WHERE c.data_type = 'features' ORDER BY c.table_name").fetchall()
+
+        ogr_counts = {}
+        if table_exists(connection, 'gpkg_ogr_contents'):
+            ogr_counts = {name: count for name, count in connection.execute(
+                "SELECT table_name, feature_count FROM gpkg_ogr_contents") if count is not None}
+
+        layers = []
+        for table_name, geometry_type in rows:
+            feature_count = ogr_counts.get(table_name)
+            if feature_count is None:
+                feature_count = connection.execute(
+                    f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+            layers.append({'table_name': table_name, 'geometry_type': (geometry_type or '').upper(),
+                           'feature_count': feature_count})
+        return layers
+    except sqlite3.Error as e:
+        raise GeoPackageError(f"Lecture impossible : {e}") from e
+    finally:
+        connection.close()
+
+
+def layers_suffix(layers):
+    """
+    Détermine le suffixe d'un GeoPackage à partir de ses couches.
+
+    Seules les couches non vides sont prises en compte : sans entité le suffixe est `empty`,
+    un type commun donne pt/line/poly, des types différents donnent `mixed`.
+    Une couche de type générique (GEOMETRY, GEOMETRYCOLLECTION) ne peut pas être classée : `unknown`.
+    """
+    populated = [layer for layer in layers if layer['feature_count']]
+    if not populated:
+        return 'empty'
+    suffixes = {GEOMETRY_TYPE_SUFFIXES.get(layer['geometry_type']) for layer in populated}
+    if None in suffixes:
+        return 'unknown' if len(suffixes) == 1 else MIXED_SUFFIX
+    return suffixes.pop() if len(suffixes) == 1 else MIXED_SUFFIX
+
+
+def sniff_geopackage(geopackage):
+    """
+    Identifie les géométries d'un GeoPackage sans ouvrir de pilote OGR.
+
+    Args:
+        geopackage (str): Chemin du fichier .gpkg.
+
+    Returns:
+        tuple: (types de géométrie des couches, nombre de couches, nombre total d'entités, suffixe).
+
+    Raises:
+        GeoPackageError: Si le fichier n'est pas un GeoPackage lisible.
+    """
+    layers = read_layers(geopackage)
+    geometry_types = sorted({layer['geometry_type'] for layer in layers})
+    feature_count = sum(layer['feature_count'] for layer in layers)
+    return geometry_types, len(layers), feature_count, layers_suffix(layers)
@@ -0,0 +1,260 @@
+import csv
+import os
+import struct
+
+import run_log
+from file_processor import iter_file_groups
+from metrics import get_metrics
+from prefetch import DEFAULT_WORKERS, Prefetcher
+from shapefile_header import HEADER_SIZE, MalformedHeaderError, count_shx_records, read_shp_header
+from utils import split_extension
+
+# Taille de la partie fixe de l'en-tête d'un fichier .dbf (dBase III)
+DBF_HEADER_SIZE = 32
+
+# Fichiers obligatoires et recommandés d'un groupe shapefile
+REQUIRED_EXTENSIONS = ('.shx', '.dbf')
+RECOMMENDED_EXTENSIONS = ('.cpg', '.prj')
+
+# Résultat du contrôle d'un groupe
+STATUS_OK = 'ok'
+STATUS_WARNING = 'avertissement'
+STATUS_QUARANTINE = 'quarantaine'
+
+INTEGRITY_COLUMNS = ['folder', 'base_name', 'status', 'problems']
+
+
+def read_dbf_header(dbf_file):
+    """
+    Lit la partie fixe de l'en-tête d'un fichier .dbf.
+
+    Returns:
+        dict: `record_count`, `header_length` et `record_length` (octets).
+
+    Raises:
+        MalformedHeaderError: Si l'en-tête est tronqué ou incohérent.
+    """
+    with open(dbf_file, 'rb') as f:
+        header = f.read(DBF_HEADER_SIZE)
+    if len(header) < DBF_HEADER_SIZE:
+        raise MalformedHeaderError(f"En-tête .dbf tronqué ({len(header)} octets)")
+    record_count, header_length, record_length = struct.unpack('<IHH', header[4:12])
+    if header_length < DBF_HEADER_SIZE + 1 or record_length == 0:
+        raise MalformedHeaderError(f"En-tête .dbf invalide (en-tête {header_length}, enregistrement {record_length})")
+    return {'record_count': record_count, 'header_length': header_length, 'record_length': record_length}
+
+
+def read_last_shx_record(shx_file, record_count):
+    """
+    Retourne la fin (en octets) du dernier enregistrement du .shp indexé par le .shx, ou None s'il est vide.
+    """
+    if record_count == 0:
+        return None
+    with open(shx_file, 'rb') as f:
+        f.seek(HEADER_SIZE + (record_count - 1) * 8)
+        offset_words, length_words = struct.unpack('>ii', f.read(8))
+    return offset_words * 2 + 8 + length_words * 2
+
+
+def check_group(files):
+    """
+    Contrôle la cohérence d'un groupe shapefile à partir des seuls en-têtes, sans Fiona :
+    longueur déclarée du .shp, nombre d'enregistrements du .shx et du .dbf, taille du .dbf,
+    présence des fichiers .shx et .dbf (obligatoires) et .cpg et .prj (recommandés).
+
+    Args:
+        files (list): Les chemins des fichiers du groupe.
+
+    Returns:
+        tuple: (erreurs, avertissements), deux listes de messages. Un groupe sans .shp n'est pas contrôlé.
+    """
+    by_extension = {}
+    for file in files:
+        by_extension.setdefault(split_extension(file)[1], file)
+    shp_file = by_extension.get('.shp')
+    if shp_file is None:
+        return [], []
+
+    errors = []
+    warnings = [f"fichier {ext} absent" for ext in RECOMMENDED_EXTENSIONS if ext not in by_extension]
+    errors += [f"fichier {ext} absent" for ext in REQUIRED_EXTENSIONS if ext not in by_extension]
+
+    try:
+        shp_size = os.path.getsize(shp_file)
+        declared_length = read_shp_header(shp_file)['file_length']
+        if declared_length != shp_size:
+            errors.append(f".shp : longueur déclarée {declared_length} octets, taille réelle {shp_size}")
+    except (MalformedHeaderError, OSError) as e:
+        errors.append(f".shp : {e}")
+        shp_size = None
+
+    shx_count = None
+    shx_file = by_extension.get('.shx')
+    if shx_file is not None:
+        try:
+            shx_size = os.path.getsize(shx_file)
+            declared_length = read_shp_header(shx_file)['file_length']
+            if declared_length != shx_size:
+                errors.append(f".shx : longueur déclarée {declared_length} octets, taille réelle {shx_size}")
+            shx_count = count_shx_records(shx_file)
+            last_end = read_last_shx_record(shx_file, shx_count)
+            if shp_size is not None and last_end is not None and last_end > shp_size:
+                errors.append(f".shx : le dernier enregistrement se termine à {last_end} octets, après la fin du .shp")
+        except (MalformedHeaderError, OSError, struct.error) as e:
+            errors.append(f".shx : {e}")
+
+    dbf_file = by_extension.get('.dbf')
+    if dbf_file is not None:
+        try:
+            dbf = read_dbf_header(dbf_file)
+            expected_size = dbf['header_length'] + dbf['record_count'] * dbf['record_length']
+            dbf_size = os.path.getsize(dbf_file)
+            # Le marqueur de fin de fichier (0x1A) est facultatif
+            if dbf_size < expected_size:
+                errors.append(f".dbf : taille {dbf_size} octets, {expected_size} attendus pour "
+                              f"{dbf['record_count']} enregistrement(s)")
+            if shx_count is not None and dbf['record_count'] != shx_count:
+                errors.append(f".dbf : {dbf['record_count']} enregistrement(s), .shx : {shx_count}")
+        except (MalformedHeaderError, OSError) as e:
+            errors.append(f".dbf : {e}")
+
+    return errors, warnings
+
+
+def check_groups(groups, workers=DEFAULT_WORKERS):
+    """
+    Contrôle des groupes en parallèle (lectures d'en-têtes, limitées par les entrées/sorties).
+    Les groupes sont tirés au fur et à mesure : seuls quelques contrôles par thread sont en cours à la fois.
+    Seuls les contrôles sont comptés dans la phase « integrity », le parcours l'étant déjà dans la phase « scan ».
+
+    Args:
+        groups (iterable): Les groupes (dossier, nom de base, fichiers).
+        workers (int): Le nombre de threads ; 0 pour un contrôle séquentiel.
+
+    Yields:
+        tuple: (dossier, nom de base, fichiers, erreurs, avertissements), dans l'ordre des groupes.
+    """
+    metrics = get_metrics()
+
+    def timed_check(files):
+        with metrics.timer('integrity'):
+            return check_group(files)
+
+    prefetcher = Prefetcher(workers, max(1, workers) * 4)
+    for (folder, base_name, files), (errors, warnings) in prefetcher.iterate(
+            groups, lambda group: lambda: timed_check(group[2])):
+        yield folder, base_name, files, errors, warnings
+
+
+class IntegrityReport:
+    """
+    Rapport CSV du contrôle d'intégrité : une ligne par groupe présentant une erreur ou un avertissement.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.counts = {STATUS_OK: 0, STATUS_WARNING: 0, STATUS_QUARANTINE: 0}
+        self._file = open(file_path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(INTEGRITY_COLUMNS)
+
+    def add(self, folder, base_name, status, problems):
+        self.counts[status] += 1
+        if status != STATUS_OK:
+            self._writer.writerow([folder, base_name, status, ' ; '.join(problems)])
+
+    def summary(self):
+        counts = self.counts
+        return (f"Contrôle d'intégrité : {counts[STATUS_OK]} groupe(s) cohérent(s), {counts[STATUS_WARNING]} "
+                f"avertissement(s), {counts[STATUS_QUARANTINE]} groupe(s) en quarantaine. Rapport : {self.file_path}")
+
+    def close(self):
+        self._file.close()
+
+
+def quarantine_group(files, root, quarantine_dir, journal=None):
+    """
+    Déplace les fichiers d'un groupe incohérent dans le dossier de quarantaine, en conservant
+    leur chemin relatif au dossier traité. Avec un journal, le déplacement peut être annulé (--rollback).
+
+    Returns:
+        list: Les couples (ancien chemin, nouveau chemin) effectivement déplacés.
+    """
+    plan = [(file, os.path.join(quarantine_dir, os.path.relpath(file, root))) for file in files]
+    seqs = journal.record_plan(plan) if journal is not None else [None] * len(plan)
+    moved = []
+    for (old_path, new_path), seq in zip(plan, seqs):
+        try:
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            if os.path.exists(new_path):
+                raise FileExistsError(f"'{new_path}' existe déjà")
+            os.rename(old_path, new_path)
+        except OSError as e:
+            if journal is not None:
+                journal.mark_failed(seq, e)
+            print(f"Impossible de placer '{os.path.basename(old_path)}' en quarantaine : {e}")
+            continue
+        if journal is not None:
+            journal.mark_done(seq)
+        run_log.get_logger().log('quarantine', old_path=os.path.abspath(old_path), new_path=os.path.abspath(new_path))
+        moved.append((old_path, new_path))
+    return moved
+
+
+def check_tree(root, report, workers=DEFAULT_WORKERS, quarantine_dir=None, journal=None, recursive=True, base=None):
+    """
+    Contrôle les groupes shapefile d'un dossier et ajoute les résultats au rapport.
+    Les groupes incohérents sont mis en quarantaine : déplacés dans `quarantine_dir` s'il est fourni,
+    sinon simplement exclus du renommage.
+
+    Args:
+        root (str): Le dossier à contrôler.
+        report (IntegrityReport): Le rapport à compléter.
+        workers (int): Le nombre de threads de contrôle.
+        quarantine_dir (str, optional): Le dossier où déplacer les groupes incohérents.
+        journal (RenameJournal, optional): Le journal dans lequel enregistrer les déplacements.
+        recursive (bool): Contrôler aussi les sous-dossiers.
+        base (str, optional): Le dossier dont les chemins relatifs sont conservés en quarantaine ; par défaut `root`.
+
+    Returns:
+        set: Les groupes (dossier, nom de base) exclus du renommage.
+    """
+    metrics = get_metrics()
+    quarantined = set()
+    groups = ((folder, base_name, group.files) for folder, file_groups in iter_file_groups(root, recursive=recursive)
+              for base_name, group in file_groups.items() if group.path('.shp') is not None)
+    for folder, base_name, files, errors, warnings in check_groups(groups, workers):
+        if errors:
+            report.add(folder, base_name, STATUS_QUARANTINE, errors + warnings)
+            metrics.increment('groups_quarantined')
+            if quarantine_dir is None or \
+                    len(quarantine_group(files, base or root, quarantine_dir, journal)) < len(files):
+                quarantined.add((folder, base_name))
+        elif warnings:
+            report.add(folder, base_name, STATUS_WARNING, warnings)
+        else:
+            report.add(folder, base_name, STATUS_OK, [])
+    return quarantined
+
+
+def run_integrity_check(root, report_path, workers=DEFAULT_WORKERS, quarantine_dir=None, journal=None):
+    """
+    Contrôle tous les groupes shapefile de l'arborescence avant renommage et écrit le rapport.
+
+    Args:
+        root (str): Le dossier à contrôler.
+        report_path (str): Le fichier CSV du rapport.
+        workers (int): Le nombre de threads de contrôle.
+        quarantine_dir (str, optional): Le dossier où déplacer les groupes incohérents.
+        journal (RenameJournal, optional): Le journal dans lequel enregistrer les déplacements.
+
+    Returns:
+        set: Les groupes (dossier, nom de base) exclus du renommage.
+    """
+    report = IntegrityReport(report_path)
+    try:
+        quarantined = check_tree(root, report, workers, quarantine_dir, journal)
+    finally:
+        report.close()
+    print(report.summary())
+    return quarantined
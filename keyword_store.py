@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+import time
+
+# Nombre d'ajouts dans le journal au-delà duquel il est compacté dans le fichier JSON,
+# et délai minimal (secondes) entre deux vérifications des ajouts faits par d'autres sessions
+DEFAULT_COMPACT_THRESHOLD = 200
+DEFAULT_REFRESH_INTERVAL = 1.0
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Verrou inter-processus posé sur un fichier annexe (`<fichier>.lock`), partagé ou exclusif.
+    Sous Windows, où msvcrt ne propose que des verrous exclusifs, tous les verrous sont exclusifs.
+
+    Un verrou partagé n'ouvre le fichier de verrou qu'en lecture. S'il ne peut être ni lu ni créé (installation
+    en lecture seule), la lecture se fait sans verrou : aucune session ne peut alors écrire à cet endroit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def acquire(self, exclusive=True):
+        """
+        Pose le verrou et retourne le fichier ouvert à passer à `release`, ou None pour une lecture sans verrou.
+        """
+        if exclusive:
+            f = open(self.path, 'a+b')
+        else:
+            try:
+                f = open(self.path, 'rb')
+            except FileNotFoundError:
+                try:
+                    f = open(self.path, 'a+b')
+                except OSError:
+                    return None
+            except OSError:
+                return None
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK abandonne après 10 secondes d'attente : on réessaie
+                        continue
+        except BaseException:
+            f.close()
+            raise
+        return f
+
+    def release(self, f):
+        if f is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
+
+    def shared(self):
+        return _Held(self, False)
+
+    def exclusive(self):
+        return _Held(self, True)
+
+
+class _Held:
+    def __init__(self, lock, exclusive):
+        self.lock = lock
+        self.exclusive = exclusive
+        self.f = None
+
+    def __enter__(self):
+        self.f = self.lock.acquire(self.exclusive)
+        return self
+
+    def __exit__(self, *exc):
+        self.lock.release(self.f)
+
+
+def file_identity(path):
+    """
+    Retourne (inode, taille, mtime_ns) d'un fichier, ou None s'il n'existe pas.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class KeywordStore:
+    """
+    Mots-clés par préfixe, stockés dans un fichier JSON complété par un journal d'ajouts (JSON Lines).
+
+    Ajouter un mot-clé ajoute une seule ligne au journal (`<fichier>.journal`) sous verrou exclusif, au lieu de
+    réécrire le fichier JSON entier : plusieurs sessions peuvent partager la même configuration sans perdre
+    les ajouts des autres. Chaque session relit périodiquement la fin du journal pour prendre en compte les
+    ajouts des autres sessions sans redémarrer. Lorsque le journal dépasse `compact_threshold` lignes, il est
+    fusionné dans le fichier JSON (écrit dans un fichier temporaire puis remplacé) et vidé.
+
+    Le dictionnaire `keywords` fourni est mis à jour sur place et n'est jamais réassigné.
+    """
+
+    def __init__(self, keywords, file_path="metadata.json", compact_threshold=DEFAULT_COMPACT_THRESHOLD,
+                 refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.keywords = keywords
+        self.file_path = file_path
+        self.journal_path = file_path + ".journal"
+        self.lock = FileLock(file_path + ".lock")
+        self.compact_threshold = compact_threshold
+        self.refresh_interval = refresh_interval
+        # Identité du fichier JSON et position dans le journal déjà pris en compte
+        self.base_identity = None
+        self.journal_offset = 0
+        self.journal_entries = 0
+        self.last_refresh = 0.0
+        self.thread_lock = threading.Lock()
+
+    def load(self):
+        """
+        Charge le fichier JSON et tout le journal, en remplaçant sur place le contenu des mots-clés.
+        Sans fichier JSON, les mots-clés actuels servent de base.
+
+        Raises:
+            json.JSONDecodeError: Si le fichier JSON est invalide.
+        """
+        with self.thread_lock, self.lock.shared():
+            self._load_locked()
+            self.last_refresh = time.monotonic()
+
+    def _load_locked(self):
+        identity = file_identity(self.file_path)
+        if identity is not None:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                loaded = json.load(f)
+            self.keywords.clear()
+            self.keywords.update(loaded)
+        self.base_identity = identity
+        self.journal_offset = 0
+        self.journal_entries = 0
+        self._read_journal_locked()
+
+    def _read_journal_locked(self):
+        """
+        Applique les lignes du journal ajoutées depuis la dernière lecture.
+
+        Returns:
+            bool: True si des mots-clés ont été ajoutés.
+        """
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self.journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return False
+
+        # Une ligne sans fin de ligne est en cours d'écriture : elle sera lue la prochaine fois
+        end = data.rfind(b'\n') + 1
+        changed = False
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                changed |= self._apply(entry['prefix'], entry['keyword'])
+            except (ValueError, KeyError, TypeError):
+                continue
+            self.journal_entries += 1
+        self.journal_offset += end
+        return changed
+
+    def _apply(self, prefix, keyword):
+        known = self.keywords.get(prefix)
+        if known is None:
+            self.keywords[prefix] = [keyword]
+            return True
+        if keyword in known:
+            return False
+        # Nouvelle liste plutôt qu'un ajout sur place : une lecture concurrente voit l'ancienne ou la nouvelle
+        self.keywords[prefix] = known + [keyword]
+        return True
+
+    def refresh(self, force=False):
+        """
+        Prend en compte les mots-clés ajoutés par d'autres sessions (au plus une vérification par
+        `refresh_interval` secondes, sauf si `force`). Si le fichier JSON a été compacté entre-temps,
+        il est entièrement relu.
+
+        Returns:
+            bool: True si les mots-clés ont changé.
+        """
+        now = time.monotonic()
+        if not force and now - self.last_refresh < self.refresh_interval:
+            return False
+        with self.thread_lock:
+            self.last_refresh = now
+            journal_identity = file_identity(self.journal_path)
+            journal_size = journal_identity[1] if journal_identity is not None else 0
+            if file_identity(self.file_path) == self.base_identity and journal_size == self.journal_offset:
+                return False
+            with self.lock.shared():
+                if file_identity(self.file_path) != self.base_identity or journal_size < self.journal_offset:
+                    try:
+                        self._load_locked()
+                    except ValueError:
+                        return False
+                    return True
+                return self._read_journal_locked()
+
+    def add(self, prefix, keyword):
+        """
+        Ajoute un mot-clé à un préfixe par une seule ligne ajoutée au journal, sous verrou exclusif.
+        Les ajouts des autres sessions sont pris en compte au passage.
+
+        Returns:
+            bool: True si le mot-clé était nouveau.
+        """
+        with self.thread_lock:
+            with self.lock.exclusive():
+                if file_identity(self.file_path) != self.base_identity:
+                    self._load_locked()
+                else:
+                    self._read_journal_locked()
+                if keyword in self.keywords.get(prefix, ()):
+                    return False
+                line = (json.dumps({'prefix': prefix, 'keyword': keyword}, ensure_ascii=False) + "\n").encode('utf-8')
+                fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+                self._apply(prefix, keyword)
+                self.journal_offset += len(line)
+                self.journal_entries += 1
+                if self.journal_entries >= self.compact_threshold:
+                    self._compact_locked()
+            self.last_refresh = time.monotonic()
+        return True
+
+    def compact(self):
+        """
+        Fusionne le journal dans le fichier JSON et le vide.
+        """
+        with self.thread_lock, self.lock.exclusive():
+            if file_identity(self.file_path) != self.base_identity:
+                self._load_locked()
+            else:
+                self._read_journal_locked()
+            self._compact_locked()
+
+    def _compact_locked(self):
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.keywords, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.file_path)
+        # Vider le journal après le remplacement : un arrêt entre les deux ne fait que rejouer des ajouts existants
+        with open(self.journal_path, 'wb'):
+            pass
+        self.base_identity = file_identity(self.file_path)
+        self.journal_offset = 0
+        self.journal_entries = 0
@@ -0,0 +1,114 @@
+import zipfile
+import xml.etree.ElementTree as ET
+
+from gpkg_reader import MIXED_SUFFIX
+
+# Nombre de géométries examinées au plus avant de conclure
+DEFAULT_SAMPLE_CAP = 1000
+
+# Correspondance entre les éléments de géométrie KML (sans espace de noms) et les suffixes de la convention.
+# LinearRing n'apparaît que dans un Polygon et n'est pas compté ; les membres d'un MultiGeometry le sont.
+GEOMETRY_TAG_SUFFIXES = {
+    'Point': 'pt',
+    'LineString': 'line', 'Track': 'line',
+    'Polygon': 'poly',
+}
+
+
+class KmlError(ValueError):
+    """
+    Levée lorsque le fichier n'est pas un document KML lisible ou qu'une archive KMZ n'en contient pas.
+    """
+
+
+def local_name(tag):
+    return tag.rpartition('}')[2]
+
+
+def sniff_kml_stream(stream, sample_cap=DEFAULT_SAMPLE_CAP):
+    """
+    Parcourt un document KML de façon incrémentale (iterparse) et classe ses géométries.
+    Chaque élément est retiré de son parent dès qu'il est terminé : l'arbre en mémoire se limite
+    au chemin de l'élément en cours. La lecture s'arrête dès que deux familles de géométrie différentes
+    ont été vues ou que `sample_cap` géométries ont été examinées.
+
+    Returns:
+        tuple: (types de géométrie vus, nombre de géométries examinées, suffixe pt/line/poly, `mixed` ou `empty`).
+
+    Raises:
+        KmlError: Si le document n'est pas du XML valide.
+    """
+    geometry_types = set()
+    suffixes = set()
+    samples = 0
+    open_elements = []
+
+    try:
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                open_elements.append(element)
+                continue
+
+            open_elements.pop()
+            name = local_name(element.tag)
+            suffix = GEOMETRY_TAG_SUFFIXES.get(name)
+            if suffix is not None:
+                samples += 1
+                geometry_types.add(name)
+                suffixes.add(suffix)
+                if len(suffixes) > 1 or (sample_cap is not None and samples >= sample_cap):
+                    break
+
+            # Libérer l'élément terminé : il est toujours le dernier enfant encore attaché à son parent
+            element.clear()
+            if open_elements:
+                open_elements[-1].remove(element)
+    except ET.ParseError as e:
+        raise KmlError(f"Document KML invalide : {e}") from e
+
+    if len(suffixes) > 1:
+        suffix = MIXED_SUFFIX
+    else:
+        suffix = next(iter(suffixes), 'empty')
+    return sorted(geometry_types), samples, suffix
+
+
+def find_kmz_document(archive):
+    """
+    Retourne le nom du document principal d'une archive KMZ : doc.kml s'il existe, sinon le premier .kml.
+    """
+    names = archive.namelist()
+    if 'doc.kml' in names:
+        return 'doc.kml'
+    return next((name for name in names if name.lower().endswith('.kml')), None)
+
+
+def sniff_kml(file_path, sample_cap=DEFAULT_SAMPLE_CAP):
+    """
+    Identifie les géométries d'un fichier .kml, ou du document KML d'une archive .kmz lu directement
+    dans l'archive, sans extraction sur disque.
+
+    Args:
+        file_path (str): Chemin du fichier .kml ou .kmz.
+        sample_cap (int, optional): Nombre maximal de géométries examinées ; None pour lire tout le document.
+
+    Returns:
+        tuple: (types de géométrie vus, nombre de géométries examinées, suffixe).
+
+    Raises:
+        KmlError: Si le document est invalide ou si l'archive ne contient aucun document KML.
+        OSError: Si le fichier ne peut pas être lu.
+    """
+    if not file_path.lower().endswith('.kmz'):
+        with open(file_path, 'rb') as f:
+            return sniff_kml_stream(f, sample_cap)
+
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            document = find_kmz_document(archive)
+            if document is None:
+                raise KmlError("Aucun document .kml dans l'archive")
+            with archive.open(document) as f:
+                return sniff_kml_stream(f, sample_cap)
+    except zipfile.BadZipFile as e:
+        raise KmlError(f"Archive KMZ invalide : {e}") from e
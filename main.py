@@ -1,28 +1,342 @@
 # main.py
 
+import argparse
 import os
-from file_processor import process_files_in_directory
-from metadata import load_keywords_from_file
+import run_log
+from batch_rules import load_rules, ReviewReport
+from dedup import DuplicateDetector, MODE_REUSE, MODE_SKIP
+from file_processor import process_files_in_directory, rebuild_index, rename_planner
+from integrity import IntegrityReport, check_tree, run_integrity_check
+from metrics import reset_metrics
+from prefetch import DEFAULT_LOOKAHEAD, DEFAULT_WORKERS, Prefetcher
+from rename_executor import DEFAULT_PER_MOUNT, DEFAULT_RENAME_WORKERS, DEFAULT_RETRIES, RenameExecutor
+from rename_plan import PlanWriter, apply_plan
+from rename_journal import DEFAULT_JOURNAL_DIR, RenameJournal, new_run_id, resume_run, rollback_run
+from run_log import DEFAULT_LOG_FILE
+from run_context import RunContext
+from scan_index import ScanIndex
 from utils import log_info
+from watcher import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE, watch_folder
+from work_queue import DEFAULT_LEASE, DEFAULT_SHARD_DEPTH, WorkQueue, new_worker_id, run_worker
 
-def main():
+def parse_arguments(argv=None):
+    """
+    Analyse les arguments de la ligne de commande.
+    Sans argument, le programme fonctionne en mode interactif.
+    """
+    parser = argparse.ArgumentParser(description="Renommage automatique de fichiers géographiques.")
+    parser.add_argument("folder", nargs="?", help="Dossier à traiter (demandé interactivement s'il est omis).")
+
+    batch = parser.add_argument_group("mode batch")
+    batch.add_argument("--batch", action="store_true",
+                       help="Traiter le dossier sans aucune question, à partir des règles fournies.")
+    batch.add_argument("--rules", help="Fichier de règles JSON (motifs de dossiers vers préfixe, source, année, échelle).")
+    batch.add_argument("--overrides", help="Fichier CSV de surcharges par fichier (colonne path).")
+    batch.add_argument("--review-report", default="a_verifier.csv",
+                       help="Rapport CSV des groupes ignorés faute de règle (défaut : a_verifier.csv).")
+
+    index = parser.add_argument_group("index incrémental")
+    index.add_argument("--index", help="Fichier SQLite de l'index ; les dossiers inchangés ne sont pas relus.")
+    index.add_argument("--rebuild-index", action="store_true",
+                       help="Reconstruire entièrement l'index pour le dossier, sans renommer, puis quitter.")
+    index.add_argument("--prune-index", action="store_true",
+                       help="Retirer de l'index les dossiers qui n'existent plus, puis quitter.")
+
+    journal = parser.add_argument_group("journal des renommages")
+    journal.add_argument("--journal-dir", default=DEFAULT_JOURNAL_DIR,
+                         help=f"Dossier des journaux de renommage (défaut : {DEFAULT_JOURNAL_DIR}).")
+    journal.add_argument("--no-journal", action="store_true", help="Ne pas journaliser les renommages.")
+    journal.add_argument("--resume", nargs="?", const="", metavar="RUN_ID",
+                         help="Terminer une exécution interrompue (par défaut la plus récente), puis quitter.")
+    journal.add_argument("--rollback", metavar="RUN_ID", help="Annuler tous les renommages d'une exécution, puis quitter.")
+
+    plan = parser.add_argument_group("planification")
+    plan.add_argument("--plan", metavar="FICHIER",
+                      help="Écrire les renommages proposés dans un plan (JSON Lines si le fichier se termine par .jsonl, "
+                           "CSV sinon) sans rien renommer.")
+    plan.add_argument("--apply", metavar="FICHIER",
+                      help="Exécuter un plan relu, après avoir vérifié que ses sources n'ont pas changé, puis quitter.")
+
+    integrity = parser.add_argument_group("contrôle d'intégrité")
+    integrity.add_argument("--check-integrity", action="store_true",
+                           help="Contrôler la cohérence des groupes shapefile (en-têtes .shp, .shx, .dbf) avant renommage ; "
+                                "les groupes incohérents ne sont pas renommés.")
+    integrity.add_argument("--integrity-report", default="integrite.csv",
+                           help="Rapport CSV du contrôle d'intégrité (défaut : integrite.csv).")
+    integrity.add_argument("--quarantine-dir",
+                           help="Dossier où déplacer les groupes incohérents (chemins relatifs conservés) ; "
+                                "incompatible avec --plan.")
+    integrity.add_argument("--check-only", action="store_true",
+                           help="Effectuer uniquement le contrôle d'intégrité, sans renommer.")
+
+    watch = parser.add_argument_group("surveillance")
+    watch.add_argument("--watch", action="store_true",
+                       help="Surveiller le dossier et traiter les nouveaux fichiers au fil de leur arrivée "
+                            "(à combiner avec --batch pour un fonctionnement sans surveillance).")
+    watch.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                       help="Secondes sans modification avant de traiter un groupe reçu "
+                            f"(défaut : {DEFAULT_SETTLE}).")
+    watch.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                       help="Intervalle de scrutation lorsque inotify n'est pas disponible "
+                            f"(défaut : {DEFAULT_POLL_INTERVAL} s).")
+    watch.add_argument("--polling", action="store_true", help="Forcer la surveillance par scrutation.")
+
+    distributed = parser.add_argument_group("file de travail partagée")
+    distributed.add_argument("--queue", metavar="FICHIER",
+                             help="File de travail SQLite partagée entre plusieurs processus ou machines.")
+    distributed.add_argument("--enqueue", action="store_true",
+                             help="Découper le dossier en lots et les inscrire dans la file, puis quitter.")
+    distributed.add_argument("--shard-depth", type=int, default=DEFAULT_SHARD_DEPTH,
+                             help=f"Profondeur des dossiers formant un lot (défaut : {DEFAULT_SHARD_DEPTH}).")
+    distributed.add_argument("--work", action="store_true",
+                             help="Traiter en mode batch les lots de la file jusqu'à épuisement.")
+    distributed.add_argument("--lease", type=float, default=DEFAULT_LEASE,
+                             help=f"Durée du bail d'un lot en secondes, renouvelé pendant le traitement (défaut : {DEFAULT_LEASE}).")
+    distributed.add_argument("--queue-status", action="store_true", help="Afficher l'avancement de chaque lot, puis quitter.")
+    distributed.add_argument("--requeue-failed", action="store_true",
+                             help="Remettre en file les lots en échec, puis quitter.")
+
+    duplicates = parser.add_argument_group("doublons")
+    duplicates.add_argument("--dedup", choices=[MODE_REUSE, MODE_SKIP],
+                            help="Repérer les jeux de données copiés à l'identique dans plusieurs dossiers : "
+                                 f"'{MODE_REUSE}' reprend la décision du premier exemplaire, '{MODE_SKIP}' ignore les copies.")
+    duplicates.add_argument("--dedup-report", default="doublons.csv",
+                            help="Rapport CSV des doublons (défaut : doublons.csv).")
+
+    parser.add_argument("--log-file", default=DEFAULT_LOG_FILE,
+                        help=f"Journal d'exécution au format JSON Lines (défaut : {DEFAULT_LOG_FILE}).")
+
+    performance = parser.add_argument_group("performances")
+    performance.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                             help=f"Threads de détection anticipée de la géométrie (défaut : {DEFAULT_WORKERS}, 0 pour désactiver).")
+    performance.add_argument("--lookahead", type=int, default=DEFAULT_LOOKAHEAD,
+                             help=f"Nombre de groupes détectés à l'avance (défaut : {DEFAULT_LOOKAHEAD}).")
+    performance.add_argument("--rename-workers", type=int, default=DEFAULT_RENAME_WORKERS,
+                             help="Threads de renommage : les groupes sont renommés en parallèle, chacun dans l'ordre "
+                                  f"(défaut : {DEFAULT_RENAME_WORKERS}, renommage séquentiel).")
+    performance.add_argument("--per-mount", type=int, default=DEFAULT_PER_MOUNT,
+                             help=f"Renommages simultanés au plus par point de montage (défaut : {DEFAULT_PER_MOUNT}).")
+    performance.add_argument("--rename-retries", type=int, default=DEFAULT_RETRIES,
+                             help=f"Nouvelles tentatives sur erreur transitoire du système de fichiers (défaut : {DEFAULT_RETRIES}).")
+    performance.add_argument("--metrics", metavar="FICHIER",
+                             help="Écrire les métriques de l'exécution : format texte Prometheus si le fichier "
+                                  "se termine par .prom, JSON sinon.")
+    performance.add_argument("--profile", metavar="FICHIER",
+                             help="Profiler le traitement avec cProfile et écrire les statistiques (lisibles avec pstats).")
+
+    args = parser.parse_args(argv)
+    if args.check_only or args.quarantine_dir:
+        args.check_integrity = True
+    if args.plan and args.apply:
+        parser.error("--plan et --apply ne peuvent pas être utilisés ensemble.")
+    if args.plan and args.quarantine_dir:
+        parser.error("--quarantine-dir déplace des fichiers : il ne peut pas être utilisé avec --plan.")
+    if (args.rebuild_index or args.prune_index) and not args.index:
+        parser.error("--rebuild-index et --prune-index nécessitent --index.")
+    if (args.enqueue or args.work or args.queue_status or args.requeue_failed) and not args.queue:
+        parser.error("--enqueue, --work, --queue-status et --requeue-failed nécessitent --queue.")
+    if args.enqueue and not args.folder:
+        parser.error("--enqueue nécessite le dossier à découper en argument.")
+    if args.work:
+        if args.folder or args.watch:
+            parser.error("--work traite le dossier de la file ; il ne prend pas de dossier ni --watch.")
+        if not args.batch:
+            parser.error("--work nécessite le mode batch (--batch et --rules).")
+    if args.batch:
+        if not (args.folder or args.work):
+            parser.error("le mode batch nécessite le dossier à traiter en argument.")
+        if not (args.rules or args.overrides):
+            parser.error("le mode batch nécessite --rules et/ou --overrides.")
+    return args
+
+def build_context(args, folder_path, run_id):
+    """
+    Prépare le contexte d'exécution à partir des arguments.
+    """
+    index = ScanIndex(args.index) if args.index else None
+    # En planification, rien n'est renommé : pas de journal, et les renommages proposés sont écrits dans le plan
+    journal = None if args.no_journal or args.plan else RenameJournal(args.journal_dir, run_id)
+    prefetcher = Prefetcher(args.workers, args.lookahead)
+    if args.plan:
+        executor = PlanWriter(args.plan)
+    else:
+        executor = RenameExecutor(args.rename_workers, args.per_mount, args.rename_retries, planner=rename_planner)
+    dedup = DuplicateDetector(args.dedup, args.dedup_report) if args.dedup else None
+    if not args.batch:
+        return RunContext(folder_path, index=index, journal=journal, prefetcher=prefetcher, executor=executor,
+                          dedup=dedup)
+    rules = load_rules(folder_path, args.rules, args.overrides)
+    return RunContext(folder_path, rules=rules, review=ReviewReport(args.review_report), index=index, journal=journal,
+                      prefetcher=prefetcher, executor=executor, dedup=dedup)
+
+def apply_plan_file(args):
+    """
+    Exécute un plan de renommage relu (--apply), avec journal et journal d'exécution comme un renommage direct.
+    """
+    run_id = new_run_id()
+    run_log.configure(args.log_file, run_id)
+    metrics = reset_metrics()
+    journal = None if args.no_journal else RenameJournal(args.journal_dir, run_id)
+    executor = RenameExecutor(args.rename_workers, args.per_mount, args.rename_retries)
+    print(f"Identifiant de l'exécution : {run_id}")
+    completed = False
+    try:
+        submitted, stale = apply_plan(args.apply, executor, journal)
+        completed = True
+    finally:
+        executor.shutdown()
+        metrics.finish()
+        if journal is not None:
+            journal.close(completed)
+        run_log.close_logger()
+    print(metrics.summary_table())
+    print(f"Plan {args.apply} : {submitted} groupe(s) traité(s), {stale} ignoré(s) car modifié(s) depuis la planification.")
+    if journal is not None:
+        print(f"Pour annuler cette exécution : python main.py --rollback {journal.run_id}")
+
+def main(argv=None):
     """
     Point d'entrée principal du programme de renommage automatique de fichiers géographiques.
     """
+    args = parse_arguments(argv)
+
+    if args.resume is not None:
+        resume_run(args.journal_dir, args.resume or None)
+        return
+    if args.rollback:
+        rollback_run(args.rollback, args.journal_dir)
+        return
+
+    if args.apply:
+        apply_plan_file(args)
+        return
+
+    if args.prune_index:
+        index = ScanIndex(args.index)
+        print(f"{index.prune()} dossier(s) retiré(s) de l'index {args.index}.")
+        index.close()
+        return
+
+    queue = None
+    if args.queue:
+        queue = WorkQueue(args.queue, args.lease)
+        if not args.work:
+            if args.enqueue:
+                print(f"{queue.enqueue(args.folder, args.shard_depth)} lot(s) ajouté(s) à la file {args.queue}.")
+            if args.requeue_failed:
+                print(f"{queue.requeue_failed()} lot(s) remis en file.")
+            if args.queue_status:
+                print(queue.report())
+            queue.close()
+            return
+        if queue.root is None:
+            print(f"La file {args.queue} est vide : inscrire d'abord les lots avec --enqueue.")
+            queue.close()
+            return
+
     print("Bienvenue dans le programme de renommage automatique de fichiers géographiques.")
-    # Demander le chemin du dossier à traiter
-    folder_path = input("Veuillez entrer le chemin du dossier à traiter: ")
+    # Demander le chemin du dossier à traiter s'il n'a pas été fourni
+    folder_path = queue.root if queue is not None else args.folder or input("Veuillez entrer le chemin du dossier à traiter: ")
 
     # Vérification si le dossier existe
     if not os.path.isdir(folder_path):
         print("Le chemin fourni n'est pas un dossier valide ou n'existe pas.")
         return
-    
+
+    if args.quarantine_dir and os.path.abspath(args.quarantine_dir).startswith(os.path.join(os.path.abspath(folder_path), '')):
+        print("Le dossier de quarantaine doit se trouver en dehors du dossier traité.")
+        return
+
+    if args.rebuild_index:
+        index = ScanIndex(args.index)
+        rebuild_index(folder_path, index)
+        index.close()
+        return
+
+    run_id = new_run_id()
+    run_log.configure(args.log_file, run_id)
+    metrics = reset_metrics()
     log_info(f"Traitement du dossier: {folder_path}")
-    
-    # Lancement du processus de renommage des fichiers
-    process_files_in_directory(folder_path)
-    
+
+    context = build_context(args, folder_path, run_id)
+    print(f"Identifiant de l'exécution : {run_id}")
+    integrity_report = None
+    worker = new_worker_id()
+    if args.check_integrity and queue is None:
+        context.quarantine = run_integrity_check(folder_path, args.integrity_report, args.workers, args.quarantine_dir,
+                                                 context.journal)
+        if args.check_only:
+            context.close()
+            run_log.close_logger()
+            return
+    elif args.check_integrity:
+        # Sous --work, chaque travailleur ne contrôle que les lots qu'il prend, dans son propre rapport
+        report_base, report_ext = os.path.splitext(args.integrity_report)
+        integrity_report = IntegrityReport(f"{report_base}-{worker.replace(':', '-')}{report_ext}")
+
+    def process_shard(path, recursive, shard_context):
+        if integrity_report is not None:
+            # Les groupes exclus ne concernent que ce lot : l'ensemble est remplacé à chaque lot
+            shard_context.quarantine = check_tree(path, integrity_report, args.workers, args.quarantine_dir,
+                                                  shard_context.journal, recursive, base=folder_path)
+        if not args.check_only:
+            process_files_in_directory(path, shard_context, recursive)
+
+    completed = False
+    profiler = None
+    if args.profile:
+        # Importé à la demande : cProfile et pstats alourdissent sensiblement le démarrage
+        import cProfile
+        profiler = cProfile.Profile()
+    try:
+        # Lancement du processus de renommage des fichiers
+        if profiler is not None:
+            profiler.enable()
+        if args.watch:
+            watch_folder(folder_path, context, args.settle, args.poll_interval, args.polling)
+        elif queue is not None:
+            shards = run_worker(queue, context, process_shard, worker)
+            print(f"{shards} lot(s) traité(s) par ce travailleur.")
+        else:
+            process_files_in_directory(folder_path, context)
+        completed = True
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        metrics.finish()
+        context.close(completed)
+        run_log.close_logger()
+        if integrity_report is not None:
+            integrity_report.close()
+
+    if integrity_report is not None:
+        print(integrity_report.summary())
+    print(metrics.summary_table())
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"Métriques écrites dans {args.metrics}")
+    if profiler is not None:
+        import pstats
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+        print(f"Profil écrit dans {args.profile}")
+
+    if context.index is not None:
+        print(context.index.report())
+    if context.dedup is not None and context.dedup.count:
+        print(f"{context.dedup.count} doublon(s), voir {context.dedup.report_path}.")
+    if context.review is not None and context.review.count:
+        print(f"{context.review.count} groupe(s) à vérifier, voir {context.review.file_path}.")
+    if queue is not None:
+        print(queue.report())
+        queue.close()
+    if args.plan:
+        context.executor.close()
+        print(f"Plan écrit dans {args.plan} : {context.executor.rows} renommage(s) pour {context.executor.groups} groupe(s). "
+              f"Après relecture : python main.py --apply {args.plan}")
+        return
+    if context.journal is not None:
+        print(f"Pour annuler cette exécution : python main.py --rollback {context.journal.run_id}")
     print("Renommage terminé. Consultez le fichier log pour plus de détails.")
 
 if __name__ == "__main__":
@@ -1,60 +1,87 @@
 import json
-import os
+from keyword_store import KeywordStore
+from utils import ask, log_info
 
-# Dictionnaire des mots-clés par défaut
+# Dictionnaire des mots-clés par défaut.
+# C'est l'unique copie en mémoire des mots-clés : les modules qui l'importent partagent cet objet,
+# qui est donc mis à jour sur place et jamais réassigné.
 keywords = {
     'adm': ['administratif'],
     'cad': ['cadastre'],
     'zone': ['zonage']
 }
 
+# Version des mots-clés, incrémentée à chaque modification pour invalider les index dérivés
+keywords_version = 0
+
+# Stockage des mots-clés : fichier JSON et journal d'ajouts partagés entre les sessions
+keyword_store = KeywordStore(keywords)
+
 def load_keywords_from_file(file_path="metadata.json"):
     """
-    Charge les mots-clés depuis un fichier JSON.
+    Charge les mots-clés depuis un fichier JSON et son journal d'ajouts, en remplaçant sur place le contenu de `keywords`.
     """
-    global keywords
+    global keyword_store, keywords_version
+    if file_path != keyword_store.file_path:
+        keyword_store = KeywordStore(keywords, file_path)
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            keywords = json.load(f)
-        print(f"Mots-clés chargés depuis {file_path}")
-    except FileNotFoundError:
-        print(f"Le fichier {file_path} n'a pas été trouvé. Chargement des mots-clés par défaut.")
-    except json.JSONDecodeError:
+        keyword_store.load()
+        keywords_version += 1
+        if keyword_store.base_identity is None:
+            print(f"Le fichier {file_path} n'a pas été trouvé. Chargement des mots-clés par défaut.")
+        else:
+            print(f"Mots-clés chargés depuis {file_path}")
+    except json.JSONDecodeError as e:
         print(f"Erreur de décodage JSON dans {file_path}. Chargement des mots-clés par défaut.")
-    except Exception as e:
-        print(f"Une erreur s'est produite lors du chargement de {file_path}: {e}")
+        log_info(f"Mots-clés par défaut : {file_path} invalide ({e})")
+    except OSError as e:
+        print(f"Impossible de lire {file_path} : {e}. Chargement des mots-clés par défaut.")
+        log_info(f"Mots-clés par défaut : {file_path} illisible ({e})")
+
+def refresh_keywords(force=False):
+    """
+    Prend en compte les mots-clés ajoutés par d'autres sessions depuis la dernière vérification.
+    Les vérifications sont espacées d'au moins une seconde, sauf si `force`.
+    """
+    global keywords_version
+    try:
+        if keyword_store.refresh(force):
+            keywords_version += 1
+    except OSError as e:
+        print(f"Impossible de relire les mots-clés : {e}")
+        log_info(f"Impossible de relire les mots-clés : {e}")
 
 def save_keywords_to_file(file_path="metadata.json"):
     """
-    Sauvegarde les mots-clés dans un fichier JSON.
+    Sauvegarde les mots-clés dans un fichier JSON, en y fusionnant le journal d'ajouts.
     """
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(keywords, f, ensure_ascii=False, indent=4)
+        if file_path == keyword_store.file_path:
+            keyword_store.compact()
+        else:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(keywords, f, ensure_ascii=False, indent=4)
         print(f"Les mots-clés ont été sauvegardés dans {file_path}")
     except Exception as e:
         print(f"Erreur lors de la sauvegarde des mots-clés : {e}")
 
 def add_keyword_to_prefix(base_name, prefix):
     """
-    Propose d'ajouter un mot-clé pour un préfixe donné et sauvegarde la mise à jour.
+    Propose d'ajouter un mot-clé pour un préfixe donné et l'enregistre aussitôt dans le journal d'ajouts.
     """
-    choice = input(f"Le mot '{base_name}' n'a pas été trouvé pour le préfixe '{prefix}'. Voulez-vous l'ajouter à la liste des mots-clés ? (o/n) [o] : ").lower()
+    global keywords_version
+    choice = ask(f"Le mot '{base_name}' n'a pas été trouvé pour le préfixe '{prefix}'. Voulez-vous l'ajouter à la liste des mots-clés ? (o/n) [o] : ").lower()
 
     if choice in ['o', '']:
-        base_name_lower = base_name.lower()
-
-        # Ajouter le mot dans la liste des mots-clés du préfixe s'il n'existe pas déjà
-        if prefix in keywords:
-            if base_name_lower not in keywords[prefix]:
-                keywords[prefix].append(base_name_lower)
-        else:
-            keywords[prefix] = [base_name_lower]
-
-        # Sauvegarder immédiatement après l'ajout
-        save_keywords_to_file()
+        # Une seule ligne ajoutée au journal, sous verrou : les ajouts des autres sessions ne sont pas écrasés
+        try:
+            keyword_store.add(prefix, base_name.lower())
+            print(f"Le mot-clé '{base_name.lower()}' a été ajouté au préfixe '{prefix}'.")
+        except OSError as e:
+            print(f"Erreur lors de la sauvegarde du mot-clé : {e}")
+        keywords_version += 1
     else:
         print(f"Le mot '{base_name}' n'a pas été ajouté.")
 
-# Charger les mots-clés depuis metadata.json au démarrage
+# Charger les mots-clés depuis metadata.json au démarrage, une seule fois pour toute l'exécution
 load_keywords_from_file("metadata.json")
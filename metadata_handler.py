@@ -1,7 +1,10 @@
 import os
 import re
+import threading
+import metadata
 from metadata import keywords, save_keywords_to_file, add_keyword_to_prefix
-from utils import compare_words_insensitive
+from metrics import timed
+from utils import JOIN_WORDS, ask, find_primary_file
 
 # Variables globales pour stocker les dernières entrées utilisateur par dossier
 last_source = None
@@ -12,11 +15,85 @@ last_folder = None  # Nouveau : Pour suivre le dernier dossier traité
 last_metadata_per_folder = {}  # Nouveau dictionnaire pour suivre les métadonnées par dossier
 
 
+class KeywordIndex:
+    """
+    Index inversé des mots-clés : associe chaque mot normalisé aux préfixes candidats.
+
+    Chaque mot-clé est rangé sous son premier mot, avec l'ensemble des mots qu'il exige et le rang de son
+    préfixe dans `metadata.keywords`. Un nom est ainsi comparé à tous les mots-clés en un seul passage sur
+    ses propres mots, avec le même résultat qu'une comparaison mot par mot de chaque mot-clé (insensible à la casse,
+    mots de liaison ignorés) dans l'ordre du dictionnaire.
+    L'index est reconstruit automatiquement lorsque la version des mots-clés change ; il peut être
+    interrogé depuis plusieurs threads.
+    """
+
+    def __init__(self):
+        self.version = None
+        # (préfixes, mots vers candidats, rang d'un mot-clé vide), remplacés d'un bloc à chaque reconstruction
+        self.state = ([], {}, None)
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        """
+        Reconstruit l'index à partir des mots-clés actuels.
+        """
+        version = metadata.keywords_version
+        prefixes = list(metadata.keywords.keys())
+        by_token = {}
+        always_rank = None
+
+        for rank, keyword_list in enumerate(metadata.keywords.values()):
+            for keyword in keyword_list:
+                parts = [word.lower() for word in keyword.split()]
+                if not parts:
+                    # Un mot-clé vide correspond à tous les noms
+                    if always_rank is None:
+                        always_rank = rank
+                    continue
+                if any(part in JOIN_WORDS for part in parts):
+                    # Les mots de liaison sont retirés des noms : ce mot-clé ne peut jamais correspondre
+                    continue
+                by_token.setdefault(parts[0], []).append((rank, frozenset(parts)))
+
+        self.state = (prefixes, by_token, always_rank)
+        self.version = version
+
+    def best_rank(self, name, by_token, always_rank):
+        """
+        Retourne le rang du premier préfixe dont un mot-clé correspond au nom, ou None.
+        """
+        tokens = {word.lower() for word in name.split()}
+        tokens.difference_update(JOIN_WORDS)
+
+        best = always_rank
+        for token in tokens:
+            for rank, parts in by_token.get(token, ()):
+                if (best is None or rank < best) and parts <= tokens:
+                    best = rank
+        return best
+
+    def lookup(self, *names):
+        """
+        Retourne le premier préfixe (dans l'ordre de `metadata.keywords`) correspondant à l'un des noms, ou None.
+        """
+        if self.version != metadata.keywords_version:
+            with self.lock:
+                if self.version != metadata.keywords_version:
+                    self.rebuild()
+
+        prefixes, by_token, always_rank = self.state
+        ranks = [rank for rank in (self.best_rank(name, by_token, always_rank) for name in names) if rank is not None]
+        return prefixes[min(ranks)] if ranks else None
+
+# Index des mots-clés partagé, construit au premier appel de detect_prefix
+keyword_index = KeywordIndex()
+
+@timed('prefix')
 def detect_prefix(folder, base_name):
     """
     Détecte automatiquement le préfixe basé sur le nom du dossier ou du fichier.
-    Parcourt le dictionnaire `keywords` pour identifier un préfixe associé aux mots-clés
-    trouvés dans le nom du dossier parent ou du fichier.
+    Interroge l'index des mots-clés pour identifier le premier préfixe associé à un mot-clé
+    trouvé dans le nom du dossier parent ou du fichier.
     
     Args:
         folder (str): Le chemin du dossier contenant le fichier.
@@ -28,15 +105,10 @@ def detect_prefix(folder, base_name):
     # Extraire le nom du dossier parent
     parent_folder = os.path.basename(os.path.normpath(folder))
 
-    # Parcourir chaque préfixe et sa liste de mots-clés pour faire une correspondance
-    for prefix, keyword_list in keywords.items():
-        for keyword in keyword_list:
-            # Comparer de manière insensible à la casse avec le dossier parent ou le nom du fichier
-            if compare_words_insensitive(parent_folder, keyword) or compare_words_insensitive(base_name, keyword):
-                return prefix
-    return None
+    # Comparer de manière insensible à la casse avec le dossier parent ou le nom du fichier
+    return keyword_index.lookup(parent_folder, base_name)
 
-def get_metadata_for_file(base_name, files, last_source=None, last_year=None, last_scale=None):
+def get_metadata_for_file(base_name, files, last_source=None, last_year=None, last_scale=None, detected_prefix=None):
     """
     Collecte les métadonnées nécessaires (préfixe, source, année, échelle) pour un fichier.
     Demande à l'utilisateur de valider ou de modifier certaines informations si elles sont déjà fournies.
@@ -47,26 +119,28 @@ def get_metadata_for_file(base_name, files, last_source=None, last_year=None, la
         last_source (str, optional): Dernière source utilisée, pour réutilisation.
         last_year (str, optional): Dernière année utilisée, pour réutilisation.
         last_scale (str, optional): Dernière échelle utilisée, pour réutilisation.
+        detected_prefix (str, optional): Préfixe déjà détecté (en arrière-plan) pour ce nom de base.
 
     Returns:
         dict: Un dictionnaire contenant les métadonnées (`prefix`, `source`, `year`, `scale`).
     """
     folder = os.path.dirname(files[0])  # Récupérer le dossier du premier fichier
 
-    # Utiliser .shp si c'est un groupe de shapefiles, sinon utiliser le premier fichier
-    shp_file = next((f for f in files if f.endswith('.shp')), files[0])
-    base_name_to_display = os.path.basename(shp_file)  # Afficher le nom avec extension .shp
+    # Afficher le fichier principal du groupe (.shp, .gpkg, etc.), sinon le premier fichier
+    primary_file = find_primary_file(files) or files[0]
+    base_name_to_display = os.path.basename(primary_file)
 
     # Demander si l'utilisateur veut renommer le fichier
-    rename_choice = input(f"Souhaitez-vous renommer le fichier {base_name_to_display}? (o/n) [o] : ").lower()
+    rename_choice = ask(f"Souhaitez-vous renommer le fichier {base_name_to_display}? (o/n) [o] : ").lower()
 
     # Si l'utilisateur ne souhaite pas renommer, retourner None
     if rename_choice not in ['o', '']:
         print(f"Le fichier '{base_name_to_display}' ne sera pas renommé.")
         return None
 
-    # Détecter le préfixe automatiquement
-    detected_prefix = detect_prefix(folder, base_name)
+    # Détecter le préfixe automatiquement, sauf s'il l'a déjà été en arrière-plan
+    if detected_prefix is None:
+        detected_prefix = detect_prefix(folder, base_name)
     
     # Proposer à l'utilisateur de valider ou modifier le préfixe détecté
     prefix = validate_or_change_prefix(detected_prefix, base_name)
@@ -84,6 +158,53 @@ def get_metadata_for_file(base_name, files, last_source=None, last_year=None, la
         'scale': scale
     }
     
+def get_metadata_from_rules(base_name, files, rules, detected_prefix=None):
+    """
+    Détermine les métadonnées (préfixe, source, année, échelle) d'un groupe sans interaction,
+    à partir des règles du mode batch. Le préfixe est détecté automatiquement si aucune règle ne le fixe.
+
+    Args:
+        base_name (str): Nom de base du fichier (sans extension).
+        files (list): Liste des fichiers associés.
+        rules (BatchRules): Les règles chargées depuis le fichier de règles.
+        detected_prefix (str, optional): Préfixe déjà détecté pour ce nom de base, réutilisé s'il est fourni.
+
+    Returns:
+        tuple: (métadonnées, raison) où les métadonnées valent None si le groupe doit être vérifié
+        manuellement, la raison expliquant alors pourquoi.
+    """
+    folder = os.path.dirname(files[0])
+    resolved = rules.resolve(folder, base_name)
+    if resolved is None:
+        return None, "aucune règle ne correspond"
+
+    prefix = resolved.get('prefix')
+    if not prefix:
+        renamed_base = resolved.get('base_name', base_name)
+        prefix = detected_prefix if detected_prefix and renamed_base == base_name else detect_prefix(folder, renamed_base)
+    if prefix is None:
+        return None, "préfixe non déterminé"
+    if prefix not in keywords:
+        return None, f"préfixe inconnu '{prefix}'"
+
+    year = resolved.get('year') or 'inconnue'
+    if year != 'inconnue' and not validate_year(year):
+        return None, f"année invalide '{year}'"
+
+    scale = resolved.get('scale') or 'inconnue'
+    if scale != 'inconnue':
+        if not validate_scale(scale):
+            return None, f"échelle invalide '{scale}'"
+        scale = scale.upper()
+
+    return {
+        'prefix': prefix,
+        'source': resolved.get('source') or 'inconnue',
+        'year': year,
+        'scale': scale,
+        'base_name': resolved.get('base_name', base_name)
+    }, None
+
 def get_user_input_with_default(label, default_value):
     """
     Demande à l'utilisateur une entrée avec une valeur par défaut. Si l'utilisateur ne fournit pas
@@ -98,7 +219,7 @@ def get_user_input_with_default(label, default_value):
         str: La valeur saisie par l'utilisateur ou la valeur par défaut.
     """
     # Formuler la question avec la valeur par défaut et la possibilité d'ignorer ('n')
-    user_input = input(f"Source ou appuyez sur Entrée pour réutiliser '{default_value}' ou tapez ( i ) pour ignorer : ").strip()
+    user_input = ask(f"Source ou appuyez sur Entrée pour réutiliser '{default_value}' ou tapez ( i ) pour ignorer : ").strip()
     
     if user_input.lower() == 'i':
         return "inconnue"  # Si 'n' est saisi, renvoyer 'inconnue'
@@ -125,7 +246,7 @@ def validate_or_change_prefix(detected_prefix, base_name):
 
     # Si un préfixe est détecté, demander à l'utilisateur de valider ou de le modifier
     print(f"Le préfixe détecté pour le fichier '{base_name}' est : '{detected_prefix}'.")
-    choice = input(f"Voulez-vous valider ce préfixe ? (o/n) [o] : ").lower()
+    choice = ask(f"Voulez-vous valider ce préfixe ? (o/n) [o] : ").lower()
 
     # Si l'utilisateur valide (par défaut 'o'), retourner le préfixe détecté
     if choice in ['o', '']:
@@ -152,12 +273,12 @@ def ask_for_prefix(base_name, full_file_path):
     print(f"Chemin complet du dossier : {folder_path}")
 
     # Demander à l'utilisateur d'entrer un préfixe valide
-    prefix_input = input(f"Veuillez entrer un préfixe pour '{base_name}' parmi ceux listés : ")
+    prefix_input = ask(f"Veuillez entrer un préfixe pour '{base_name}' parmi ceux listés : ")
 
     # Boucle jusqu'à ce qu'un préfixe valide soit saisi
     while prefix_input not in keywords:
         print("Préfixe invalide. Veuillez choisir un préfixe parmi ceux listés.")
-        prefix_input = input(f"Veuillez entrer un préfixe valide pour '{base_name}' : ")
+        prefix_input = ask(f"Veuillez entrer un préfixe valide pour '{base_name}' : ")
 
     # Proposer d'ajouter le mot-clé au dictionnaire s'il n'est pas déjà présent
     if base_name.lower() not in keywords[prefix_input]:
@@ -183,7 +304,7 @@ def get_valid_year(default_value):
     Si aucune entrée n'est faite, l'utilisateur doit entrer une année valide.
     """
     while True:
-        year = input(f"Année (format: YYYY) ou appuyez sur Entrée pour réutiliser '{default_value}' ou tapez ( i ) pour ignorer : ").strip()
+        year = ask(f"Année (format: YYYY) ou appuyez sur Entrée pour réutiliser '{default_value}' ou tapez ( i ) pour ignorer : ").strip()
         if year.lower() == 'i':  # Ignorer et renvoyer "inconnue"
             return "inconnue"
         if not year:
@@ -199,7 +320,7 @@ def get_valid_scale(default_value):
     Si aucune entrée n'est faite, l'utilisateur doit entrer une échelle valide.
     """
     while True:
-        scale = input(f"Echelle (ex: 10K, 25K) ou appuyez sur Entrée pour réutiliser '{default_value}' ou tapez ( i ) pour ignorer : ").strip()
+        scale = ask(f"Echelle (ex: 10K, 25K) ou appuyez sur Entrée pour réutiliser '{default_value}' ou tapez ( i ) pour ignorer : ").strip()
         if scale.lower() == 'i':  # Ignorer et renvoyer "inconnue"
             return "inconnue"
         if not scale:
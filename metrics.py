@@ -0,0 +1,202 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from shapefile_header import get_detection_stats
+
+# Phases chronométrées pendant une exécution, dans l'ordre d'affichage
+PHASES = ('scan', 'integrity', 'suffix', 'prefix', 'naming', 'rename', 'prompt')
+
+# Préfixe des métriques exportées au format Prometheus
+PROMETHEUS_NAMESPACE = "geofilerenamer"
+
+
+class RunMetrics:
+    """
+    Chronomètres et compteurs d'une exécution : temps cumulé et nombre d'appels par phase,
+    compteurs d'événements (dossiers, groupes, fichiers renommés) et erreurs par type.
+
+    Les mises à jour sont protégées par un verrou, la détection pouvant s'exécuter dans plusieurs threads.
+    Le temps d'une phase exécutée en arrière-plan est donc cumulé sur l'ensemble des threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timers = {phase: [0.0, 0] for phase in PHASES}
+        self.counters = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add_time(self, phase, seconds, calls=1):
+        """
+        Ajoute une durée (en secondes) au temps cumulé d'une phase.
+        """
+        with self.lock:
+            timer = self.timers.setdefault(phase, [0.0, 0])
+            timer[0] += seconds
+            timer[1] += calls
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Chronomètre le bloc `with` et l'ajoute au temps cumulé de la phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def increment(self, name, amount=1):
+        """
+        Incrémente un compteur d'événements (ex: 'groups', 'files_renamed').
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def error(self, kind):
+        """
+        Comptabilise une erreur par type (ex: 'rename:PermissionError').
+        """
+        with self.lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def finish(self):
+        """
+        Arrête le chronomètre global de l'exécution.
+        """
+        self.finished = time.perf_counter()
+
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def snapshot(self):
+        """
+        Retourne l'état des métriques sous forme de dictionnaire sérialisable.
+
+        Returns:
+            dict: `elapsed_seconds`, `phases` ({phase: {'seconds', 'calls'}}), `counters`, `errors`,
+            `rates` (fichiers et groupes par seconde) et `detection` (lectures d'en-tête et replis sur Fiona).
+        """
+        elapsed = self.elapsed()
+        with self.lock:
+            phases = {phase: {'seconds': round(seconds, 6), 'calls': calls}
+                      for phase, (seconds, calls) in self.timers.items()}
+            counters = dict(self.counters)
+            errors = dict(self.errors)
+        return {
+            'elapsed_seconds': round(elapsed, 6),
+            'phases': phases,
+            'counters': counters,
+            'errors': errors,
+            'rates': {
+                'files_per_second': round(counters.get('files_renamed', 0) / elapsed, 3) if elapsed else 0.0,
+                'groups_per_second': round(counters.get('groups', 0) / elapsed, 3) if elapsed else 0.0,
+            },
+            'detection': get_detection_stats(),
+        }
+
+    def summary_table(self):
+        """
+        Retourne le tableau récapitulatif de l'exécution, prêt à être affiché.
+        """
+        snapshot = self.snapshot()
+        elapsed = snapshot['elapsed_seconds']
+        lines = [f"{'Phase':<10}{'temps (s)':>12}{'appels':>10}{'part':>8}"]
+        for phase, stats in snapshot['phases'].items():
+            share = stats['seconds'] / elapsed * 100 if elapsed else 0.0
+            lines.append(f"{phase:<10}{stats['seconds']:>12.3f}{stats['calls']:>10}{share:>7.1f}%")
+        lines.append(f"{'total':<10}{elapsed:>12.3f}")
+        lines.append(f"Fichiers renommés : {snapshot['counters'].get('files_renamed', 0)} "
+                     f"({snapshot['rates']['files_per_second']}/s), "
+                     f"groupes traités : {snapshot['counters'].get('groups', 0)} "
+                     f"({snapshot['rates']['groups_per_second']}/s)")
+        detection = snapshot['detection']
+        lines.append(f"Géométrie lue dans l'en-tête : {detection['header']}, repli sur Fiona : {detection['fallback']}")
+        if snapshot['errors']:
+            lines.append("Erreurs : " + ", ".join(f"{kind} = {count}" for kind, count in sorted(snapshot['errors'].items())))
+        return "\n".join(lines)
+
+    def to_prometheus(self):
+        """
+        Retourne les métriques au format texte de Prometheus (collecteur textfile de node_exporter).
+        """
+        snapshot = self.snapshot()
+        ns = PROMETHEUS_NAMESPACE
+        lines = [
+            f"# HELP {ns}_run_duration_seconds Durée de l'exécution.",
+            f"# TYPE {ns}_run_duration_seconds gauge",
+            f"{ns}_run_duration_seconds {snapshot['elapsed_seconds']}",
+            f"# HELP {ns}_phase_seconds_total Temps cumulé par phase.",
+            f"# TYPE {ns}_phase_seconds_total counter",
+        ]
+        lines += [f'{ns}_phase_seconds_total{{phase="{phase}"}} {stats["seconds"]}'
+                  for phase, stats in snapshot['phases'].items()]
+        lines += [f"# HELP {ns}_phase_calls_total Nombre d'appels par phase.",
+                  f"# TYPE {ns}_phase_calls_total counter"]
+        lines += [f'{ns}_phase_calls_total{{phase="{phase}"}} {stats["calls"]}'
+                  for phase, stats in snapshot['phases'].items()]
+        lines += [f"# HELP {ns}_events_total Événements de l'exécution (dossiers, groupes, fichiers).",
+                  f"# TYPE {ns}_events_total counter"]
+        lines += [f'{ns}_events_total{{name="{name}"}} {count}' for name, count in sorted(snapshot['counters'].items())]
+        lines += [f"# HELP {ns}_errors_total Erreurs par type.",
+                  f"# TYPE {ns}_errors_total counter"]
+        lines += [f'{ns}_errors_total{{kind="{kind}"}} {count}' for kind, count in sorted(snapshot['errors'].items())]
+        lines += [f"# HELP {ns}_detection_total Détections de géométrie par méthode.",
+                  f"# TYPE {ns}_detection_total counter"]
+        lines += [f'{ns}_detection_total{{method="{method}"}} {count}'
+                  for method, count in snapshot['detection'].items()]
+        for rate, value in snapshot['rates'].items():
+            lines += [f"# TYPE {ns}_{rate} gauge", f"{ns}_{rate} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_path):
+        """
+        Écrit les métriques dans un fichier : format texte Prometheus si l'extension est .prom, JSON sinon.
+        Le fichier est remplacé d'un bloc pour ne jamais être lu à moitié écrit.
+        """
+        if file_path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=4)
+        temporary_path = file_path + ".tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temporary_path, file_path)
+
+
+# Métriques de l'exécution courante
+current_metrics = RunMetrics()
+
+
+def get_metrics():
+    return current_metrics
+
+
+def reset_metrics():
+    """
+    Remplace les métriques courantes par des métriques vierges (début d'une nouvelle exécution).
+    """
+    global current_metrics
+    current_metrics = RunMetrics()
+    return current_metrics
+
+
+def timed(phase):
+    """
+    Décorateur qui ajoute la durée de chaque appel de la fonction au temps cumulé de la phase.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                current_metrics.add_time(phase, time.perf_counter() - start)
+        return wrapper
+    return decorator
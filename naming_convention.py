@@ -1,34 +1,31 @@
 import os
-import fiona
-from utils import remove_accents_and_special_chars, split_into_segments, process_segments
+from geojson_reader import sniff_geojson
+from gpkg_reader import sniff_geopackage, GeoPackageError
+from kml_reader import sniff_kml, KmlError
+from metrics import get_metrics, timed
+from shapefile_header import sniff_geometry, count_detection, MalformedHeaderError
+from utils import normalize_base_name, split_extension
 
 # Liste des extensions généralement associées à un groupe de fichiers shapefile
 SHAPEFILE_EXTENSIONS = ['.shp', '.shx', '.dbf', '.prj', '.sbn', '.sbx', '.sld', '.cpg', '.xml', '.shp.xml', '.qml', '.qlr', '.qpj', '.cst']
 
+# Formats renommés sans suffixe de géométrie (extensions en minuscules)
+NO_SUFFIX_EXTENSIONS = frozenset(['.csv', '.dwg'])
+
 def apply_naming_convention(filename, prefix, suffix, source, year, scale):
     """
     Applique la convention de nommage au fichier selon le format :
     [prefix]_[suffix]_[nomFichierCamelCase]_[source]_[année].[extension].
     """
-    # Extraire uniquement le nom de base du fichier, sans le chemin
-    base_name = os.path.basename(filename)  # Nom de fichier avec extension
-    base_name_no_ext = os.path.splitext(base_name)[0]  # Retirer l'extension
-
-    # Gestion spécifique des fichiers .shp.xml
-    if filename.endswith('.shp.xml'):
-        base_name_no_ext = os.path.splitext(os.path.splitext(base_name)[0])[0]
-        ext = '.shp.xml'
-    else:
-        ext = os.path.splitext(filename)[1].lower()
+    # Extraire uniquement le nom de base du fichier, sans le chemin ni l'extension (.shp.xml compris)
+    base_name_no_ext, ext = split_extension(os.path.basename(filename))
 
-    # Si c'est un fichier GeoPackage, GeoJSON, CSV, KMZ, KML ou DWG, pas de suffixe
-    if ext in ['.gpkg', '.json', '.geojson', '.csv', '.kmz', '.KMZ', '.kml', '.KML' '.dwg', '.DWG']:
+    # Si c'est un fichier CSV ou DWG, pas de suffixe
+    if ext in NO_SUFFIX_EXTENSIONS:
         suffix = ''  # Pas de suffixe pour ces formats
 
-    # Nettoyer et segmenter le nom du fichier
-    cleaned_name = remove_accents_and_special_chars(base_name_no_ext)
-    segments = split_into_segments(cleaned_name)
-    camel_case_base = process_segments(segments)
+    # Nettoyer et segmenter le nom du fichier (une seule fois par nom de base grâce au cache)
+    camel_case_base = normalize_base_name(base_name_no_ext)
 
     # Construire la nouvelle partie du nom de fichier sous forme de liste
     new_name_parts = [prefix, suffix, camel_case_base] if suffix else [prefix, camel_case_base]
@@ -46,37 +43,154 @@ def apply_naming_convention(filename, prefix, suffix, source, year, scale):
     return f"{final_name}{ext}"
 
 
-import fiona
-
-def identify_suffix(shapefile):
+@timed('suffix')
+def identify_suffix(file_path, verbose=True):
     """
     Identifie le suffixe en fonction du type de géométrie contenu dans le fichier (Point, LineString, Polygon, etc.).
-    Utilise Fiona pour lire les métadonnées du shapefile, y compris pour les géométries 3D (ex: PointZ, LineStringZ, PolygonZ, 3D types).
-    """
-    if shapefile.endswith('.shp'):
-        try:
-            # Ouvrir le fichier avec Fiona pour lire les métadonnées
-            with fiona.open(shapefile, 'r') as src:
-                # Vérifier si le fichier contient des entités
-                if len(src) == 0:
-                    print(f"Le fichier {shapefile} ne contient aucune entité.")
-                    return "empty"
-                
-                # Récupérer le type de géométrie et supprimer "3D " si présent
-                geom_type = src.schema['geometry'].replace("3D ", "")
-                print(f"Type de géométrie détecté dans: {geom_type}")
-                
-                # Déterminer le suffixe en fonction du type de géométrie, y compris pour les géométries 3D (suffixe Z)
-                if geom_type in ['Point', 'MultiPoint', 'PointZ', 'MultiPointZ']:
-                    return "pt"
-                elif geom_type in ['LineString', 'MultiLineString', 'LineStringZ', 'MultiLineStringZ']:
-                    return "line"
-                elif geom_type in ['Polygon', 'MultiPolygon', 'PolygonZ', 'MultiPolygonZ']:
-                    return "poly"
-                else:
-                    print(f"Géométrie non supportée : {geom_type}")
-                    return "unknown"
-        except Exception as e:
-            print(f"Erreur lors de la lecture du fichier {shapefile}: {e}")
-            return "unknown"
-    return ""  # Si le fichier n'est pas un shapefile
+    La détection dépend du format du fichier principal du groupe (voir SUFFIX_DETECTORS).
+    Avec verbose=False (détection en arrière-plan), aucun message n'est affiché.
+    Retourne une chaîne vide pour un format sans détection de géométrie, et None pour un fichier
+    dont le contenu ne correspond pas à son format (.geojson qui n'est pas du GeoJSON).
+    """
+    detector = SUFFIX_DETECTORS.get(split_extension(file_path)[1])
+    if detector is None:
+        return ""
+    return detector(file_path, verbose)
+
+def identify_shapefile_suffix(shapefile, verbose=True):
+    """
+    Identifie le suffixe d'un shapefile.
+    Lit directement l'en-tête de 100 octets du .shp et la taille du .shx, y compris pour les variantes Z et M.
+    Fiona n'est utilisé qu'en repli lorsque l'en-tête est invalide.
+    """
+    report = print if verbose else silent
+    try:
+        geom_type, feature_count, suffix = sniff_geometry(shapefile)
+    except (MalformedHeaderError, OSError) as e:
+        report(f"En-tête illisible pour {shapefile} ({e}), repli sur Fiona.")
+        count_detection('fallback')
+        return identify_suffix_with_fiona(shapefile, verbose)
+
+    count_detection('header')
+
+    # Vérifier si le fichier contient des entités
+    if feature_count == 0:
+        report(f"Le fichier {shapefile} ne contient aucune entité.")
+        return "empty"
+
+    report(f"Type de géométrie détecté dans: {geom_type}")
+    if suffix is None:
+        report(f"Géométrie non supportée : {geom_type}")
+        return "unknown"
+    return suffix
+
+def identify_geopackage_suffix(geopackage, verbose=True):
+    """
+    Identifie le suffixe d'un GeoPackage en lisant ses tables système avec sqlite3, en lecture seule.
+    Un GeoPackage dont les couches ont des géométries différentes reçoit le suffixe `mixed`.
+    """
+    report = print if verbose else silent
+    try:
+        geometry_types, layer_count, feature_count, suffix = sniff_geopackage(geopackage)
+    except GeoPackageError as e:
+        get_metrics().error(f"gpkg:{type(e).__name__}")
+        report(f"Erreur lors de la lecture du fichier {geopackage}: {e}")
+        return "unknown"
+
+    report(f"Couches détectées dans {geopackage} : {layer_count} ({', '.join(geometry_types)}), "
+           f"{feature_count} entité(s)")
+    if suffix == "empty":
+        report(f"Le fichier {geopackage} ne contient aucune entité.")
+    return suffix
+
+def silent(*args, **kwargs):
+    """
+    Remplace print lorsque les messages de détection doivent être masqués.
+    """
+
+def identify_suffix_with_fiona(shapefile, verbose=True):
+    """
+    Identifie le suffixe en ouvrant le shapefile avec Fiona.
+    Utilisé uniquement en repli lorsque l'en-tête du fichier ne peut pas être lu directement.
+    """
+    report = print if verbose else silent
+    try:
+        # Fiona (et GDAL) n'est importé qu'au premier repli, pour ne pas ralentir le démarrage
+        import fiona
+
+        # Ouvrir le fichier avec Fiona pour lire les métadonnées
+        with fiona.open(shapefile, 'r') as src:
+            # Vérifier si le fichier contient des entités
+            if len(src) == 0:
+                report(f"Le fichier {shapefile} ne contient aucune entité.")
+                return "empty"
+
+            # Récupérer le type de géométrie et supprimer "3D " si présent
+            geom_type = src.schema['geometry'].replace("3D ", "")
+            report(f"Type de géométrie détecté dans: {geom_type}")
+
+            # Déterminer le suffixe en fonction du type de géométrie, y compris pour les géométries 3D (suffixe Z)
+            if geom_type in ['Point', 'MultiPoint', 'PointZ', 'MultiPointZ']:
+                return "pt"
+            elif geom_type in ['LineString', 'MultiLineString', 'LineStringZ', 'MultiLineStringZ']:
+                return "line"
+            elif geom_type in ['Polygon', 'MultiPolygon', 'PolygonZ', 'MultiPolygonZ']:
+                return "poly"
+            else:
+                report(f"Géométrie non supportée : {geom_type}")
+                return "unknown"
+    except Exception as e:
+        get_metrics().error(f"fiona:{type(e).__name__}")
+        report(f"Erreur lors de la lecture du fichier {shapefile}: {e}")
+        return "unknown"
+
+def identify_geojson_suffix(geojson, verbose=True):
+    """
+    Identifie le suffixe d'un fichier GeoJSON par une lecture en flux qui s'arrête dès que la géométrie
+    est classée. Retourne None pour un fichier qui n'est pas du GeoJSON : le groupe est alors ignoré.
+    """
+    report = print if verbose else silent
+    try:
+        geometry_types, samples, suffix = sniff_geojson(geojson)
+    except OSError as e:
+        get_metrics().error(f"geojson:{type(e).__name__}")
+        report(f"Erreur lors de la lecture du fichier {geojson}: {e}")
+        return "unknown"
+
+    if suffix is None:
+        report(f"Le fichier {geojson} n'est pas un fichier GeoJSON.")
+        return None
+    if suffix == "empty":
+        report(f"Le fichier {geojson} ne contient aucune entité.")
+        return suffix
+    report(f"Type de géométrie détecté dans: {', '.join(geometry_types)} ({samples} géométrie(s) examinée(s))")
+    return suffix
+
+def identify_kml_suffix(kml, verbose=True):
+    """
+    Identifie le suffixe d'un fichier KML, ou du document KML d'une archive KMZ lu sans extraction,
+    par une lecture incrémentale qui s'arrête dès que la géométrie est classée.
+    """
+    report = print if verbose else silent
+    try:
+        geometry_types, samples, suffix = sniff_kml(kml)
+    except (KmlError, OSError) as e:
+        get_metrics().error(f"kml:{type(e).__name__}")
+        report(f"Erreur lors de la lecture du fichier {kml}: {e}")
+        return "unknown"
+
+    if suffix == "empty":
+        report(f"Le fichier {kml} ne contient aucune entité.")
+        return suffix
+    report(f"Type de géométrie détecté dans: {', '.join(geometry_types)} ({samples} géométrie(s) examinée(s))")
+    return suffix
+
+# Détection du suffixe selon l'extension du fichier principal du groupe
+SUFFIX_DETECTORS = {
+    '.shp': identify_shapefile_suffix,
+    '.gpkg': identify_geopackage_suffix,
+    '.geojson': identify_geojson_suffix,
+    '.json': identify_geojson_suffix,
+    '.kml': identify_kml_suffix,
+    '.kmz': identify_kml_suffix,
+}
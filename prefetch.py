@@ -0,0 +1,55 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Valeurs par défaut du nombre de threads de détection et de la profondeur d'anticipation
+DEFAULT_WORKERS = 4
+DEFAULT_LOOKAHEAD = 16
+
+
+class Prefetcher:
+    """
+    Exécute à l'avance, dans un pool de threads borné, le travail associé aux éléments d'une séquence,
+    tout en restituant les éléments et leurs résultats dans l'ordre d'origine.
+
+    Au plus `lookahead` éléments sont tirés de la séquence avant d'être restitués, ce qui borne à la fois
+    la mémoire et le travail fait à l'avance. Avec `workers=0`, le travail est fait au moment de la restitution.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, lookahead=DEFAULT_LOOKAHEAD):
+        self.workers = workers
+        self.lookahead = max(1, lookahead)
+
+    def iterate(self, items, make_job):
+        """
+        Parcourt les éléments en préparant leur résultat à l'avance.
+
+        Args:
+            items (iterable): Les éléments, consommés au fur et à mesure.
+            make_job (callable): Appelée dans le thread principal pour chaque élément ; retourne une fonction
+                sans argument à exécuter en arrière-plan, ou None si l'élément ne demande aucun travail.
+
+        Yields:
+            tuple: (élément, résultat du travail ou None), dans l'ordre des éléments.
+        """
+        if self.workers <= 0:
+            for item in items:
+                job = make_job(item)
+                yield item, job() if job is not None else None
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+        pending = deque()
+        try:
+            for item in items:
+                job = make_job(item)
+                pending.append((item, executor.submit(job) if job is not None else None))
+                if len(pending) >= self.lookahead:
+                    yield self.pop_result(pending)
+            while pending:
+                yield self.pop_result(pending)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def pop_result(self, pending):
+        item, future = pending.popleft()
+        return item, future.result() if future is not None else None
@@ -0,0 +1,217 @@
+import errno
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import run_log
+from metrics import get_metrics
+from utils import split_extension, PRIMARY_EXTENSIONS
+
+# Valeurs par défaut : threads de renommage (0 = dans le thread principal), opérations simultanées par
+# point de montage, nouvelles tentatives sur erreur transitoire et délai initial entre deux tentatives (secondes)
+DEFAULT_RENAME_WORKERS = 0
+DEFAULT_PER_MOUNT = 4
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.05
+
+# Erreurs considérées comme transitoires sur un partage réseau (SMB, NFS) : l'opération est retentée
+TRANSIENT_ERRNOS = frozenset(code for code in (
+    getattr(errno, name, None) for name in
+    ('EAGAIN', 'EBUSY', 'EINTR', 'EIO', 'ETIMEDOUT', 'ESTALE', 'ECONNRESET', 'ECONNABORTED', 'ENETRESET'))
+    if code is not None)
+
+# Codes Windows de violation de partage ou de verrouillage (fichier ouvert par un autre processus)
+TRANSIENT_WINERRORS = frozenset([32, 33])
+
+
+def is_transient(error):
+    """
+    Indique si une erreur de renommage mérite une nouvelle tentative.
+    """
+    return error.errno in TRANSIENT_ERRNOS or getattr(error, 'winerror', None) in TRANSIENT_WINERRORS
+
+
+class RenameExecutor:
+    """
+    Exécute les renommages planifiés groupe par groupe, dans un pool de threads borné.
+
+    Les groupes s'exécutent en parallèle (donc aussi plusieurs dossiers à la fois) ; à l'intérieur d'un groupe,
+    les fichiers sont renommés dans l'ordre du plan et le groupe réussit ou échoue en entier : si un
+    renommage échoue définitivement, ceux déjà faits dans le groupe sont annulés. Les erreurs transitoires
+    sont retentées avec un délai croissant, et le nombre d'opérations simultanées est limité par point de
+    montage (st_dev du dossier). Avec `workers=0`, chaque groupe est renommé immédiatement dans le thread appelant.
+
+    Les fonctions de fin de groupe (mise à jour de l'index, etc.) sont toujours appelées dans le thread principal,
+    lors de `drain()` ou de `shutdown()`.
+    """
+
+    def __init__(self, workers=DEFAULT_RENAME_WORKERS, per_mount=DEFAULT_PER_MOUNT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, planner=None):
+        self.workers = workers
+        self.per_mount = max(1, per_mount)
+        self.retries = retries
+        self.backoff = backoff
+        self.planner = planner
+        self.pending = deque()
+        # Nombre maximal de groupes soumis et pas encore terminés, pour borner la mémoire
+        self.max_pending = max(1, workers * 4)
+        self.lock = threading.Lock()
+        self.mount_of_directory = {}
+        self.mount_semaphores = {}
+        self._pool = None
+
+    def submit(self, plan, journal=None, details=None, on_complete=None):
+        """
+        Soumet le renommage d'un groupe. Avec un journal, le plan est écrit sur disque avant le premier renommage.
+
+        Args:
+            plan (list): Les couples (ancien chemin, nouveau chemin), dans l'ordre d'exécution.
+            journal (RenameJournal, optional): Le journal de l'exécution.
+            details (dict, optional): Les métadonnées appliquées, consignées dans le journal d'exécution.
+            on_complete (callable, optional): Appelée dans le thread principal avec les couples renommés
+                (liste vide si le groupe a échoué).
+        """
+        seqs = journal.record_plan(plan) if journal is not None else [None] * len(plan)
+        if self.workers <= 0:
+            done = self.run_group(plan, seqs, journal, details)
+            if on_complete is not None:
+                on_complete(done)
+            return
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rename")
+        self.pending.append((self._pool.submit(self.run_group, plan, seqs, journal, details), on_complete))
+        self.drain()
+        while len(self.pending) > self.max_pending:
+            self.complete_oldest()
+
+    def complete_oldest(self):
+        future, on_complete = self.pending.popleft()
+        done = future.result()
+        if on_complete is not None:
+            on_complete(done)
+
+    def drain(self):
+        """
+        Appelle les fonctions de fin des groupes déjà terminés, dans l'ordre de soumission.
+        """
+        while self.pending and self.pending[0][0].done():
+            self.complete_oldest()
+
+    def shutdown(self):
+        """
+        Attend la fin de tous les groupes soumis et libère le pool de threads.
+        """
+        while self.pending:
+            self.complete_oldest()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def mount_semaphore(self, directory):
+        """
+        Retourne le sémaphore du point de montage du dossier, identifié par son st_dev.
+        """
+        with self.lock:
+            device = self.mount_of_directory.get(directory)
+            if device is None:
+                try:
+                    device = os.stat(directory).st_dev
+                except OSError:
+                    device = directory
+                self.mount_of_directory[directory] = device
+            semaphore = self.mount_semaphores.get(device)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_mount)
+                self.mount_semaphores[device] = semaphore
+            return semaphore
+
+    def rename(self, old_path, new_path):
+        """
+        Renomme un fichier en retentant les erreurs transitoires avec un délai croissant.
+        """
+        semaphore = self.mount_semaphore(os.path.dirname(old_path))
+        attempt = 0
+        while True:
+            try:
+                with semaphore:
+                    # os.rename remplace la cible sans prévenir sous POSIX : un fichier arrivé depuis la
+                    # planification ne doit pas être écrasé (un simple changement de casse reste permis)
+                    if os.path.lexists(new_path) and not os.path.samefile(old_path, new_path):
+                        raise FileExistsError(errno.EEXIST, "Le fichier cible existe déjà", new_path)
+                    os.rename(old_path, new_path)
+                return
+            except OSError as e:
+                if attempt >= self.retries or not is_transient(e):
+                    raise
+                get_metrics().increment('rename_retries')
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+
+    def run_group(self, plan, seqs, journal=None, details=None):
+        """
+        Renomme les fichiers d'un groupe dans l'ordre du plan ; en cas d'échec, annule les renommages déjà faits.
+
+        Returns:
+            list: Les couples renommés, ou une liste vide si le groupe a échoué.
+        """
+        logger = run_log.get_logger()
+        metrics = get_metrics()
+        done = []
+        for index, ((old_path, new_path), seq) in enumerate(zip(plan, seqs)):
+            start = time.perf_counter()
+            try:
+                self.rename(old_path, new_path)
+            except OSError as e:
+                metrics.add_time('rename', time.perf_counter() - start)
+                metrics.error(f"rename:{type(e).__name__}")
+                logger.log('rename_error', old_path=os.path.abspath(old_path), new_path=os.path.abspath(new_path),
+                           error=str(e))
+                print(f"Erreur lors du renommage de '{os.path.basename(old_path)}' : {e}")
+                if journal is not None:
+                    journal.mark_failed(seq, e)
+                self.revert_group(done, plan[index:], seqs[index + 1:], journal)
+                return []
+            duration = time.perf_counter() - start
+            metrics.add_time('rename', duration)
+            metrics.increment('files_renamed')
+            if journal is not None:
+                journal.mark_done(seq)
+            logger.log_rename(old_path, new_path, duration=duration, **(details or {}))
+            done.append((old_path, new_path, seq))
+
+            # Afficher uniquement le fichier principal lors du renommage
+            if split_extension(old_path)[1] in PRIMARY_EXTENSIONS:
+                print(f"Renommage de '{os.path.basename(old_path)}' en '{os.path.basename(new_path)}'")
+        return [(old_path, new_path) for old_path, new_path, _ in done]
+
+    def revert_group(self, done, not_done, not_done_seqs, journal=None):
+        """
+        Annule, du plus récent au plus ancien, les renommages déjà faits d'un groupe en échec,
+        et libère les noms réservés par le planificateur pour tout le groupe.
+        """
+        get_metrics().increment('groups_failed')
+        logger = run_log.get_logger()
+        for old_path, new_path, seq in reversed(done):
+            try:
+                self.rename(new_path, old_path)
+            except OSError as e:
+                logger.log('revert_error', old_path=os.path.abspath(old_path), new_path=os.path.abspath(new_path),
+                           error=str(e))
+                print(f"Impossible d'annuler le renommage de '{os.path.basename(new_path)}' : {e}")
+                continue
+            if journal is not None:
+                journal.mark_reverted(seq)
+            if self.planner is not None:
+                self.planner.release(old_path, new_path)
+            logger.log('rename_reverted', old_path=os.path.abspath(old_path), new_path=os.path.abspath(new_path))
+        for (old_path, new_path), seq in zip(not_done[1:], not_done_seqs):
+            if journal is not None:
+                journal.mark_failed(seq, "groupe annulé")
+        if self.planner is not None:
+            for old_path, new_path in not_done:
+                self.planner.release(old_path, new_path)
+        if done or len(not_done) > 1:
+            print("Les autres fichiers du groupe ont été laissés sous leur ancien nom.")
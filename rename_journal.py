@@ -0,0 +1,270 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+# Dossier par défaut des journaux de renommage
+DEFAULT_JOURNAL_DIR = "rename_journal"
+
+JOURNAL_EXTENSION = ".jsonl"
+
+
+def new_run_id():
+    """
+    Génère un identifiant d'exécution lisible et unique (date, heure et suffixe aléatoire).
+    """
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+class RenameJournal:
+    """
+    Journal d'écriture anticipée des renommages d'une exécution, au format JSON Lines.
+
+    Chaque couple (ancien chemin, nouveau chemin) est enregistré et écrit sur disque avant d'être exécuté,
+    puis marqué comme effectué. Après un arrêt brutal, le journal permet de terminer les renommages
+    planifiés (reprise) ou d'annuler en bloc tous ceux de l'exécution (retour arrière).
+    Les écritures sont protégées par un verrou, les renommages pouvant s'exécuter dans plusieurs threads.
+    """
+
+    def __init__(self, journal_dir=DEFAULT_JOURNAL_DIR, run_id=None):
+        os.makedirs(journal_dir, exist_ok=True)
+        self.run_id = run_id or new_run_id()
+        self.file_path = journal_path(journal_dir, self.run_id)
+        self.next_seq = 0
+        if os.path.exists(self.file_path):
+            entries = read_journal(self.file_path)['planned']
+            self.next_seq = max(entries, default=-1) + 1
+        self.lock = threading.Lock()
+        self._file = open(self.file_path, 'a', encoding='utf-8')
+
+    def write(self, record, sync=False):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self._file.write(line)
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+
+    def record_plan(self, plan):
+        """
+        Enregistre les renommages planifiés d'un groupe et les force sur disque avant leur exécution.
+
+        Args:
+            plan (list): Les couples (ancien chemin, nouveau chemin).
+
+        Returns:
+            list: Les numéros de séquence attribués, dans l'ordre du plan.
+        """
+        seqs = []
+        with self.lock:
+            for old_path, new_path in plan:
+                seq = self.next_seq
+                self.next_seq += 1
+                self._file.write(json.dumps({'op': 'plan', 'seq': seq, 'old': os.path.abspath(old_path),
+                                             'new': os.path.abspath(new_path)}, ensure_ascii=False) + "\n")
+                seqs.append(seq)
+            if seqs:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        return seqs
+
+    def mark_done(self, seq):
+        """
+        Marque un renommage planifié comme effectué.
+        """
+        self.write({'op': 'done', 'seq': seq})
+
+    def mark_failed(self, seq, error):
+        """
+        Marque un renommage planifié comme échoué ; il ne sera ni repris ni annulé.
+        """
+        self.write({'op': 'failed', 'seq': seq, 'error': str(error)})
+
+    def mark_reverted(self, seq):
+        """
+        Marque un renommage effectué puis annulé (échec de son groupe) ; il ne sera ni repris ni annulé à nouveau.
+        """
+        self.write({'op': 'rollback', 'seq': seq})
+
+    def close(self, completed=True):
+        """
+        Ferme le journal ; une exécution terminée normalement est marquée comme complète.
+        """
+        if completed:
+            self.write({'op': 'end'}, sync=True)
+        self._file.close()
+
+
+class DirectoryListings:
+    """
+    Listes des noms de chaque dossier, lues une seule fois (os.listdir) pour tester l'existence des fichiers
+    en mémoire lors d'une reprise ou d'une annulation en bloc.
+    """
+
+    def __init__(self):
+        self.names = {}
+
+    def names_in(self, directory):
+        names = self.names.get(directory)
+        if names is None:
+            try:
+                names = set(os.listdir(directory))
+            except OSError:
+                names = set()
+            self.names[directory] = names
+        return names
+
+    def exists(self, path):
+        directory, name = os.path.split(path)
+        return name in self.names_in(directory)
+
+    def moved(self, old_path, new_path):
+        old_directory, old_name = os.path.split(old_path)
+        new_directory, new_name = os.path.split(new_path)
+        self.names_in(old_directory).discard(old_name)
+        self.names_in(new_directory).add(new_name)
+
+
+def journal_path(journal_dir, run_id):
+    return os.path.join(journal_dir, f"{run_id}{JOURNAL_EXTENSION}")
+
+
+def read_journal(file_path):
+    """
+    Relit un journal de renommage.
+
+    Returns:
+        dict: `planned` ({seq: (ancien, nouveau)}), `done`, `failed` et `rolled_back` (ensembles de seq),
+        et `complete` (True si l'exécution s'est terminée normalement).
+    """
+    state = {'planned': {}, 'done': set(), 'failed': set(), 'rolled_back': set(), 'complete': False}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Dernière ligne tronquée par un arrêt brutal
+                continue
+            op = record.get('op')
+            if op == 'plan':
+                state['planned'][record['seq']] = (record['old'], record['new'])
+            elif op == 'done':
+                state['done'].add(record['seq'])
+            elif op == 'failed':
+                state['failed'].add(record['seq'])
+            elif op == 'rollback':
+                state['rolled_back'].add(record['seq'])
+            elif op == 'end':
+                state['complete'] = True
+    return state
+
+
+def find_interrupted_run(journal_dir):
+    """
+    Retourne l'identifiant de l'exécution interrompue la plus récente, ou None.
+    """
+    if not os.path.isdir(journal_dir):
+        return None
+    run_ids = sorted((name[:-len(JOURNAL_EXTENSION)] for name in os.listdir(journal_dir)
+                      if name.endswith(JOURNAL_EXTENSION)), reverse=True)
+    for run_id in run_ids:
+        if not read_journal(journal_path(journal_dir, run_id))['complete']:
+            return run_id
+    return None
+
+
+def resume_run(journal_dir=DEFAULT_JOURNAL_DIR, run_id=None):
+    """
+    Termine les renommages planifiés mais non effectués d'une exécution interrompue.
+    Un renommage dont la cible existe déjà et la source a disparu est considéré comme effectué.
+
+    Args:
+        journal_dir (str): Le dossier des journaux.
+        run_id (str, optional): L'exécution à reprendre ; par défaut la dernière exécution interrompue.
+
+    Returns:
+        tuple: (nombre de renommages effectués, nombre de conflits laissés en l'état), ou None si rien à reprendre.
+    """
+    run_id = run_id or find_interrupted_run(journal_dir)
+    if run_id is None or not os.path.exists(journal_path(journal_dir, run_id)):
+        print("Aucune exécution interrompue à reprendre.")
+        return None
+
+    state = read_journal(journal_path(journal_dir, run_id))
+    journal = RenameJournal(journal_dir, run_id)
+    listings = DirectoryListings()
+    renamed = conflicts = 0
+
+    for seq, (old_path, new_path) in sorted(state['planned'].items()):
+        if seq in state['done'] or seq in state['failed'] or seq in state['rolled_back']:
+            continue
+        old_exists, new_exists = listings.exists(old_path), listings.exists(new_path)
+        if not old_exists and new_exists:
+            journal.mark_done(seq)
+            continue
+        if old_exists and not new_exists:
+            try:
+                os.rename(old_path, new_path)
+            except OSError as e:
+                journal.mark_failed(seq, e)
+                print(f"Erreur lors du renommage de '{old_path}' : {e}")
+                conflicts += 1
+                continue
+            listings.moved(old_path, new_path)
+            journal.mark_done(seq)
+            renamed += 1
+            continue
+        print(f"Conflit pour '{old_path}' -> '{new_path}', laissé en l'état.")
+        conflicts += 1
+
+    journal.close()
+    print(f"Reprise de l'exécution {run_id} : {renamed} renommage(s) effectué(s), {conflicts} conflit(s).")
+    return renamed, conflicts
+
+
+def rollback_run(run_id, journal_dir=DEFAULT_JOURNAL_DIR):
+    """
+    Annule en un seul passage tous les renommages effectués par une exécution, du plus récent au plus ancien.
+
+    Args:
+        run_id (str): L'exécution à annuler.
+        journal_dir (str): Le dossier des journaux.
+
+    Returns:
+        tuple: (nombre de renommages annulés, nombre de conflits laissés en l'état), ou None si le journal est introuvable.
+    """
+    file_path = journal_path(journal_dir, run_id)
+    if not os.path.exists(file_path):
+        print(f"Journal introuvable pour l'exécution {run_id}.")
+        return None
+
+    state = read_journal(file_path)
+    listings = DirectoryListings()
+    reverted = conflicts = 0
+
+    with open(file_path, 'a', encoding='utf-8') as journal_file:
+        for seq in sorted(state['planned'], reverse=True):
+            if seq in state['rolled_back'] or seq in state['failed']:
+                continue
+            old_path, new_path = state['planned'][seq]
+            # Un renommage non marqué comme effectué a pu l'être juste avant un arrêt brutal
+            if not listings.exists(new_path) or listings.exists(old_path):
+                if seq in state['done']:
+                    print(f"Conflit pour '{new_path}' -> '{old_path}', laissé en l'état.")
+                    conflicts += 1
+                continue
+            try:
+                os.rename(new_path, old_path)
+            except OSError as e:
+                print(f"Erreur lors de l'annulation de '{new_path}' : {e}")
+                conflicts += 1
+                continue
+            listings.moved(new_path, old_path)
+            journal_file.write(json.dumps({'op': 'rollback', 'seq': seq}) + "\n")
+            reverted += 1
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+    print(f"Annulation de l'exécution {run_id} : {reverted} renommage(s) annulé(s), {conflicts} conflit(s).")
+    return reverted, conflicts
@@ -0,0 +1,177 @@
+import csv
+import json
+import os
+
+from metrics import get_metrics
+
+# Colonnes d'un plan de renommage. Les fichiers d'un même groupe partagent leur numéro de groupe et se suivent ;
+# la taille et le mtime de la source permettent de vérifier à l'application qu'elle n'a pas changé.
+PLAN_COLUMNS = ['group', 'old_path', 'new_path', 'prefix', 'suffix', 'source', 'year', 'scale', 'reason', 'size',
+                'mtime_ns']
+
+# Extensions reconnues comme JSON Lines ; tout autre fichier de plan est écrit et lu en CSV
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+def is_json_lines(file_path):
+    return os.path.splitext(file_path)[1].lower() in JSON_LINES_EXTENSIONS
+
+
+class PlanWriter:
+    """
+    Écrit les renommages proposés dans un fichier de plan (CSV ou JSON Lines) au lieu de les exécuter.
+
+    S'utilise à la place de l'exécuteur de renommages : chaque groupe soumis est écrit aussitôt, une ligne par
+    fichier, sans que le plan soit gardé en mémoire. Aucun fichier n'est renommé et aucune fonction de fin
+    de groupe n'est appelée.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.json_lines = is_json_lines(file_path)
+        self.groups = 0
+        self.rows = 0
+        self._file = open(file_path, 'w', encoding='utf-8', newline='')
+        self._writer = None
+        if not self.json_lines:
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(PLAN_COLUMNS)
+
+    def submit(self, plan, journal=None, details=None, on_complete=None):
+        """
+        Écrit les renommages proposés pour un groupe.
+
+        Args:
+            plan (list): Les couples (ancien chemin, nouveau chemin).
+            journal: Ignoré, rien n'étant renommé.
+            details (dict, optional): Les métadonnées retenues et le motif de la décision (`reason`).
+            on_complete: Ignorée, rien n'étant renommé.
+        """
+        if not plan:
+            return
+        details = details or {}
+        self.groups += 1
+        for old_path, new_path in plan:
+            try:
+                stat = os.stat(old_path)
+                size, mtime_ns = stat.st_size, stat.st_mtime_ns
+            except OSError:
+                size = mtime_ns = None
+            row = [self.groups, os.path.abspath(old_path), os.path.abspath(new_path)]
+            row += [details.get(column) for column in ('prefix', 'suffix', 'source', 'year', 'scale', 'reason')]
+            row += [size, mtime_ns]
+            if self.json_lines:
+                self._file.write(json.dumps(dict(zip(PLAN_COLUMNS, row)), ensure_ascii=False) + "\n")
+            else:
+                self._writer.writerow(row)
+            self.rows += 1
+        get_metrics().increment('groups_planned')
+
+    def drain(self):
+        pass
+
+    def shutdown(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_plan_rows(file_path):
+    """
+    Lit un fichier de plan ligne par ligne.
+
+    Yields:
+        dict: Une ligne du plan, avec les colonnes de PLAN_COLUMNS (valeurs en texte pour un CSV).
+    """
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        if is_json_lines(file_path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def iter_plan_groups(file_path):
+    """
+    Regroupe les lignes consécutives d'un plan qui portent le même numéro de groupe.
+    Un seul groupe est gardé en mémoire à la fois.
+
+    Yields:
+        list: Les lignes d'un groupe.
+    """
+    current, rows = None, []
+    for row in read_plan_rows(file_path):
+        group = str(row.get('group'))
+        if rows and group != current:
+            yield rows
+            rows = []
+        current = group
+        rows.append(row)
+    if rows:
+        yield rows
+
+
+def as_int(value):
+    return int(value) if value not in (None, '') else None
+
+
+def check_group_rows(rows):
+    """
+    Vérifie, par un simple stat, que les sources d'un groupe n'ont pas changé depuis la planification
+    (même taille, même mtime) et que les cibles sont libres.
+
+    Returns:
+        str: Le problème trouvé, ou None si le groupe peut être renommé.
+    """
+    for row in rows:
+        old_path, new_path = row['old_path'], row['new_path']
+        try:
+            stat = os.stat(old_path)
+        except FileNotFoundError:
+            return f"'{old_path}' n'existe plus"
+        except OSError as e:
+            return f"'{old_path}' : {e}"
+        if (as_int(row.get('size')), as_int(row.get('mtime_ns'))) != (stat.st_size, stat.st_mtime_ns):
+            return f"'{old_path}' a changé depuis la planification"
+        # Un simple changement de casse n'est pas une collision sur un système insensible à la casse
+        if os.path.lexists(new_path) and os.path.normcase(new_path) != os.path.normcase(old_path):
+            return f"'{new_path}' existe déjà"
+    return None
+
+
+def apply_plan(file_path, executor, journal=None):
+    """
+    Exécute un plan de renommage relu : chaque groupe est renommé en entier par l'exécuteur, après vérification
+    que ses sources n'ont pas changé depuis la planification. Les groupes modifiés entre-temps sont ignorés.
+
+    Args:
+        file_path (str): Le fichier de plan (CSV ou JSON Lines).
+        executor (RenameExecutor): L'exécuteur des renommages.
+        journal (RenameJournal, optional): Le journal de l'exécution, pour la reprise et l'annulation.
+
+    Returns:
+        tuple: (groupes soumis au renommage, groupes ignorés).
+    """
+    metrics = get_metrics()
+    submitted = stale = 0
+    for rows in iter_plan_groups(file_path):
+        problem = check_group_rows(rows)
+        if problem is not None and executor.pending:
+            # Une cible peut être libérée par un groupe précédent encore en cours de renommage
+            executor.shutdown()
+            problem = check_group_rows(rows)
+        if problem is not None:
+            stale += 1
+            metrics.increment('groups_stale')
+            print(f"Groupe {rows[0].get('group')} ignoré : {problem}.")
+            continue
+        first = rows[0]
+        details = {column: first.get(column) or None for column in ('prefix', 'suffix', 'source', 'year', 'scale', 'reason')}
+        executor.submit([(row['old_path'], row['new_path']) for row in rows], journal, details)
+        executor.drain()
+        submitted += 1
+        metrics.increment('groups')
+    executor.shutdown()
+    return submitted, stale
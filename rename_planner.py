@@ -0,0 +1,108 @@
+import os
+import threading
+from collections import OrderedDict
+from naming_convention import apply_naming_convention
+from utils import split_extension
+
+
+class RenamePlanner:
+    """
+    Calcule à l'avance le nom final de chaque fichier d'un groupe et détecte les collisions en mémoire.
+
+    Les noms présents dans chaque dossier sont lus une seule fois (os.listdir) puis tenus à jour avec les
+    renommages planifiés, ce qui évite un os.path.exists par fichier. Seuls les derniers dossiers utilisés
+    sont gardés en mémoire, le parcours traitant les dossiers les uns après les autres.
+    Un verrou protège les ensembles de noms, les réservations pouvant être libérées depuis les threads de renommage.
+    """
+
+    def __init__(self, max_directories=64):
+        self.max_directories = max_directories
+        self.directory_names = OrderedDict()
+        self.lock = threading.RLock()
+
+    def names_in(self, directory):
+        """
+        Retourne l'ensemble des noms (normalisés selon la casse du système) existants ou planifiés du dossier.
+        """
+        with self.lock:
+            names = self.directory_names.get(directory)
+            if names is None:
+                names = {os.path.normcase(name) for name in os.listdir(directory)}
+                self.directory_names[directory] = names
+                if len(self.directory_names) > self.max_directories:
+                    self.directory_names.popitem(last=False)
+            else:
+                self.directory_names.move_to_end(directory)
+            return names
+
+    def reset(self):
+        """
+        Oublie les noms lus dans les dossiers, pour qu'ils soient relus au prochain groupe.
+        À appeler lorsque des fichiers ont pu arriver depuis la lecture et qu'aucun renommage planifié n'est en cours.
+        """
+        with self.lock:
+            self.directory_names.clear()
+
+    def plan_group(self, files, base_name, prefix, suffix, source, year, scale, matcher=None):
+        """
+        Planifie le renommage d'un groupe : chaque fichier reçoit directement son nom final.
+
+        Args:
+            files (list): Les chemins des fichiers du groupe.
+            base_name (str): Le nom de base à utiliser (éventuellement modifié par l'utilisateur).
+            prefix, suffix, source, year, scale (str): Les éléments de la convention de nommage.
+            matcher (PrefixMatcher, optional): Si le nom de base est déjà conforme, les fichiers
+                reçoivent seulement ce nom de base, sans appliquer à nouveau la convention.
+
+        Returns:
+            list: Les couples (ancien chemin, nouveau chemin) à renommer, sans collision, ou None si un fichier
+            ne peut pas recevoir son nouveau nom : le groupe n'est alors pas renommé du tout, pour ne pas
+            séparer ses fichiers (ex: .shp renommé sans son .dbf).
+        """
+        plan = []
+        for file in files:
+            directory, name = os.path.split(file)
+            # Nom que porterait le fichier avec le nom de base retenu, en conservant son extension d'origine
+            renamed_base = f"{base_name}{name[len(split_extension(name)[0]):]}"
+
+            if matcher is not None and matcher.matches(renamed_base):
+                new_name = renamed_base
+            else:
+                new_name = apply_naming_convention(os.path.join(directory, renamed_base), prefix, suffix, source, year, scale)
+                if not isinstance(new_name, str):
+                    print(f"Erreur : Le nouveau nom pour le fichier '{name}' n'est pas valide : {new_name}")
+                    return None
+
+            if new_name != name:
+                plan.append((file, os.path.join(directory, new_name)))
+
+        with self.lock:
+            # Toutes les cibles sont vérifiées avant de réserver le moindre nom
+            reserved = set()
+            for file, new_path in plan:
+                directory, name = os.path.split(file)
+                new_name = os.path.basename(new_path)
+                new_key = os.path.normcase(new_name)
+                # Un simple changement de casse n'est pas une collision sur un système insensible à la casse
+                if (new_key in self.names_in(directory) and new_key != os.path.normcase(name)) or \
+                        (directory, new_key) in reserved:
+                    print(f"Le fichier '{new_name}' existe déjà. Le groupe '{base_name}' ne sera pas renommé.")
+                    return None
+                reserved.add((directory, new_key))
+
+            for file, new_path in plan:
+                names = self.names_in(os.path.dirname(file))
+                names.discard(os.path.normcase(os.path.basename(file)))
+                names.add(os.path.normcase(os.path.basename(new_path)))
+        return plan
+
+    def release(self, old_path, new_path):
+        """
+        Annule la réservation d'un renommage planifié qui n'a pas pu être effectué.
+        """
+        directory = os.path.dirname(old_path)
+        with self.lock:
+            names = self.directory_names.get(directory)
+            if names is not None:
+                names.discard(os.path.normcase(os.path.basename(new_path)))
+                names.add(os.path.normcase(os.path.basename(old_path)))
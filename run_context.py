@@ -0,0 +1,51 @@
+from prefetch import Prefetcher
+
+
+class RunContext:
+    """
+    Regroupe les options et les objets partagés pendant une exécution du programme.
+    En l'absence de contexte, le traitement reste entièrement interactif.
+    """
+
+    def __init__(self, root, rules=None, review=None, index=None, journal=None, prefetcher=None, quarantine=None,
+                 executor=None, dedup=None):
+        self.root = root
+        # Règles du mode batch ; si elles sont définies, aucune question n'est posée à l'utilisateur
+        self.rules = rules
+        # Rapport des groupes ignorés faute de décision possible en mode batch
+        self.review = review
+        # Index persistant des dossiers et groupes déjà parcourus
+        self.index = index
+        # Journal d'écriture anticipée des renommages, pour la reprise et l'annulation
+        self.journal = journal
+        # Détection anticipée des groupes suivants (suffixe et préfixe) dans un pool de threads
+        self.prefetcher = prefetcher if prefetcher is not None else Prefetcher()
+        # Groupes (dossier, nom de base) écartés par le contrôle d'intégrité, à ne pas renommer
+        self.quarantine = quarantine if quarantine is not None else set()
+        # Exécution des renommages (pool de threads borné par point de montage) ; None pour l'exécution séquentielle
+        self.executor = executor
+        # Détection des groupes identiques à un groupe déjà vu (DuplicateDetector), ou None
+        self.dedup = dedup
+        # Événement (threading.Event) qui interrompt le traitement avant le groupe suivant, ex: bail de lot perdu
+        self.stop = None
+
+    @property
+    def batch(self):
+        return self.rules is not None
+
+    def close(self, completed=True):
+        """
+        Libère les ressources ouvertes pour l'exécution (rapports, fichiers).
+        Une exécution interrompue laisse son journal incomplet pour pouvoir être reprise.
+        Les renommages encore en cours sont attendus avant la fermeture de l'index et du journal.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+        if self.review is not None:
+            self.review.close()
+        if self.dedup is not None:
+            self.dedup.close()
+        if self.index is not None:
+            self.index.close()
+        if self.journal is not None:
+            self.journal.close(completed)
@@ -0,0 +1,145 @@
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Emplacement par défaut du journal d'exécution
+DEFAULT_LOG_FILE = "process.log"
+
+# Seuils de vidage du tampon : taille accumulée (octets) ou délai depuis le dernier vidage (secondes)
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+
+class RunLogger:
+    """
+    Journal d'exécution structuré au format JSON Lines, écrit via un tampon.
+
+    Chaque enregistrement contient l'horodatage, l'identifiant d'exécution et le type d'événement.
+    Les lignes sont accumulées en mémoire et écrites d'un bloc lorsque le tampon dépasse `buffer_size`,
+    au plus tard `flush_interval` secondes après le dernier vidage (un minuteur s'en charge si aucun autre
+    enregistrement n'arrive, par exemple en surveillance entre deux livraisons), et à la fin du programme.
+    Le fichier n'est ouvert qu'une fois pour toute l'exécution.
+    """
+
+    def __init__(self, file_path=DEFAULT_LOG_FILE, run_id=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.file_path = file_path
+        self.run_id = run_id
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.lines = []
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self._file = None
+        self._timer = None
+
+    def log(self, event, **fields):
+        """
+        Ajoute un enregistrement au journal.
+
+        Args:
+            event (str): Le type d'événement (ex: 'info', 'rename').
+            **fields: Les champs de l'enregistrement.
+        """
+        record = {'timestamp': datetime.now().isoformat(timespec='milliseconds'), 'run_id': self.run_id, 'event': event}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        with self.lock:
+            self.lines.append(line)
+            self.buffered += len(line)
+            if self.buffered >= self.buffer_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush_locked()
+            elif self._timer is None:
+                self.schedule_flush_locked()
+
+    def schedule_flush_locked(self):
+        """
+        Programme le vidage des lignes en attente à l'échéance de `flush_interval`.
+        """
+        delay = max(0.0, self.flush_interval - (time.monotonic() - self.last_flush))
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def log_rename(self, old_path, new_path, prefix=None, suffix=None, source=None, year=None, scale=None, duration=None,
+                   reason=None):
+        """
+        Enregistre un renommage avec les métadonnées appliquées, le motif de la décision et sa durée (en secondes).
+        """
+        self.log('rename', old_path=os.path.abspath(old_path), new_path=os.path.abspath(new_path), prefix=prefix,
+                 suffix=suffix, source=source, year=year, scale=scale, reason=reason,
+                 duration=round(duration, 6) if duration is not None else None)
+
+    def flush(self):
+        """
+        Écrit les enregistrements en attente dans le fichier.
+        """
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        self.last_flush = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.lines:
+            return
+        try:
+            if self._file is None:
+                directory = os.path.dirname(self.file_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.file_path, 'a', encoding='utf-8')
+            self._file.write(''.join(self.lines))
+            self._file.flush()
+        except OSError as e:
+            print(f"Erreur lors de l'écriture dans le fichier log: {e}")
+        self.lines = []
+        self.buffered = 0
+
+    def close(self):
+        """
+        Vide le tampon et ferme le fichier.
+        """
+        with self.lock:
+            self.flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# Journal d'exécution courant, créé à la première utilisation et vidé à la fin du programme
+current_logger = None
+
+
+def configure(file_path=DEFAULT_LOG_FILE, run_id=None, **options):
+    """
+    Remplace le journal d'exécution courant (emplacement, identifiant d'exécution, seuils de vidage).
+    """
+    global current_logger
+    if current_logger is not None:
+        current_logger.close()
+    current_logger = RunLogger(file_path, run_id, **options)
+    return current_logger
+
+
+def get_logger():
+    """
+    Retourne le journal d'exécution courant, en le créant avec les valeurs par défaut si nécessaire.
+    """
+    if current_logger is None:
+        configure()
+    return current_logger
+
+
+def close_logger():
+    if current_logger is not None:
+        current_logger.close()
+
+
+atexit.register(close_logger)
@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import time
+from file_group import FileGroup
+from utils import find_primary_file, split_extension
+
+# États possibles d'un groupe dans l'index
+STATE_PENDING = 'pending'
+STATE_RENAMED = 'renamed'
+STATE_SKIPPED = 'skipped'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS groups (
+    directory TEXT NOT NULL,
+    base_name TEXT NOT NULL,
+    members TEXT NOT NULL,
+    suffix TEXT,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (directory, base_name)
+);
+"""
+
+
+def members_signature(members):
+    """
+    Sérialise la liste des membres d'un groupe (nom, taille, mtime) de façon stable pour comparaison.
+    """
+    return json.dumps(sorted(members), ensure_ascii=False)
+
+
+class ScanIndex:
+    """
+    Index persistant (SQLite) des dossiers et groupes déjà parcourus.
+
+    Pour chaque dossier, l'index conserve son mtime et la liste de ses sous-dossiers ; pour chaque groupe,
+    les noms, tailles et mtimes de ses fichiers, le suffixe détecté et son état (renommé, ignoré, en attente).
+    Un dossier dont le mtime n'a pas changé est servi depuis l'index sans être relu, et un groupe dont les
+    fichiers n'ont pas changé réutilise son suffixe et son état. Un fichier réécrit sur place ne change pas
+    le mtime de son dossier : les fichiers des groupes en cache sont donc tout de même relus (un stat chacun).
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path)
+        self.connection.executescript(SCHEMA)
+        self.cache_hits = 0
+        self.recomputed = 0
+
+    def directory_key(self, path):
+        return os.path.abspath(path)
+
+    def lookup_directory(self, path):
+        """
+        Vérifie si un dossier est inchangé depuis le dernier passage.
+        Les groupes dont un fichier a changé de taille ou de mtime (réécrit sur place) repassent à l'état
+        « en attente » et perdent leur suffixe, comme lors d'une relecture du dossier.
+
+        Args:
+            path (str): Le chemin du dossier.
+
+        Returns:
+            tuple: (mtime actuel en ns, contenu en cache ou None). Le contenu en cache est un tuple
+            (chemins des sous-dossiers, dictionnaire {nom de base: FileGroup}). Le contenu vaut None si le
+            dossier a changé ou si un fichier d'un groupe en cache a disparu : le dossier doit être relu.
+        """
+        mtime_ns = os.stat(path).st_mtime_ns
+        key = self.directory_key(path)
+        row = self.connection.execute(
+            "SELECT mtime_ns, subdirs FROM directories WHERE path = ?", (key,)).fetchone()
+        if row is None or row[0] != mtime_ns:
+            return mtime_ns, None
+
+        subdirs = [os.path.join(path, name) for name in json.loads(row[1])]
+        file_groups = {}
+        changed = {}
+        for base_name, members in self.connection.execute(
+                "SELECT base_name, members FROM groups WHERE directory = ?", (key,)).fetchall():
+            names = [member[0] for member in json.loads(members)]
+            current = []
+            for name in names:
+                try:
+                    stat = os.stat(os.path.join(path, name))
+                except FileNotFoundError:
+                    return mtime_ns, None
+                current.append((name, stat.st_size, stat.st_mtime_ns))
+            signature = members_signature(current)
+            if signature != members:
+                changed[base_name] = signature
+            file_groups[base_name] = FileGroup(path, base_name, [name[len(base_name):] for name in names])
+
+        if changed:
+            now = time.time()
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE groups SET members = ?, suffix = NULL, state = ?, updated_at = ? "
+                    "WHERE directory = ? AND base_name = ?",
+                    [(signature, STATE_PENDING, now, key, base_name) for base_name, signature in changed.items()])
+        return mtime_ns, (subdirs, file_groups)
+
+    def record_directory(self, path, mtime_ns, subdirs, group_members):
+        """
+        Enregistre le contenu d'un dossier qui vient d'être relu.
+        Les groupes dont les fichiers ont changé repassent à l'état « en attente » et perdent leur suffixe.
+
+        Args:
+            path (str): Le chemin du dossier.
+            mtime_ns (int): Le mtime du dossier relevé avant la lecture.
+            subdirs (list): Les chemins des sous-dossiers.
+            group_members (dict): {nom de base: [(nom, taille, mtime_ns), ...]}.
+        """
+        key = self.directory_key(path)
+        now = time.time()
+        existing = dict(self.connection.execute(
+            "SELECT base_name, members FROM groups WHERE directory = ?", (key,)))
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO directories (path, mtime_ns, subdirs, scanned_at) VALUES (?, ?, ?, ?)",
+                (key, mtime_ns, json.dumps([os.path.basename(d) for d in subdirs], ensure_ascii=False), now))
+
+            for base_name, members in group_members.items():
+                signature = members_signature(members)
+                if existing.pop(base_name, None) == signature:
+                    continue
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO groups (directory, base_name, members, suffix, state, updated_at) "
+                    "VALUES (?, ?, ?, NULL, ?, ?)", (key, base_name, signature, STATE_PENDING, now))
+
+            # Supprimer les groupes qui n'existent plus dans le dossier
+            self.connection.executemany(
+                "DELETE FROM groups WHERE directory = ? AND base_name = ?",
+                [(key, base_name) for base_name in existing])
+
+    def get_group(self, directory, base_name):
+        """
+        Retourne le suffixe et l'état connus d'un groupe, ou (None, None) s'il n'est pas indexé.
+        """
+        row = self.connection.execute(
+            "SELECT suffix, state FROM groups WHERE directory = ? AND base_name = ?",
+            (self.directory_key(directory), base_name)).fetchone()
+        return row if row is not None else (None, None)
+
+    def update_group(self, directory, base_name, suffix=None, state=None):
+        """
+        Met à jour le suffixe et/ou l'état d'un groupe indexé.
+        """
+        with self.connection:
+            self.connection.execute(
+                "UPDATE groups SET suffix = COALESCE(?, suffix), state = COALESCE(?, state), updated_at = ? "
+                "WHERE directory = ? AND base_name = ?",
+                (suffix, state, time.time(), self.directory_key(directory), base_name))
+
+    def mark_renamed(self, directory, old_base_name, new_paths):
+        """
+        Remplace l'entrée d'un groupe renommé par celle de son nouveau nom, à l'état « renommé ».
+        Les tailles et mtimes sont repris de l'ancienne entrée, un renommage ne les modifiant pas.
+        """
+        key = self.directory_key(directory)
+        row = self.connection.execute(
+            "SELECT members, suffix FROM groups WHERE directory = ? AND base_name = ?", (key, old_base_name)).fetchone()
+        if row is None or not new_paths:
+            return
+
+        stats_by_extension = {split_extension(member[0])[1]: member[1:] for member in json.loads(row[0])}
+        members = []
+        for path in new_paths:
+            name = os.path.basename(path)
+            stats = stats_by_extension.get(split_extension(name)[1])
+            if stats is None:
+                return
+            members.append((name, *stats))
+
+        main_path = find_primary_file(new_paths) or new_paths[0]
+        new_base_name = split_extension(os.path.basename(main_path))[0]
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM groups WHERE directory = ? AND base_name = ?", (key, old_base_name))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO groups (directory, base_name, members, suffix, state, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, new_base_name, members_signature(members), row[1], STATE_RENAMED, time.time()))
+
+    def clear(self):
+        """
+        Vide entièrement l'index.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM directories")
+            self.connection.execute("DELETE FROM groups")
+
+    def prune(self):
+        """
+        Supprime les entrées des dossiers qui n'existent plus.
+
+        Returns:
+            int: Le nombre de dossiers retirés de l'index.
+        """
+        missing = [(path,) for path, in self.connection.execute("SELECT path FROM directories")
+                   if not os.path.isdir(path)]
+        with self.connection:
+            self.connection.executemany("DELETE FROM directories WHERE path = ?", missing)
+            self.connection.executemany("DELETE FROM groups WHERE directory = ?", missing)
+            self.connection.execute(
+                "DELETE FROM groups WHERE directory NOT IN (SELECT path FROM directories)")
+        return len(missing)
+
+    def report(self):
+        """
+        Retourne un résumé des groupes servis depuis l'index et des groupes recalculés.
+        """
+        return f"Index : {self.cache_hits} groupe(s) servis depuis le cache, {self.recomputed} recalculé(s)."
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,158 @@
+import os
+import struct
+import threading
+
+# Taille fixe de l'en-tête d'un fichier .shp ou .shx (spécification ESRI)
+HEADER_SIZE = 100
+
+# Taille d'un enregistrement d'index dans le fichier .shx (offset + longueur)
+SHX_RECORD_SIZE = 8
+
+# Code de fichier et version attendus dans l'en-tête
+SHP_FILE_CODE = 9994
+SHP_VERSION = 1000
+
+# Correspondance entre les codes de type de forme ESRI et les noms de géométrie
+SHAPE_TYPES = {
+    0: 'Null',
+    1: 'Point',
+    3: 'LineString',
+    5: 'Polygon',
+    8: 'MultiPoint',
+    11: 'PointZ',
+    13: 'LineStringZ',
+    15: 'PolygonZ',
+    18: 'MultiPointZ',
+    21: 'PointM',
+    23: 'LineStringM',
+    25: 'PolygonM',
+    28: 'MultiPointM',
+    31: 'MultiPatch',
+}
+
+# Correspondance entre les codes de type de forme et les suffixes de la convention de nommage
+SHAPE_TYPE_SUFFIXES = {
+    1: 'pt', 8: 'pt', 11: 'pt', 18: 'pt', 21: 'pt', 28: 'pt',
+    3: 'line', 13: 'line', 23: 'line',
+    5: 'poly', 15: 'poly', 25: 'poly', 31: 'poly',
+}
+
+# Compteurs de détection : lecture native de l'en-tête ou repli sur Fiona.
+# Protégés par un verrou, la détection pouvant s'exécuter dans plusieurs threads.
+detection_stats = {'header': 0, 'fallback': 0}
+detection_stats_lock = threading.Lock()
+
+
+class MalformedHeaderError(ValueError):
+    """
+    Levée lorsque l'en-tête d'un fichier .shp ou .shx ne respecte pas la spécification.
+    """
+
+
+def read_shp_header(shapefile):
+    """
+    Lit les 100 octets de l'en-tête d'un fichier .shp.
+
+    Args:
+        shapefile (str): Chemin du fichier .shp.
+
+    Returns:
+        dict: `shape_type` (code ESRI) et `file_length` (taille déclarée en octets).
+
+    Raises:
+        MalformedHeaderError: Si l'en-tête est tronqué ou invalide.
+    """
+    with open(shapefile, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+
+    if len(header) < HEADER_SIZE:
+        raise MalformedHeaderError(f"En-tête tronqué ({len(header)} octets)")
+
+    file_code, = struct.unpack('>i', header[0:4])
+    file_length_words, = struct.unpack('>i', header[24:28])
+    version, shape_type = struct.unpack('<ii', header[28:36])
+
+    if file_code != SHP_FILE_CODE or version != SHP_VERSION:
+        raise MalformedHeaderError(f"Code de fichier {file_code} ou version {version} invalide")
+    if shape_type not in SHAPE_TYPES:
+        raise MalformedHeaderError(f"Type de forme inconnu : {shape_type}")
+
+    return {'shape_type': shape_type, 'file_length': file_length_words * 2}
+
+
+def count_shx_records(shx_file):
+    """
+    Calcule le nombre d'entités à partir de la taille du fichier d'index .shx.
+
+    Args:
+        shx_file (str): Chemin du fichier .shx.
+
+    Returns:
+        int: Le nombre d'enregistrements indexés.
+
+    Raises:
+        MalformedHeaderError: Si la taille du fichier ne correspond pas à un index valide.
+    """
+    size = os.path.getsize(shx_file)
+    if size < HEADER_SIZE or (size - HEADER_SIZE) % SHX_RECORD_SIZE:
+        raise MalformedHeaderError(f"Taille de fichier .shx invalide : {size} octets")
+    return (size - HEADER_SIZE) // SHX_RECORD_SIZE
+
+
+def find_sidecar(shapefile, extension):
+    """
+    Retrouve un fichier compagnon du .shp (ex: .shx) quelle que soit la casse de son extension.
+    """
+    stem = os.path.splitext(shapefile)[0]
+    for candidate in (stem + extension.lower(), stem + extension.upper()):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def count_features(shapefile, header):
+    """
+    Détermine le nombre d'entités d'un shapefile sans ouvrir de pilote OGR.
+    Utilise le .shx si présent, sinon se contente de savoir si le .shp contient des enregistrements.
+    """
+    shx_file = find_sidecar(shapefile, '.shx')
+    if shx_file:
+        return count_shx_records(shx_file)
+    # Sans index, un .shp réduit à son en-tête ne contient aucune entité
+    return 0 if header['file_length'] <= HEADER_SIZE else 1
+
+
+def sniff_geometry(shapefile):
+    """
+    Identifie le type de géométrie et le nombre d'entités d'un shapefile à partir des en-têtes seuls.
+
+    Args:
+        shapefile (str): Chemin du fichier .shp.
+
+    Returns:
+        tuple: (nom de la géométrie, nombre d'entités, suffixe ou None pour les formes nulles).
+
+    Raises:
+        MalformedHeaderError: Si l'en-tête du .shp ou la taille du .shx est invalide.
+        OSError: Si le fichier ne peut pas être lu.
+    """
+    header = read_shp_header(shapefile)
+    shape_type = header['shape_type']
+    feature_count = count_features(shapefile, header)
+    return SHAPE_TYPES[shape_type], feature_count, SHAPE_TYPE_SUFFIXES.get(shape_type)
+
+
+def count_detection(kind):
+    """
+    Incrémente le compteur de détection `header` (lecture native) ou `fallback` (repli sur Fiona).
+    """
+    with detection_stats_lock:
+        detection_stats[kind] += 1
+
+
+def get_detection_stats():
+    """
+    Retourne une copie des compteurs de détection (lectures natives et replis sur Fiona).
+    """
+    with detection_stats_lock:
+        return dict(detection_stats)
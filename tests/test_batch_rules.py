@@ -0,0 +1,49 @@
+import json
+import os
+
+from batch_rules import load_rules
+
+
+def write_rules(tmp_path, config):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(config), encoding='utf-8')
+    return str(path)
+
+
+def test_first_matching_rule_wins_over_later_rules(tmp_path):
+    root = str(tmp_path)
+    rules = load_rules(root, write_rules(tmp_path, {
+        'defaults': {'source': 'ign', 'year': '2023', 'scale': '25K'},
+        'rules': [
+            {'glob': 'livrable/hydro*', 'prefix': 'hydro', 'source': 'bdtopo'},
+            {'regex': '(?i)livrable', 'prefix': 'adm'},
+        ],
+    }))
+    assert rules.resolve(os.path.join(root, 'livrable', 'hydrographie'), 'cours') == \
+        {'prefix': 'hydro', 'source': 'bdtopo', 'year': '2023', 'scale': '25K'}
+    assert rules.resolve(os.path.join(root, 'livrable', 'voirie'), 'routes') == \
+        {'prefix': 'adm', 'source': 'ign', 'year': '2023', 'scale': '25K'}
+
+
+def test_name_pattern_restricts_a_rule(tmp_path):
+    root = str(tmp_path)
+    rules = load_rules(root, write_rules(tmp_path, {
+        'rules': [{'regex': '(?i)cadastre', 'name': 'parcelle*', 'prefix': 'cad', 'year': '2022'}],
+    }))
+    assert rules.resolve(os.path.join(root, 'Cadastre'), 'parcelles')['prefix'] == 'cad'
+    assert rules.resolve(os.path.join(root, 'Cadastre'), 'batiments') is None
+
+
+def test_csv_override_takes_precedence_over_rules(tmp_path):
+    root = str(tmp_path)
+    overrides = tmp_path / 'surcharges.csv'
+    overrides.write_text("path,prefix,year,base_name\nlivrable/hydro/cours.shp,zone,2019,cours_eau\n",
+                         encoding='utf-8')
+    rules = load_rules(root, write_rules(tmp_path, {
+        'defaults': {'source': 'ign'},
+        'rules': [{'glob': 'livrable/*', 'prefix': 'hydro', 'year': '2023'}],
+    }), str(overrides))
+    assert rules.resolve(os.path.join(root, 'livrable', 'hydro'), 'cours') == \
+        {'prefix': 'zone', 'source': 'ign', 'year': '2019', 'base_name': 'cours_eau'}
+    # Les autres groupes du dossier suivent toujours la règle
+    assert rules.resolve(os.path.join(root, 'livrable', 'hydro'), 'berges')['prefix'] == 'hydro'
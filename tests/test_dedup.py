@@ -0,0 +1,53 @@
+import random
+
+from benchmark import write_shapefile
+from dedup import DuplicateDetector
+from file_group import FileGroup
+
+
+def make_shapefile(folder, name, feature_count=5, seed=0):
+    folder.mkdir(parents=True, exist_ok=True)
+    stem = str(folder / name)
+    write_shapefile(stem, 'point', feature_count, random.Random(seed))
+    return FileGroup.from_paths([stem + ext for ext in ('.shp', '.shx', '.dbf')])
+
+
+def test_copy_in_another_folder_is_a_duplicate(tmp_path):
+    original = make_shapefile(tmp_path / 'livrable', 'arbres')
+    copy = make_shapefile(tmp_path / 'archive', 'arbres')
+    detector = DuplicateDetector()
+
+    assert detector.find_original(original) is None
+    assert detector.find_original(copy) is original
+
+    detector.record(original, 'pt', {'prefix': 'veg'})
+    assert detector.decision(detector.find_original(copy)) == ('pt', {'prefix': 'veg'})
+
+
+def test_different_sizes_are_not_compared(tmp_path):
+    detector = DuplicateDetector()
+    assert detector.find_original(make_shapefile(tmp_path / 'livrable', 'arbres', feature_count=5)) is None
+    assert detector.find_original(make_shapefile(tmp_path / 'archive', 'arbres', feature_count=6)) is None
+    # Aucune empreinte n'a été calculée
+    assert all(candidate.partial is None for candidates in detector.candidates.values() for candidate in candidates)
+
+
+def test_partial_hash_collision_is_told_apart_by_full_hash(tmp_path):
+    original = make_shapefile(tmp_path / 'livrable', 'arbres')
+    copy = make_shapefile(tmp_path / 'archive', 'arbres')
+    # Un octet modifié au milieu du .shp, hors des échantillons de début et de fin
+    shp_file = copy.path('.shp')
+    with open(shp_file, 'r+b') as f:
+        f.seek(150)
+        byte = f.read(1)
+        f.seek(150)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    detector = DuplicateDetector(sample_size=16)
+    assert detector.find_original(original) is None
+    assert detector.find_original(copy) is None
+
+    [candidates] = detector.candidates.values()
+    assert len(candidates) == 2
+    assert candidates[0].partial == candidates[1].partial
+    assert candidates[0].full != candidates[1].full
@@ -0,0 +1,68 @@
+import json
+
+import file_group
+import geojson_reader
+from file_group import FileGroup
+from geojson_reader import is_geojson_file, sniff_geojson
+
+
+def write_json(path, content):
+    path.write_text(json.dumps(content), encoding='utf-8')
+    return str(path)
+
+
+def test_sniff_ignores_types_inside_properties(tmp_path):
+    path = write_json(tmp_path / 'arrets.geojson', {
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature',
+            'properties': {'type': 'Polygon', 'detail': {'type': 'LineString'}},
+            'geometry': {'type': 'Point', 'coordinates': [2.35, 48.85]},
+        }],
+    })
+    assert sniff_geojson(path) == (['Point'], 1, 'pt')
+
+
+def test_sniff_across_chunk_boundaries(tmp_path, monkeypatch):
+    features = [{'type': 'Feature', 'properties': {'type': 'Polygon', 'nom': 'a"{b'},
+                 'geometry': {'coordinates': [[0.5, 1.5], [2.5, 3.5]], 'type': 'LineString'}} for _ in range(50)]
+    path = write_json(tmp_path / 'routes.geojson', {'type': 'FeatureCollection', 'features': features})
+    for chunk_size in (3, 17, 64):
+        monkeypatch.setattr(geojson_reader, 'CHUNK_SIZE', chunk_size)
+        assert sniff_geojson(path) == (['LineString'], 50, 'line')
+
+
+def test_geometry_collection_members_are_counted(tmp_path):
+    path = write_json(tmp_path / 'mixte.geojson', {
+        'type': 'Feature', 'properties': None,
+        'geometry': {'type': 'GeometryCollection', 'geometries': [
+            {'type': 'Point', 'coordinates': [0, 0]},
+            {'type': 'LineString', 'coordinates': [[0, 0], [1, 1]]},
+        ]},
+    })
+    assert sniff_geojson(path) == (['LineString', 'Point'], 2, 'mixed')
+
+
+def test_plain_json_is_not_a_primary_file(tmp_path):
+    write_json(tmp_path / 'config.json', {'type': 'Polygon2', 'options': {'type': 'Point'}})
+    write_json(tmp_path / 'arrets.json', {'type': 'FeatureCollection', 'features': []})
+    assert sniff_geojson(str(tmp_path / 'config.json'))[2] is None
+    assert not is_geojson_file(str(tmp_path / 'config.json'))
+    assert FileGroup(str(tmp_path), 'config', ['.json']).primary_file() is None
+    assert FileGroup(str(tmp_path), 'arrets', ['.json']).primary_file() == str(tmp_path / 'arrets.json')
+
+
+def test_primary_file_is_sniffed_once_per_group(tmp_path, monkeypatch):
+    write_json(tmp_path / 'config.json', {'options': {}})
+    calls = []
+    monkeypatch.setattr(file_group, 'is_primary_file', lambda path, extension: calls.append(path) or False)
+
+    group = FileGroup(str(tmp_path), 'config', ['.json'])
+    assert group.primary_file() is None
+    assert group.primary_file() is None
+    assert len(calls) == 1
+
+    # Un fichier ajouté au groupe relance la recherche
+    group.add('config.geojson')
+    group.primary_file()
+    assert str(tmp_path / 'config.geojson') in calls[1:]
@@ -0,0 +1,58 @@
+import sqlite3
+
+import pytest
+
+from gpkg_reader import GeoPackageError, sniff_geopackage
+
+
+def make_geopackage(path, layers, ogr_counts=None):
+    """
+    Crée un GeoPackage minimal : tables système et une table par couche, avec `count` lignes.
+    """
+    connection = sqlite3.connect(str(path))
+    connection.execute("CREATE TABLE gpkg_contents (table_name TEXT, data_type TEXT)")
+    connection.execute("CREATE TABLE gpkg_geometry_columns (table_name TEXT, geometry_type_name TEXT)")
+    for table_name, geometry_type, count in layers:
+        connection.execute("INSERT INTO gpkg_contents VALUES (?, 'features')", (table_name,))
+        connection.execute("INSERT INTO gpkg_geometry_columns VALUES (?, ?)", (table_name, geometry_type))
+        connection.execute(f'CREATE TABLE "{table_name}" (fid INTEGER PRIMARY KEY)')
+        connection.executemany(f'INSERT INTO "{table_name}" VALUES (?)', [(i,) for i in range(count)])
+    if ogr_counts is not None:
+        connection.execute("CREATE TABLE gpkg_ogr_contents (table_name TEXT, feature_count INTEGER)")
+        connection.executemany("INSERT INTO gpkg_ogr_contents VALUES (?, ?)", ogr_counts.items())
+    connection.commit()
+    connection.close()
+    return str(path)
+
+
+def test_single_geometry_family(tmp_path):
+    path = make_geopackage(tmp_path / 'routes.gpkg', [('routes', 'MultiLineString', 3), ('chemins', 'LINESTRING', 2)])
+    assert sniff_geopackage(path) == (['LINESTRING', 'MULTILINESTRING'], 2, 5, 'line')
+
+
+def test_empty_layers_do_not_make_the_package_mixed(tmp_path):
+    path = make_geopackage(tmp_path / 'bati.gpkg', [('bati', 'POLYGON', 4), ('points', 'POINT', 0)])
+    assert sniff_geopackage(path)[3] == 'poly'
+
+
+def test_mixed_and_empty_packages(tmp_path):
+    mixed = make_geopackage(tmp_path / 'mix.gpkg', [('bati', 'POLYGON', 1), ('arbres', 'POINT', 1)])
+    empty = make_geopackage(tmp_path / 'vide.gpkg', [('bati', 'POLYGON', 0)])
+    assert sniff_geopackage(mixed)[3] == 'mixed'
+    assert sniff_geopackage(empty)[3] == 'empty'
+
+
+def test_ogr_contents_counts_are_used(tmp_path):
+    path = make_geopackage(tmp_path / 'routes.gpkg', [('routes', 'LINESTRING', 0)], ogr_counts={'routes': 12})
+    assert sniff_geopackage(path)[2] == 12
+
+
+def test_not_a_geopackage(tmp_path):
+    plain = tmp_path / 'base.gpkg'
+    sqlite3.connect(str(plain)).close()
+    garbage = tmp_path / 'texte.gpkg'
+    garbage.write_bytes(b'pas une base sqlite' * 10)
+    with pytest.raises(GeoPackageError):
+        sniff_geopackage(str(plain))
+    with pytest.raises(GeoPackageError):
+        sniff_geopackage(str(garbage))
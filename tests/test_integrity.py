@@ -0,0 +1,92 @@
+import csv
+import os
+import random
+
+import pytest
+
+import run_log
+from benchmark import write_shapefile
+from integrity import check_group, run_integrity_check
+from metrics import get_metrics
+
+
+@pytest.fixture(autouse=True)
+def run_log_in_tmp_path(tmp_path):
+    # Le journal d'exécution est écrit dans le dossier du test, pas dans le dossier courant
+    run_log.configure(str(tmp_path / 'process.log'))
+    yield
+    run_log.close_logger()
+
+
+def make_shapefile(folder, name, feature_count=5, sidecars=('.prj', '.cpg')):
+    stem = str(folder / name)
+    write_shapefile(stem, 'point', feature_count, random.Random(0))
+    for extension in sidecars:
+        with open(stem + extension, 'w', encoding='utf-8') as f:
+            f.write('')
+    return [stem + extension for extension in ('.shp', '.shx', '.dbf') + tuple(sidecars)]
+
+
+def truncate(path, size_delta):
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) + size_delta)
+
+
+def test_complete_group_is_consistent(tmp_path):
+    assert check_group(make_shapefile(tmp_path, 'arbres')) == ([], [])
+
+
+def test_missing_recommended_files_are_warnings(tmp_path):
+    errors, warnings = check_group(make_shapefile(tmp_path, 'arbres', sidecars=()))
+    assert errors == []
+    assert warnings == ['fichier .cpg absent', 'fichier .prj absent']
+
+
+def test_truncated_dbf_and_shx_are_errors(tmp_path):
+    files = make_shapefile(tmp_path, 'arbres')
+    truncate(files[2], -30)
+    errors, _ = check_group(files)
+    assert any(error.startswith('.dbf : taille') for error in errors)
+
+    files = make_shapefile(tmp_path, 'bornes')
+    truncate(files[1], -8)
+    errors, _ = check_group(files)
+    assert any(error.startswith('.shx') for error in errors)
+
+
+def test_inconsistent_group_is_quarantined(tmp_path):
+    data = tmp_path / 'livrable'
+    (data / 'points').mkdir(parents=True)
+    make_shapefile(data / 'points', 'arbres')
+    broken = make_shapefile(data / 'points', 'bornes')
+    truncate(broken[2], -30)
+    quarantine = tmp_path / 'quarantaine'
+    report_path = tmp_path / 'integrite.csv'
+
+    quarantined = run_integrity_check(str(data), str(report_path), workers=2, quarantine_dir=str(quarantine))
+
+    # Le groupe entier est déplacé en conservant son chemin relatif ; il n'est donc plus à exclure
+    assert quarantined == set()
+    assert sorted(os.listdir(quarantine / 'points')) == sorted(os.path.basename(file) for file in broken)
+    assert sorted(os.listdir(data / 'points')) == ['arbres.cpg', 'arbres.dbf', 'arbres.prj', 'arbres.shp', 'arbres.shx']
+    with open(report_path, encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['base_name'], row['status']) for row in rows] == [('bornes', 'quarantaine')]
+
+
+def test_inconsistent_group_is_excluded_without_quarantine_dir(tmp_path):
+    broken = make_shapefile(tmp_path, 'bornes')
+    truncate(broken[1], -8)
+    quarantined = run_integrity_check(str(tmp_path), str(tmp_path / 'integrite.csv'), workers=0)
+    assert quarantined == {(str(tmp_path), 'bornes')}
+    assert all(os.path.exists(file) for file in broken)
+
+
+def test_only_group_checks_are_timed(tmp_path):
+    for name in ('arbres', 'bornes', 'routes'):
+        make_shapefile(tmp_path, name)
+    timers = get_metrics().timers
+    calls_before = timers.get('integrity', [0.0, 0])[1]
+    run_integrity_check(str(tmp_path), str(tmp_path / 'integrite.csv'), workers=2)
+    # Un appel par groupe contrôlé ; le parcours reste compté dans la phase « scan »
+    assert timers['integrity'][1] - calls_before == 3
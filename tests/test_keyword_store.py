@@ -0,0 +1,86 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from keyword_store import KeywordStore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADD_SCRIPT = """
+import sys
+from keyword_store import KeywordStore
+store = KeywordStore({}, sys.argv[1])
+store.load()
+for i in range(int(sys.argv[3])):
+    store.add('hydro', f"{sys.argv[2]}-{i}")
+"""
+
+
+def make_store(tmp_path, **kwargs):
+    file_path = tmp_path / 'metadata.json'
+    if not file_path.exists():
+        file_path.write_text(json.dumps({'hydro': ['cours']}), encoding='utf-8')
+    store = KeywordStore({}, str(file_path), **kwargs)
+    store.load()
+    return store
+
+
+def test_add_appends_one_journal_line(tmp_path):
+    store = make_store(tmp_path)
+    assert store.add('hydro', 'riviere')
+    assert not store.add('hydro', 'riviere')
+    assert store.add('bati', 'maison')
+
+    with open(store.journal_path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
+    assert make_store(tmp_path).keywords == {'hydro': ['cours', 'riviere'], 'bati': ['maison']}
+
+
+def test_other_sessions_see_additions_on_refresh(tmp_path):
+    first, second = make_store(tmp_path), make_store(tmp_path)
+    first.add('hydro', 'riviere')
+    assert second.refresh(force=True)
+    assert second.keywords['hydro'] == ['cours', 'riviere']
+
+
+def test_concurrent_appends_from_separate_sessions(tmp_path):
+    # Chaque session a son propre verrou de fichier, comme des processus distincts ; le journal
+    # est compacté plusieurs fois pendant les ajouts
+    stores = [make_store(tmp_path, compact_threshold=7) for _ in range(4)]
+
+    def add_keywords(store, session):
+        for i in range(25):
+            store.add('hydro', f"s{session}-{i}")
+
+    threads = [threading.Thread(target=add_keywords, args=(store, session)) for session, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    expected = {'cours'} | {f"s{session}-{i}" for session in range(4) for i in range(25)}
+    keywords = make_store(tmp_path).keywords['hydro']
+    assert len(keywords) == len(expected)
+    assert set(keywords) == expected
+
+
+def test_concurrent_appends_from_processes(tmp_path):
+    file_path = str(make_store(tmp_path).file_path)
+    processes = [subprocess.Popen([sys.executable, '-c', ADD_SCRIPT, file_path, f"p{session}", '20'], cwd=REPO_ROOT)
+                 for session in range(3)]
+    assert [process.wait() for process in processes] == [0, 0, 0]
+
+    keywords = make_store(tmp_path).keywords['hydro']
+    assert sorted(keywords) == sorted(['cours'] + [f"p{session}-{i}" for session in range(3) for i in range(20)])
+
+
+def test_compaction_merges_the_journal(tmp_path):
+    store = make_store(tmp_path, compact_threshold=3)
+    for keyword in ('a', 'b', 'c'):
+        store.add('hydro', keyword)
+
+    assert os.path.getsize(store.journal_path) == 0
+    with open(store.file_path, encoding='utf-8') as f:
+        assert json.load(f) == {'hydro': ['cours', 'a', 'b', 'c']}
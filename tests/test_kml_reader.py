@@ -0,0 +1,61 @@
+import zipfile
+
+import pytest
+
+from kml_reader import KmlError, sniff_kml
+
+KML_TEMPLATE = '<?xml version="1.0" encoding="UTF-8"?>' \
+               '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>{}</Document></kml>'
+
+POINT = '<Placemark><Point><coordinates>2.35,48.85</coordinates></Point></Placemark>'
+LINE = '<Placemark><LineString><coordinates>2.35,48.85 2.36,48.86</coordinates></LineString></Placemark>'
+POLYGON = '<Placemark><Polygon><outerBoundaryIs><LinearRing><coordinates>0,0 1,0 1,1 0,0' \
+          '</coordinates></LinearRing></outerBoundaryIs></Polygon></Placemark>'
+
+
+def write_kml(path, *placemarks):
+    path.write_text(KML_TEMPLATE.format(''.join(placemarks)), encoding='utf-8')
+    return str(path)
+
+
+def test_single_family_and_linear_rings_not_counted(tmp_path):
+    assert sniff_kml(write_kml(tmp_path / 'bati.kml', POLYGON, POLYGON)) == (['Polygon'], 2, 'poly')
+
+
+def test_multigeometry_members_make_the_document_mixed(tmp_path):
+    multi = f'<Placemark><MultiGeometry>{POINT[11:-12]}{LINE[11:-12]}</MultiGeometry></Placemark>'
+    assert sniff_kml(write_kml(tmp_path / 'mix.kml', multi))[2] == 'mixed'
+
+
+def test_empty_document(tmp_path):
+    assert sniff_kml(write_kml(tmp_path / 'vide.kml')) == ([], 0, 'empty')
+
+
+def test_kmz_document_read_inside_the_archive(tmp_path):
+    path = tmp_path / 'routes.kmz'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('images/icone.png', b'\x89PNG')
+        archive.writestr('files/routes.kml', KML_TEMPLATE.format(LINE * 3))
+    assert sniff_kml(str(path)) == (['LineString'], 3, 'line')
+
+
+def test_kmz_prefers_doc_kml(tmp_path):
+    path = tmp_path / 'arbres.kmz'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('autre.kml', KML_TEMPLATE.format(LINE))
+        archive.writestr('doc.kml', KML_TEMPLATE.format(POINT))
+    assert sniff_kml(str(path))[2] == 'pt'
+
+
+def test_invalid_documents(tmp_path):
+    without_kml = tmp_path / 'vide.kmz'
+    with zipfile.ZipFile(without_kml, 'w') as archive:
+        archive.writestr('notes.txt', 'rien')
+    not_a_zip = tmp_path / 'faux.kmz'
+    not_a_zip.write_bytes(b'pas une archive')
+    truncated = tmp_path / 'coupe.kml'
+    truncated.write_text(KML_TEMPLATE.format(POINT)[:-20], encoding='utf-8')
+
+    for path in (without_kml, not_a_zip, truncated):
+        with pytest.raises(KmlError):
+            sniff_kml(str(path))
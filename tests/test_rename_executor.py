@@ -0,0 +1,75 @@
+import errno
+import os
+
+import pytest
+
+import run_log
+from rename_executor import RenameExecutor
+from rename_journal import RenameJournal, read_journal
+
+
+@pytest.fixture(autouse=True)
+def run_log_in_tmp_path(tmp_path):
+    # Le journal d'exécution est écrit dans le dossier du test, pas dans le dossier courant
+    run_log.configure(str(tmp_path / 'process.log'))
+    yield
+    run_log.close_logger()
+
+
+def make_group(folder, names):
+    plan = []
+    for name in names:
+        old_path = folder / name
+        old_path.write_bytes(name.encode('utf-8'))
+        plan.append((str(old_path), str(folder / f"hydro_{name}")))
+    return plan
+
+
+def test_group_is_renamed_in_worker_threads(tmp_path):
+    plans = [make_group(tmp_path, [f"cours{i}.shp", f"cours{i}.dbf"]) for i in range(5)]
+    completed = []
+    executor = RenameExecutor(workers=2)
+    for plan in plans:
+        executor.submit(plan, on_complete=completed.append)
+    executor.shutdown()
+
+    # Les fonctions de fin sont appelées dans l'ordre de soumission
+    assert completed == plans
+    assert all(os.path.exists(new_path) for plan in plans for _, new_path in plan)
+
+
+def test_group_is_reverted_when_one_file_fails(tmp_path):
+    plan = make_group(tmp_path, ['cours.shp', 'cours.shx', 'cours.dbf'])
+    # Le .shx disparaît entre la planification et le renommage
+    os.remove(plan[1][0])
+    journal = RenameJournal(str(tmp_path / 'journal'), run_id='run1')
+    completed = []
+
+    RenameExecutor(workers=0).submit(plan, journal=journal, on_complete=completed.append)
+    journal.close()
+
+    assert completed == [[]]
+    assert os.path.exists(plan[0][0]) and not os.path.exists(plan[0][1])
+    assert os.path.exists(plan[2][0]) and not os.path.exists(plan[2][1])
+    state = read_journal(journal.file_path)
+    assert state['rolled_back'] == {0}
+    assert state['failed'] == {1, 2}
+    assert state['done'] == {0}
+
+
+def test_transient_errors_are_retried(tmp_path, monkeypatch):
+    plan = make_group(tmp_path, ['cours.shp'])
+    real_rename = os.rename
+    failures = []
+
+    def busy_once(old_path, new_path):
+        if not failures:
+            failures.append(old_path)
+            raise OSError(errno.EBUSY, "Ressource occupée")
+        real_rename(old_path, new_path)
+
+    monkeypatch.setattr(os, 'rename', busy_once)
+    completed = []
+    RenameExecutor(workers=0, backoff=0).submit(plan, on_complete=completed.append)
+    assert failures and completed == [plan]
+    assert os.path.exists(plan[0][1])
@@ -0,0 +1,72 @@
+import os
+
+from rename_journal import RenameJournal, find_interrupted_run, read_journal, resume_run, rollback_run
+
+
+def make_files(folder, names):
+    paths = []
+    for name in names:
+        path = folder / name
+        path.write_bytes(name.encode('utf-8'))
+        paths.append(str(path))
+    return paths
+
+
+def interrupted_group(tmp_path):
+    """
+    Simule un arrêt brutal au milieu d'un groupe : le premier renommage est journalisé comme effectué,
+    le deuxième a eu lieu sans être marqué, le troisième n'a pas été fait.
+    """
+    data = tmp_path / 'data'
+    data.mkdir()
+    old_paths = make_files(data, ['cours.shp', 'cours.shx', 'cours.dbf'])
+    plan = [(path, path.replace('cours.', 'hydro_line_cours_ign_2023.')) for path in old_paths]
+
+    journal = RenameJournal(str(tmp_path / 'journal'), run_id='run1')
+    seqs = journal.record_plan(plan)
+    os.rename(*plan[0])
+    journal.mark_done(seqs[0])
+    os.rename(*plan[1])
+    journal.close(completed=False)
+    return plan
+
+
+def test_resume_finishes_the_interrupted_group(tmp_path):
+    plan = interrupted_group(tmp_path)
+    journal_dir = str(tmp_path / 'journal')
+    assert find_interrupted_run(journal_dir) == 'run1'
+
+    assert resume_run(journal_dir) == (1, 0)
+    assert all(not os.path.exists(old) and os.path.exists(new) for old, new in plan)
+    assert find_interrupted_run(journal_dir) is None
+
+
+def test_resume_leaves_conflicts_in_place(tmp_path):
+    plan = interrupted_group(tmp_path)
+    # La cible du renommage restant est apparue entre-temps
+    with open(plan[2][1], 'wb') as f:
+        f.write(b'autre')
+
+    assert resume_run(str(tmp_path / 'journal'), 'run1') == (0, 1)
+    assert os.path.exists(plan[2][0])
+    with open(plan[2][1], 'rb') as f:
+        assert f.read() == b'autre'
+
+
+def test_rollback_reverts_a_partial_run(tmp_path):
+    plan = interrupted_group(tmp_path)
+    journal_dir = str(tmp_path / 'journal')
+
+    # Le renommage fait sans être marqué est aussi annulé
+    assert rollback_run('run1', journal_dir) == (2, 0)
+    assert all(os.path.exists(old) and not os.path.exists(new) for old, new in plan)
+    with open(plan[0][0], 'rb') as f:
+        assert f.read() == b'cours.shp'
+    assert read_journal(os.path.join(journal_dir, 'run1.jsonl'))['rolled_back'] == {0, 1}
+
+    # Une seconde annulation ne trouve plus rien à faire
+    assert rollback_run('run1', journal_dir) == (0, 0)
+
+
+def test_rollback_of_unknown_run(tmp_path):
+    assert rollback_run('absent', str(tmp_path)) is None
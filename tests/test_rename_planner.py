@@ -0,0 +1,53 @@
+import os
+
+from rename_planner import RenamePlanner
+
+
+def make_group(folder, base_name, extensions):
+    files = []
+    for extension in extensions:
+        path = folder / f"{base_name}{extension}"
+        path.write_bytes(b'')
+        files.append(str(path))
+    return files
+
+
+def test_plan_gives_each_file_its_final_name(tmp_path):
+    files = make_group(tmp_path, 'Cours eau', ['.shp', '.dbf', '.shp.xml'])
+    plan = RenamePlanner().plan_group(files, 'Cours eau', 'hydro', 'line', 'ign', '2023', '')
+    assert sorted(os.path.basename(new) for _, new in plan) == \
+        ['hydro_line_coursEau_ign_2023.dbf', 'hydro_line_coursEau_ign_2023.shp', 'hydro_line_coursEau_ign_2023.shp.xml']
+
+
+def test_collision_with_existing_target_is_not_renamed(tmp_path):
+    files = make_group(tmp_path, 'Cours eau', ['.shp', '.dbf'])
+    existing = tmp_path / 'hydro_line_coursEau_ign_2023.shp'
+    existing.write_bytes(b'autre')
+
+    planner = RenamePlanner()
+    plan = planner.plan_group(files, 'Cours eau', 'hydro', 'line', 'ign', '2023', '') or []
+
+    # Le fichier existant n'est jamais visé
+    assert str(existing) not in [new for _, new in plan]
+    assert files[0] not in [old for old, _ in plan]
+    assert existing.read_bytes() == b'autre'
+
+
+def test_planned_names_collide_across_groups(tmp_path):
+    first = make_group(tmp_path, 'Cours eau', ['.shp'])
+    second = make_group(tmp_path, 'cours_eau', ['.shp'])
+
+    planner = RenamePlanner()
+    assert len(planner.plan_group(first, 'Cours eau', 'hydro', 'line', 'ign', '2023', '')) == 1
+    # Le second groupe vise le nom déjà réservé par le premier, qui n'existe pas encore sur disque
+    assert not planner.plan_group(second, 'cours_eau', 'hydro', 'line', 'ign', '2023', '')
+
+
+def test_release_frees_the_reserved_name(tmp_path):
+    first = make_group(tmp_path, 'Cours eau', ['.shp'])
+    second = make_group(tmp_path, 'cours_eau', ['.shp'])
+
+    planner = RenamePlanner()
+    [(old_path, new_path)] = planner.plan_group(first, 'Cours eau', 'hydro', 'line', 'ign', '2023', '')
+    planner.release(old_path, new_path)
+    assert len(planner.plan_group(second, 'cours_eau', 'hydro', 'line', 'ign', '2023', '')) == 1
@@ -0,0 +1,62 @@
+import os
+
+from file_group import FileGroup
+from file_processor import iter_file_groups
+from scan_index import STATE_PENDING, STATE_SKIPPED, ScanIndex
+
+
+def make_files(folder, names):
+    for name in names:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(b'x')
+
+
+def test_lookup_directory_serves_cached_groups(tmp_path):
+    folder = tmp_path / 'livrable'
+    folder.mkdir()
+    make_files(folder, ['routes.shp', 'routes.shx', 'routes.dbf', 'limites.geojson'])
+    index = ScanIndex(str(tmp_path / 'index.sqlite'))
+    try:
+        first = dict(iter_file_groups(str(folder), index=index))
+        mtime_ns, cached = index.lookup_directory(str(folder))
+        assert cached is not None
+        subdirs, file_groups = cached
+        assert subdirs == []
+        assert set(file_groups) == {'routes', 'limites'}
+        assert isinstance(file_groups['routes'], FileGroup)
+        assert sorted(file_groups['routes'].files) == sorted(first[str(folder)]['routes'].files)
+
+        # Un second parcours est servi depuis l'index
+        second = dict(iter_file_groups(str(folder), index=index))
+        assert sorted(second[str(folder)]) == ['limites', 'routes']
+    finally:
+        index.close()
+
+
+def test_file_overwritten_in_place_resets_its_group(tmp_path):
+    folder = tmp_path / 'livrable'
+    folder.mkdir()
+    make_files(folder, ['routes.shp', 'routes.dbf', 'limites.geojson'])
+    index = ScanIndex(str(tmp_path / 'index.sqlite'))
+    try:
+        list(iter_file_groups(str(folder), index=index))
+        index.update_group(str(folder), 'routes', suffix='line', state=STATE_SKIPPED)
+        index.update_group(str(folder), 'limites', suffix='poly', state=STATE_SKIPPED)
+        directory_mtime = os.stat(folder).st_mtime_ns
+
+        # Réécriture sur place : le mtime du dossier ne change pas
+        with open(folder / 'routes.shp', 'wb') as f:
+            f.write(b'nouveau contenu')
+        os.utime(folder, ns=(directory_mtime, directory_mtime))
+
+        groups = dict(iter_file_groups(str(folder), index=index))[str(folder)]
+        assert sorted(groups) == ['limites', 'routes']
+        assert index.get_group(str(folder), 'routes') == (None, STATE_PENDING)
+        assert index.get_group(str(folder), 'limites') == ('poly', STATE_SKIPPED)
+
+        # La nouvelle signature est retenue : le parcours suivant réutilise à nouveau le groupe
+        index.update_group(str(folder), 'routes', suffix='line')
+        list(iter_file_groups(str(folder), index=index))
+        assert index.get_group(str(folder), 'routes') == ('line', STATE_PENDING)
+    finally:
+        index.close()
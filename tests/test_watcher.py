@@ -0,0 +1,75 @@
+import os
+import random
+
+from benchmark import write_shapefile
+from watcher import GroupSettler, PollingWatcher
+
+
+def make_shapefile(folder, name):
+    stem = str(folder / name)
+    write_shapefile(stem, 'point', 3, random.Random(0))
+    return stem
+
+
+def ready_names(ready):
+    return [group.base_name for group in ready]
+
+
+def test_group_is_released_once_settled(tmp_path):
+    make_shapefile(tmp_path, 'arbres')
+    settler = GroupSettler(settle=5)
+    settler.touch(str(tmp_path), 'arbres', now=0)
+
+    assert settler.next_timeout(now=1) == 4
+    assert settler.pop_ready(now=1) == []
+    # Première vérification : la signature des fichiers est relevée, le groupe attend encore
+    assert settler.pop_ready(now=5) == []
+    ready = settler.pop_ready(now=10)
+    assert ready_names(ready) == ['arbres']
+    assert settler.next_timeout() is None
+
+
+def test_growing_file_delays_the_group(tmp_path):
+    stem = make_shapefile(tmp_path, 'arbres')
+    settler = GroupSettler(settle=5)
+    settler.touch(str(tmp_path), 'arbres', now=0)
+    assert settler.pop_ready(now=5) == []
+
+    # Le .prj arrive sans événement (partage réseau) : la signature change, le délai repart
+    with open(stem + '.prj', 'w', encoding='utf-8') as f:
+        f.write('GEOGCS')
+    assert settler.pop_ready(now=10) == []
+    assert ready_names(settler.pop_ready(now=15)) == ['arbres']
+
+
+def test_new_event_restarts_the_delay(tmp_path):
+    make_shapefile(tmp_path, 'arbres')
+    settler = GroupSettler(settle=5)
+    settler.touch(str(tmp_path), 'arbres', now=0)
+    settler.touch(str(tmp_path), 'arbres', now=4)
+    assert settler.pop_ready(now=6) == []
+    assert settler.next_timeout(now=6) == 3
+
+
+def test_incomplete_shapefile_is_not_released(tmp_path):
+    stem = make_shapefile(tmp_path, 'arbres')
+    os.remove(stem + '.dbf')
+    settler = GroupSettler(settle=5)
+    settler.touch(str(tmp_path), 'arbres', now=0)
+    assert settler.pop_ready(now=5) == []
+    assert settler.pop_ready(now=10) == []
+    # Il attend le prochain événement sur ses fichiers
+    assert settler.next_timeout() is None
+
+
+def test_polling_watcher_reports_new_files_and_folders(tmp_path):
+    watcher = PollingWatcher(str(tmp_path), interval=0)
+    (tmp_path / 'arbres.shp').write_bytes(b'')
+    (tmp_path / 'livraison').mkdir()
+    (tmp_path / 'livraison' / 'routes.shp').write_bytes(b'')
+    # Les mtime des dossiers peuvent être identiques à la résolution du système de fichiers
+    os.utime(tmp_path, ns=(0, 0))
+
+    files, new_directories = watcher.wait(0)
+    assert files == [str(tmp_path / 'arbres.shp')]
+    assert new_directories == [str(tmp_path / 'livraison')]
@@ -0,0 +1,100 @@
+import sqlite3
+import time
+
+from run_context import RunContext
+from work_queue import SHARD_DONE, SHARD_FAILED, WorkQueue, run_worker
+
+
+def make_queue(tmp_path, lease=60.0, max_attempts=3, shards=('a',)):
+    root = tmp_path / 'livrable'
+    for name in shards:
+        (root / name).mkdir(parents=True)
+    queue = WorkQueue(str(tmp_path / 'file.sqlite'), lease=lease, max_attempts=max_attempts)
+    queue.enqueue(str(root))
+    return queue
+
+
+def expire(queue, path):
+    queue.transaction(lambda cursor: cursor.execute(
+        "UPDATE shards SET lease_expires = ? WHERE path = ?", (time.time() - 1, path)))
+
+
+def states(queue):
+    return [(state, attempts) for _, state, _, attempts, *_ in queue.status()]
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    queue = make_queue(tmp_path)
+    path, _, first_token = queue.acquire('premier')
+    assert queue.acquire('second') is None
+
+    expire(queue, path)
+    taken_path, _, second_token = queue.acquire('second')
+    assert taken_path == path
+
+    # Le premier travailleur ne peut plus ni renouveler ni terminer le lot
+    assert not queue.heartbeat(path, first_token)
+    assert not queue.complete(path, first_token)
+    assert queue.complete(path, second_token, groups=2)
+    assert states(queue) == [(SHARD_DONE, 2)]
+    queue.close()
+
+
+def test_lease_expiring_too_often_marks_the_shard_failed(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    for _ in range(2):
+        path, _, _ = queue.acquire('travailleur')
+        expire(queue, path)
+
+    assert queue.acquire('travailleur') is None
+    assert states(queue) == [(SHARD_FAILED, 2)]
+    assert queue.requeue_failed() == 1
+    assert queue.acquire('travailleur') is not None
+    queue.close()
+
+
+def test_worker_stops_when_its_lease_is_taken_over(tmp_path):
+    queue = make_queue(tmp_path, lease=0.3)
+    other = WorkQueue(queue.file_path, lease=60.0)
+    processed_groups = []
+
+    def process_shard(path, recursive, context):
+        # Un autre travailleur reprend le lot pendant son traitement
+        expire(other, path)
+        assert other.acquire('second') is not None
+        for group in range(100):
+            if context.stop.is_set():
+                break
+            processed_groups.append(group)
+            time.sleep(0.01)
+
+    assert run_worker(queue, RunContext(str(tmp_path)), process_shard, 'premier') == 0
+    # Le bail perdu est constaté au renouvellement suivant, au plus un tiers de bail plus tard
+    assert 0 < len(processed_groups) < 30
+    assert queue.status()[0][2] == 'second'
+    queue.close()
+    other.close()
+
+
+def test_worker_stops_when_its_lease_cannot_be_renewed(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path, lease=0.3)
+
+    def unavailable(path, token):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(queue, 'heartbeat', unavailable)
+    stopped_after = []
+
+    def process_shard(path, recursive, context):
+        start = time.time()
+        while time.time() - start < 2:
+            if context.stop.is_set():
+                stopped_after.append(time.time() - start)
+                return
+            time.sleep(0.01)
+
+    run_worker(queue, RunContext(str(tmp_path)), process_shard, 'premier')
+    # Arrêt avant l'expiration du bail, que personne n'a pu renouveler, et lot jamais marqué terminé
+    assert stopped_after and all(elapsed < 0.3 for elapsed in stopped_after)
+    assert SHARD_DONE not in [state for state, _ in states(queue)]
+    queue.close()
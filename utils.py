@@ -1,11 +1,45 @@
 import unicodedata
 import os
 import re
-import json
-from datetime import datetime
+import run_log
+import time
+from metrics import get_metrics
+from functools import lru_cache
+from geojson_reader import is_geojson_file
 
 # Liste des mots de liaison à supprimer des noms
 JOIN_WORDS = ['de', 'du', 'des', 'd', 'la', 'le', 'les', 'et', 'au', 'aux', 'sur', 'à', 'ou']
+JOIN_WORDS_SET = frozenset(JOIN_WORDS)
+
+# Extensions des fichiers principaux d'un groupe, par ordre de priorité : shapefile, GeoPackage, GeoJSON, puis KML
+PRIMARY_EXTENSIONS = ('.shp', '.gpkg', '.geojson', '.json', '.kml', '.kmz')
+
+# Extensions qui ne désignent un fichier principal que si son contenu est du GeoJSON (un .json peut être
+# un fichier de configuration, laissé tel quel)
+SNIFFED_PRIMARY_EXTENSIONS = frozenset(['.json'])
+
+# Expressions régulières précompilées de la normalisation des noms
+NON_ALPHANUMERIC_PATTERN = re.compile(r'[^a-zA-Z0-9]')
+SEGMENT_PATTERN = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?=[A-Z][a-z])|[A-Z]+|[0-9]+|[-_]')
+
+# Nombre maximal de noms de base dont la forme camelCase est gardée en mémoire
+NORMALIZE_CACHE_SIZE = 8192
+
+class AccentTranslationTable(dict):
+    """
+    Table de traduction pour str.translate, remplie au fur et à mesure des caractères rencontrés.
+    Chaque caractère est décomposé (NFKD) une seule fois : les marques combinantes (accents) sont supprimées
+    et tout caractère restant non alphanumérique est remplacé par un underscore (_).
+    """
+
+    def __missing__(self, code_point):
+        decomposed = unicodedata.normalize('NFKD', chr(code_point))
+        without_accents = ''.join([c for c in decomposed if not unicodedata.combining(c)])
+        replacement = NON_ALPHANUMERIC_PATTERN.sub('_', without_accents)
+        self[code_point] = replacement
+        return replacement
+
+accent_table = AccentTranslationTable()
 
 def remove_accents_and_special_chars(name):
     """
@@ -18,9 +52,41 @@ def remove_accents_and_special_chars(name):
     Returns:
         str: La chaîne nettoyée sans accents ni caractères spéciaux.
     """
-    nfkd_form = unicodedata.normalize('NFKD', name)
-    without_accents = ''.join([c for c in nfkd_form if not unicodedata.combining(c)])
-    return re.sub(r'[^a-zA-Z0-9]', '_', without_accents)  # Remplacer les caractères non alphanumériques par _
+    return name.translate(accent_table)
+
+def split_extension(filename):
+    """
+    Sépare un nom de fichier en nom de base et extension normalisée en minuscules.
+    L'extension composée .shp.xml est reconnue comme une seule extension.
+
+    Parameters:
+        filename (str): Le nom ou le chemin du fichier.
+
+    Returns:
+        tuple: (nom de base sans extension, extension en minuscules).
+    """
+    if filename.lower().endswith('.shp.xml'):
+        return filename[:-8], '.shp.xml'
+    base_name, ext = os.path.splitext(filename)
+    return base_name, ext.lower()
+
+def is_primary_file(file_path, extension):
+    """
+    Indique si un fichier dont l'extension figure dans PRIMARY_EXTENSIONS peut servir de fichier principal :
+    toujours, sauf pour un .json qui n'a pas de structure GeoJSON.
+    """
+    return extension not in SNIFFED_PRIMARY_EXTENSIONS or is_geojson_file(file_path)
+
+def find_primary_file(files):
+    """
+    Retourne le fichier principal d'un groupe, celui dont on lit la géométrie : le premier trouvé
+    dans l'ordre de PRIMARY_EXTENSIONS (sans tenir compte de la casse), ou None.
+    """
+    by_extension = {}
+    for file in files:
+        by_extension.setdefault(split_extension(file)[1], file)
+    return next((by_extension[ext] for ext in PRIMARY_EXTENSIONS
+                 if ext in by_extension and is_primary_file(by_extension[ext], ext)), None)
 
 def split_into_segments(name):
     """
@@ -32,8 +98,7 @@ def split_into_segments(name):
     Returns:
         list: Une liste de segments découpés du nom.
     """
-    normalized_name = remove_accents_and_special_chars(name)
-    return re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?=[A-Z][a-z])|[A-Z]+|[0-9]+|[-_]', normalized_name)
+    return SEGMENT_PATTERN.findall(remove_accents_and_special_chars(name))
 
 def process_segments(segments):
     """
@@ -46,7 +111,7 @@ def process_segments(segments):
         str: Le nom formaté en camelCase.
     """
     filtered_segments = [
-        segment for segment in segments if segment not in ['-', '_'] and segment.lower() not in JOIN_WORDS
+        segment for segment in segments if segment not in ('-', '_') and segment.lower() not in JOIN_WORDS_SET
     ]
     if not filtered_segments:
         return ""
@@ -54,77 +119,107 @@ def process_segments(segments):
     camel_case_segments = [first_word] + [word.capitalize() for word in filtered_segments[1:]]
     return ''.join(camel_case_segments)
 
-def load_prefixes_from_json(file_path='metadata.json'):
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_base_name(base_name):
     """
-    Charge les préfixes depuis le fichier metadata.json.
-    
-    Args:
-        file_path (str): Le chemin vers le fichier JSON contenant les préfixes.
-        
+    Retourne la forme camelCase d'un nom de base (sans accents, caractères spéciaux ni mots de liaison).
+    Le résultat est mémorisé : les fichiers d'un même groupe, qui partagent le nom de base,
+    ne coûtent qu'une seule normalisation.
+
+    Parameters:
+        base_name (str): Le nom de base, sans chemin ni extension.
+
     Returns:
-        list: Une liste des préfixes disponibles.
+        str: Le nom formaté en camelCase.
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return list(data.keys())  # Retourne uniquement les clés (les préfixes)
-    except FileNotFoundError:
-        print(f"Erreur : Le fichier {file_path} n'a pas été trouvé.")
-        return []
-    except json.JSONDecodeError as e:
-        print(f"Erreur de décodage JSON dans {file_path} : {e}")
-        return []
-
-def is_file_already_renamed(filename, prefixes):
-    """
-    Vérifie si un fichier a déjà été renommé selon la convention :
-    [prefix]_[suffix]_[nomCamelCase]_[source]_[année]_[échelle] (source, année, et échelle sont optionnelles).
-    
-    Args:
-        filename (str): Le nom du fichier à vérifier, sans extension.
-        prefixes (list): Liste des préfixes dynamiques à vérifier.
-        
+    return process_segments(split_into_segments(base_name))
+
+def normalize_many(names):
+    """
+    Normalise un lot de noms de base, chaque nom distinct n'étant traité qu'une fois.
+
+    Parameters:
+        names (iterable): Les noms de base.
+
     Returns:
-        bool: True si le fichier est déjà renommé, sinon False.
+        dict: {nom de base: forme camelCase}.
     """
-    # Retirer l'extension pour ne vérifier que le nom de base
-    base_name = os.path.splitext(filename)[0]
+    return {name: normalize_base_name(name) for name in dict.fromkeys(names)}
 
+def compile_renamed_pattern(prefixes):
+    """
+    Compile la regex de la convention de nommage pour une liste de préfixes :
+    [prefix]_[suffix]_[nomCamelCase]_[source]_[année]_[échelle] (source, année, et échelle sont optionnelles).
+
+    Parameters:
+        prefixes (iterable): Les préfixes acceptés.
+
+    Returns:
+        re.Pattern: La regex compilée.
+    """
     # Construire une regex dynamique en fonction des préfixes chargés depuis le fichier JSON
-    prefix_pattern = f"^({'|'.join(prefixes)})"
+    prefix_pattern = f"^({'|'.join(re.escape(prefix) for prefix in prefixes)})"
 
     # Pattern de correspondance stricte avec CamelCase et parties optionnelles
-    pattern_with_suffix = rf"{prefix_pattern}(_[a-z]+)?_[a-zA-Z][a-zA-Z0-9]*(_[a-zA-Z0-9]+)?(_\d{{4}})?(_\d+[KM])?"
+    return re.compile(rf"{prefix_pattern}(_[a-z]+)?_[a-zA-Z][a-zA-Z0-9]*(_[a-zA-Z0-9]+)?(_\d{{4}})?(_\d+[KM])?")
 
-    # Vérifier si le nom de base correspond au pattern
-    result = bool(re.match(pattern_with_suffix, base_name))
-    
-    return result
+class PrefixMatcher:
+    """
+    Vérifie si des noms de fichiers respectent déjà la convention de nommage.
+    La regex est compilée une seule fois et n'est recompilée que lorsque l'ensemble des préfixes change.
+    """
+
+    def __init__(self, prefixes=()):
+        self.prefixes = None
+        self.pattern = None
+        self.set_prefixes(prefixes)
+
+    def set_prefixes(self, prefixes):
+        """
+        Met à jour les préfixes acceptés ; la regex n'est recompilée que s'ils ont changé.
+        """
+        prefixes = tuple(prefixes)
+        if prefixes != self.prefixes:
+            self.prefixes = prefixes
+            self.pattern = compile_renamed_pattern(prefixes)
+
+    def matches(self, filename):
+        """
+        Retourne True si le nom (chemin et extension ignorés) respecte déjà la convention.
+        """
+        base_name = os.path.splitext(os.path.basename(filename))[0]
+        return self.pattern.match(base_name) is not None
+
+    def classify(self, names):
+        """
+        Sépare des noms en deux listes en un seul passage : déjà renommés et à renommer.
+
+        Parameters:
+            names (iterable): Les noms (ou chemins) à classer.
+
+        Returns:
+            tuple: (noms déjà renommés, noms à renommer), dans l'ordre d'origine.
+        """
+        renamed, not_renamed = [], []
+        match = self.pattern.match
+        for name in names:
+            base_name = os.path.splitext(os.path.basename(name))[0]
+            (renamed if match(base_name) else not_renamed).append(name)
+        return renamed, not_renamed
 
 def log_info(message):
     """
-    Enregistre les messages d'information dans un fichier log avec un timestamp.
-    Gère les exceptions liées à l'écriture dans le fichier.
+    Enregistre un message d'information dans le journal d'exécution structuré (JSON Lines).
+    L'écriture passe par le tampon du journal : le fichier n'est pas rouvert à chaque message.
     """
-    try:
-        with open("process.log", "a") as log_file:
-            log_file.write(f"{datetime.now()}: {message}\n")
-    except IOError as e:
-        print(f"Erreur lors de l'écriture dans le fichier log: {e}")
+    run_log.get_logger().log('info', message=message)
 
-def compare_words_insensitive(name, keyword):
+def ask(message):
     """
-    Compare deux chaînes insensiblement à la casse, mot par mot, en ignorant les mots de liaison.
-    Utilise les mots exclus de la liste JOIN_WORDS.
-    
-    Args:
-        name (str): Nom à comparer.
-        keyword (str): Mot-clé à comparer avec le nom.
-        
-    Returns:
-        bool: True si tous les mots du mot-clé sont présents dans le nom, sinon False.
+    Pose une question à l'utilisateur (comme input) et comptabilise le temps d'attente de la réponse.
     """
-    name_parts = [word.lower() for word in name.split() if word.lower() not in JOIN_WORDS]
-    keyword_parts = [word.lower() for word in keyword.split()]
-    
-    return all(part in name_parts for part in keyword_parts)
+    start = time.perf_counter()
+    try:
+        return input(message)
+    finally:
+        get_metrics().add_time('prompt', time.perf_counter() - start)
@@ -0,0 +1,348 @@
+import os
+import select
+import struct
+import sys
+import time
+
+import run_log
+from file_processor import (SUPPORTED_EXTENSIONS, get_executor, get_renamed_matcher, iter_file_groups,
+                            process_group_item, rename_planner)
+from file_group import FileGroup
+from integrity import check_group
+from metrics import get_metrics
+from utils import split_extension
+
+# Délai (secondes) pendant lequel les fichiers d'un groupe ne doivent plus changer avant son traitement,
+# et intervalle de scrutation des dossiers lorsque inotify n'est pas disponible
+DEFAULT_SETTLE = 5.0
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Constantes d'inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """
+    Surveille une arborescence avec inotify (Linux), appelé directement dans la libc via ctypes.
+    L'attente est bloquante dans le noyau : aucun CPU n'est consommé tant que rien n'arrive.
+    Les sous-dossiers créés ou déplacés dans l'arborescence sont surveillés à leur tour.
+    """
+
+    def __init__(self, folder):
+        # Importé à la demande : ctypes n'est utile qu'en mode surveillance
+        import ctypes
+        import ctypes.util
+        self.ctypes = ctypes
+        libc_name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify n'est pas disponible")
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = self.ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.directories = {}
+        self.add_tree(folder)
+
+    def add_directory(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd < 0:
+            error = self.ctypes.get_errno()
+            print(f"Impossible de surveiller le dossier {directory} : {os.strerror(error)}")
+            return
+        self.directories[wd] = directory
+
+    def add_tree(self, folder):
+        """
+        Surveille un dossier et tous ses sous-dossiers (sans suivre les liens symboliques).
+        """
+        pending_dirs = [folder]
+        while pending_dirs:
+            directory = pending_dirs.pop()
+            self.add_directory(directory)
+            try:
+                with os.scandir(directory) as entries:
+                    pending_dirs.extend(entry.path for entry in entries
+                                        if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+
+    def wait(self, timeout=None):
+        """
+        Attend des événements pendant au plus `timeout` secondes (indéfiniment si None).
+
+        Returns:
+            tuple: (chemins des fichiers créés, modifiés ou déplacés, dossiers apparus dans l'arborescence).
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], []
+
+        files, new_directories = [], []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.directories[wd]
+                continue
+            if not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                    new_directories.append(path)
+            else:
+                files.append(path)
+        return files, new_directories
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """
+    Surveille une arborescence en relisant périodiquement les dossiers, lorsque inotify n'est pas disponible
+    (Windows, macOS, certains partages réseau). Seuls les dossiers dont le mtime a changé sont relus ;
+    la croissance d'un fichier déjà connu est suivie par la stabilisation des groupes, pas par le scrutateur.
+    """
+
+    def __init__(self, folder, interval=DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        # {dossier: (mtime_ns, noms des fichiers, sous-dossiers)}
+        self.directories = {}
+        self.add_tree(folder)
+
+    def read_directory(self, directory):
+        stat = os.stat(directory)
+        names, subdirs = set(), set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.add(entry.path)
+                    else:
+                        names.add(entry.name)
+                except OSError:
+                    continue
+        self.directories[directory] = (stat.st_mtime_ns, names, subdirs)
+        return names, subdirs
+
+    def add_tree(self, folder):
+        pending_dirs = [folder]
+        while pending_dirs:
+            try:
+                pending_dirs.extend(self.read_directory(pending_dirs.pop())[1])
+            except OSError:
+                continue
+
+    def wait(self, timeout=None):
+        """
+        Attend au plus `timeout` secondes (ou un intervalle de scrutation), puis relit les dossiers modifiés.
+
+        Returns:
+            tuple: (chemins des fichiers apparus, dossiers apparus dans l'arborescence).
+        """
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        files, new_directories = [], []
+        for directory, (mtime_ns, names, subdirs) in list(self.directories.items()):
+            try:
+                if os.stat(directory).st_mtime_ns == mtime_ns:
+                    continue
+                new_names, new_subdirs = self.read_directory(directory)
+            except OSError:
+                del self.directories[directory]
+                continue
+            files.extend(os.path.join(directory, name) for name in new_names - names)
+            for subdir in new_subdirs - subdirs:
+                self.add_tree(subdir)
+                new_directories.append(subdir)
+        return files, new_directories
+
+    def close(self):
+        pass
+
+
+def create_watcher(folder, interval=DEFAULT_POLL_INTERVAL, polling=False):
+    """
+    Retourne le surveillant inotify si le système le permet, sinon le surveillant par scrutation.
+    """
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            print(f"inotify indisponible ({e}), surveillance par scrutation toutes les {interval} s.")
+    return PollingWatcher(folder, interval)
+
+
+def group_signature(directory, base_name):
+    """
+    Lit les fichiers d'un groupe dans son dossier.
+
+    Returns:
+        tuple: (chemins des fichiers du groupe, signature (nom, taille, mtime) de chaque fichier).
+    """
+    files, signature = [], []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                name, ext = split_extension(entry.name)
+                if name != base_name or ext not in SUPPORTED_EXTENSIONS:
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                files.append(entry.path)
+                signature.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    except OSError:
+        return [], ()
+    return sorted(files), tuple(sorted(signature))
+
+
+class GroupSettler:
+    """
+    Retient les groupes touchés par une livraison et ne les libère qu'une fois stabilisés.
+
+    Un groupe est prêt lorsque aucun événement ne l'a touché depuis `settle` secondes et que les noms,
+    tailles et mtimes de ses fichiers sont identiques à ceux relevés `settle` secondes plus tôt.
+    Un groupe shapefile dont les en-têtes sont encore incohérents (.shx ou .dbf manquant ou tronqué)
+    n'est jamais libéré : il attend le prochain événement sur ses fichiers.
+    """
+
+    def __init__(self, settle=DEFAULT_SETTLE):
+        self.settle = settle
+        # {(dossier, nom de base): [instant du dernier changement, dernière signature relevée]}
+        self.pending = {}
+
+    def touch(self, directory, base_name, now=None):
+        """
+        Signale qu'un fichier du groupe vient d'apparaître ou de changer.
+        """
+        now = time.monotonic() if now is None else now
+        entry = self.pending.get((directory, base_name))
+        if entry is None:
+            self.pending[(directory, base_name)] = [now, None]
+        else:
+            entry[0] = now
+
+    def next_timeout(self, now=None):
+        """
+        Retourne le délai avant la prochaine vérification, ou None s'il n'y a aucun groupe en attente.
+        """
+        if not self.pending:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(changed for changed, _ in self.pending.values()) + self.settle - now)
+
+    def pop_ready(self, now=None):
+        """
+        Vérifie les groupes restés calmes pendant `settle` secondes et retire ceux qui sont stabilisés.
+
+        Returns:
+            list: Les groupes prêts (FileGroup), dans l'ordre de leur dernier changement.
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        for key, entry in sorted(self.pending.items(), key=lambda item: item[1][0]):
+            changed, previous = entry
+            if now - changed < self.settle:
+                continue
+            directory, base_name = key
+            files, signature = group_signature(directory, base_name)
+            if not files:
+                # Le groupe a été déplacé, supprimé ou renommé entre-temps
+                del self.pending[key]
+            elif signature != previous:
+                entry[0], entry[1] = now, signature
+            else:
+                del self.pending[key]
+                errors, _ = check_group(files)
+                if errors:
+                    get_metrics().increment('watch_groups_incomplete')
+                    print(f"Groupe '{base_name}' incomplet ({'; '.join(errors)}), en attente de nouveaux fichiers.")
+                    continue
+                ready.append(FileGroup.from_paths(files))
+        return ready
+
+
+def watch_folder(folder, context=None, settle=DEFAULT_SETTLE, interval=DEFAULT_POLL_INTERVAL, polling=False,
+                 stop=None):
+    """
+    Surveille un dossier de réception et traite chaque nouveau groupe de fichiers une fois qu'il est stabilisé.
+    Seuls les fichiers créés ou déplacés dans l'arborescence après le démarrage sont traités ;
+    les fichiers produits par les renommages (déjà conformes à la convention) sont ignorés.
+
+    Args:
+        folder (str): Le dossier surveillé.
+        context (RunContext, optional): Les options de l'exécution ; en mode batch, aucune question n'est posée.
+        settle (float): Délai de stabilisation des groupes, en secondes.
+        interval (float): Intervalle de scrutation lorsque inotify n'est pas disponible.
+        polling (bool): Forcer la surveillance par scrutation.
+        stop (threading.Event, optional): Arrête la surveillance lorsqu'il est positionné ; sinon jusqu'à Ctrl+C.
+    """
+    watcher = create_watcher(folder, interval, polling)
+    settler = GroupSettler(settle)
+    executor = get_executor(context)
+    logger = run_log.get_logger()
+    metrics = get_metrics()
+    print(f"Surveillance du dossier {folder} (Ctrl+C pour arrêter).")
+    try:
+        while stop is None or not stop.is_set():
+            timeout = settler.next_timeout()
+            if stop is not None:
+                timeout = 1.0 if timeout is None else min(timeout, 1.0)
+            files, new_directories = watcher.wait(timeout)
+            now = time.monotonic()
+
+            for directory in new_directories:
+                # Un dossier déplacé d'un bloc arrive avec ses fichiers déjà présents
+                for folder_path, file_groups in iter_file_groups(directory):
+                    for base_name in file_groups:
+                        if not get_renamed_matcher().matches(base_name):
+                            settler.touch(folder_path, base_name, now)
+            for path in files:
+                base_name, ext = split_extension(os.path.basename(path))
+                if ext in SUPPORTED_EXTENSIONS and not get_renamed_matcher().matches(base_name):
+                    settler.touch(os.path.dirname(path), base_name, now)
+
+            ready = settler.pop_ready()
+            if ready:
+                # Des fichiers ont pu arriver depuis le lot précédent : les noms des dossiers sont relus
+                rename_planner.reset()
+            for group in ready:
+                metrics.increment('watch_groups')
+                print(f"Nouveau groupe '{group.base_name}' dans le dossier : {group.directory}")
+                original = context.dedup.find_original(group) if context is not None and context.dedup is not None else None
+                process_group_item(group, False, context, original=original)
+                executor.drain()
+            if ready:
+                executor.shutdown()
+                logger.flush()
+    except KeyboardInterrupt:
+        print("Surveillance interrompue.")
+    finally:
+        watcher.close()
+        executor.shutdown()
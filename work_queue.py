@@ -0,0 +1,372 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import get_metrics
+from utils import split_extension
+
+# États d'un lot (shard) de la file de travail
+SHARD_PENDING = 'pending'
+SHARD_LEASED = 'leased'
+SHARD_DONE = 'done'
+SHARD_FAILED = 'failed'
+
+# Durée d'un bail (secondes) : un lot dont le bail n'a pas été renouvelé à temps est repris par un autre travailleur.
+# Le bail est renouvelé tous les tiers de sa durée. Un lot en échec est remis en file au plus `DEFAULT_MAX_ATTEMPTS` fois.
+DEFAULT_LEASE = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_SHARD_DEPTH = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    path TEXT PRIMARY KEY,
+    recursive INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_token TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    groups INTEGER NOT NULL DEFAULT 0,
+    files_renamed INTEGER NOT NULL DEFAULT 0,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS shards_state ON shards (state, lease_expires);
+"""
+
+
+def enumerate_shards(root, depth=DEFAULT_SHARD_DEPTH, extensions=None):
+    """
+    Découpe une arborescence en lots indépendants : chaque dossier situé à `depth` niveaux sous la racine
+    forme un lot récursif, et chaque dossier moins profond contenant lui-même des fichiers forme un lot
+    limité à ses propres fichiers. Seuls les dossiers au-dessus de `depth` sont lus.
+
+    Yields:
+        tuple: (chemin du dossier, True si le lot comprend les sous-dossiers).
+    """
+    if extensions is None:
+        from file_processor import SUPPORTED_EXTENSIONS
+        extensions = SUPPORTED_EXTENSIONS
+    pending_dirs = [(root, 0)]
+    while pending_dirs:
+        directory, level = pending_dirs.pop()
+        if level >= depth:
+            yield directory, True
+            continue
+        subdirs = []
+        has_files = False
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif not has_files and split_extension(entry.name)[1] in extensions:
+                            has_files = True
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Impossible de lire le dossier {directory} : {e}")
+            continue
+        if has_files:
+            yield directory, False
+        pending_dirs.extend((subdir, level + 1) for subdir in sorted(subdirs, reverse=True))
+
+
+def new_worker_id():
+    """
+    Identifiant d'un travailleur : machine et processus.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    File de travail partagée, stockée dans un fichier SQLite (posé sur le partage réseau ou en local).
+
+    Le coordinateur y inscrit les lots ; chaque travailleur, sur une ou plusieurs machines, prend un bail sur un lot
+    en attente (ou dont le bail a expiré), le renouvelle pendant le traitement, puis le marque terminé ou le remet
+    en file en cas d'échec. Chaque prise de bail est une transaction exclusive et reçoit un jeton unique :
+    un travailleur qui a perdu son bail ne peut plus ni le renouveler ni terminer le lot.
+    """
+
+    def __init__(self, file_path, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.file_path = file_path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        # isolation_level=None : les transactions sont ouvertes explicitement (BEGIN IMMEDIATE)
+        self.connection = sqlite3.connect(file_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def execute(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters)
+
+    def transaction(self, statements):
+        """
+        Exécute une fonction dans une transaction exclusive et retourne son résultat.
+        """
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(cursor)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return result
+
+    @property
+    def root(self):
+        row = self.execute("SELECT value FROM queue WHERE key = 'root'").fetchone()
+        return row[0] if row is not None else None
+
+    def enqueue(self, root, depth=DEFAULT_SHARD_DEPTH):
+        """
+        Inscrit les lots d'une arborescence. Les lots déjà inscrits gardent leur état.
+
+        Returns:
+            int: Le nombre de lots ajoutés.
+        """
+        root = os.path.abspath(root)
+        known_root = self.root
+        if known_root is not None and known_root != root:
+            raise ValueError(f"la file {self.file_path} concerne déjà le dossier {known_root}")
+        shards = list(enumerate_shards(root, depth))
+
+        def insert(cursor):
+            cursor.execute("INSERT OR IGNORE INTO queue (key, value) VALUES ('root', ?)", (root,))
+            before = cursor.execute("SELECT COUNT(*) FROM shards").fetchone()[0]
+            cursor.executemany("INSERT OR IGNORE INTO shards (path, recursive, state) VALUES (?, ?, ?)",
+                               [(path, int(recursive), SHARD_PENDING) for path, recursive in shards])
+            return cursor.execute("SELECT COUNT(*) FROM shards").fetchone()[0] - before
+        return self.transaction(insert)
+
+    def acquire(self, worker):
+        """
+        Prend un bail sur le prochain lot en attente ou dont le bail a expiré. Un lot dont le bail expire
+        pour la `max_attempts`-ième fois est marqué en échec, comme un lot rendu par `release`.
+
+        Returns:
+            tuple: (chemin, récursif, jeton du bail), ou None s'il ne reste aucun lot disponible.
+        """
+        def lease(cursor):
+            now = time.time()
+            # Un lot dont le bail a expiré après `max_attempts` tentatives n'est plus redistribué
+            cursor.execute(
+                "UPDATE shards SET state = ?, lease_token = NULL, lease_expires = NULL, finished_at = ?, error = ? "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (SHARD_FAILED, now, "bail expiré", SHARD_LEASED, now, self.max_attempts))
+            row = cursor.execute(
+                "SELECT path, recursive FROM shards WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                "ORDER BY attempts, path LIMIT 1", (SHARD_PENDING, SHARD_LEASED, now)).fetchone()
+            if row is None:
+                return None
+            token = uuid.uuid4().hex
+            cursor.execute(
+                "UPDATE shards SET state = ?, worker = ?, lease_token = ?, lease_expires = ?, attempts = attempts + 1, "
+                "started_at = ?, finished_at = NULL, error = NULL WHERE path = ?",
+                (SHARD_LEASED, worker, token, now + self.lease, now, row[0]))
+            return row[0], bool(row[1]), token
+        return self.transaction(lease)
+
+    def heartbeat(self, path, token):
+        """
+        Renouvelle un bail.
+
+        Returns:
+            bool: False si le bail a été perdu (expiré et repris par un autre travailleur).
+        """
+        def renew(cursor):
+            return cursor.execute(
+                "UPDATE shards SET lease_expires = ? WHERE path = ? AND lease_token = ? AND state = ?",
+                (time.time() + self.lease, path, token, SHARD_LEASED)).rowcount == 1
+        return self.transaction(renew)
+
+    def complete(self, path, token, groups=0, files_renamed=0):
+        """
+        Marque un lot comme terminé, si le bail est toujours détenu.
+
+        Returns:
+            bool: False si le bail avait été perdu.
+        """
+        def finish(cursor):
+            return cursor.execute(
+                "UPDATE shards SET state = ?, lease_token = NULL, lease_expires = NULL, finished_at = ?, groups = ?, "
+                "files_renamed = ? WHERE path = ? AND lease_token = ?",
+                (SHARD_DONE, time.time(), groups, files_renamed, path, token)).rowcount == 1
+        return self.transaction(finish)
+
+    def release(self, path, token, error):
+        """
+        Rend un lot en échec : il est remis en file, ou marqué en échec après `max_attempts` tentatives.
+        """
+        def give_back(cursor):
+            cursor.execute(
+                "UPDATE shards SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, lease_token = NULL, "
+                "lease_expires = NULL, finished_at = ?, error = ? WHERE path = ? AND lease_token = ?",
+                (self.max_attempts, SHARD_FAILED, SHARD_PENDING, time.time(), str(error), path, token))
+        self.transaction(give_back)
+
+    def requeue_failed(self):
+        """
+        Remet en file les lots en échec, avec un compteur de tentatives remis à zéro.
+
+        Returns:
+            int: Le nombre de lots remis en file.
+        """
+        return self.transaction(lambda cursor: cursor.execute(
+            "UPDATE shards SET state = ?, attempts = 0 WHERE state = ?", (SHARD_PENDING, SHARD_FAILED)).rowcount)
+
+    def status(self):
+        """
+        Retourne l'état de chaque lot, dans l'ordre des chemins.
+
+        Returns:
+            list: Des tuples (chemin, état, travailleur, tentatives, groupes, fichiers renommés, durée, erreur).
+        """
+        now = time.time()
+        rows = []
+        for path, state, worker, attempts, groups, renamed, started, finished, expires, error in self.execute(
+                "SELECT path, state, worker, attempts, groups, files_renamed, started_at, finished_at, lease_expires, "
+                "error FROM shards ORDER BY path"):
+            if state == SHARD_LEASED and expires is not None and expires < now:
+                state = 'expired'
+            duration = (finished or now) - started if started is not None else None
+            rows.append((path, state, worker, attempts, groups, renamed, duration, error))
+        return rows
+
+    def report(self):
+        """
+        Retourne la vue d'avancement de la file : une ligne par lot puis les totaux par état.
+        """
+        rows = self.status()
+        root = self.root or ''
+        lines = [f"{'Lot':<40}{'état':>10}{'essais':>8}{'groupes':>9}{'renommés':>10}{'durée (s)':>11}  travailleur"]
+        counts = {}
+        for path, state, worker, attempts, groups, renamed, duration, error in rows:
+            counts[state] = counts.get(state, 0) + 1
+            name = os.path.relpath(path, root) if root else path
+            duration = f"{duration:.1f}" if duration is not None else '-'
+            line = f"{name:<40}{state:>10}{attempts:>8}{groups:>9}{renamed:>10}{duration:>11}  {worker or '-'}"
+            lines.append(line + (f"  ({error})" if error else ""))
+        lines.append(f"{len(rows)} lot(s) : " + ", ".join(f"{count} {state}" for state, count in sorted(counts.items())))
+        return "\n".join(lines)
+
+    def close(self):
+        self.connection.close()
+
+
+class LeaseLost(threading.Event):
+    """
+    Événement positionné lorsque le bail d'un lot est perdu. Il l'est aussi dès que `deadline` est dépassée :
+    faute de renouvellement réussi à temps, le bail peut avoir expiré et le lot être repris par un autre travailleur.
+    """
+
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+
+    def is_set(self):
+        if not super().is_set() and time.time() > self.deadline:
+            self.set()
+        return super().is_set()
+
+
+class LeaseKeeper:
+    """
+    Renouvelle le bail d'un lot dans un thread tant qu'il est traité. Si le bail est perdu, ou s'il n'a pas pu
+    être renouvelé depuis deux tiers de sa durée, l'événement `lost` est positionné pour que le traitement du lot
+    s'arrête avant le groupe suivant.
+    """
+
+    def __init__(self, queue, path, token):
+        self.queue = queue
+        self.path = path
+        self.token = token
+        self.lost = LeaseLost(time.time() + queue.lease * 2 / 3)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="lease", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def run(self):
+        while not self._stop.wait(self.queue.lease / 3):
+            start = time.time()
+            try:
+                renewed = self.queue.heartbeat(self.path, self.token)
+            except sqlite3.Error as e:
+                print(f"Impossible de renouveler le bail du lot {self.path} : {e}")
+                continue
+            if not renewed:
+                print(f"Bail perdu sur le lot {self.path}, traitement interrompu.")
+                self.lost.set()
+                return
+            self.lost.deadline = start + self.queue.lease * 2 / 3
+
+
+def run_worker(queue, context, process_shard, worker=None, idle_exit=True, poll_interval=5.0):
+    """
+    Boucle d'un travailleur : prend un lot, le traite sous bail renouvelé, le marque terminé ou le remet en file,
+    jusqu'à épuisement de la file (ou indéfiniment si `idle_exit` est False).
+
+    Args:
+        queue (WorkQueue): La file partagée.
+        context (RunContext): Le contexte d'exécution, commun à tous les lots du travailleur.
+        process_shard (callable): Appelée avec (chemin, récursif, contexte) pour traiter un lot.
+        worker (str, optional): L'identifiant du travailleur.
+
+    Returns:
+        int: Le nombre de lots traités par ce travailleur.
+    """
+    worker = worker or new_worker_id()
+    metrics = get_metrics()
+    processed = 0
+    while True:
+        shard = queue.acquire(worker)
+        if shard is None:
+            if idle_exit:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        path, recursive, token = shard
+        print(f"[{worker}] Lot {path}")
+        groups_before = metrics.counters.get('groups', 0)
+        renamed_before = metrics.counters.get('files_renamed', 0)
+        with LeaseKeeper(queue, path, token) as keeper:
+            context.stop = keeper.lost
+            try:
+                process_shard(path, recursive, context)
+            except KeyboardInterrupt:
+                queue.release(path, token, "interrompu")
+                raise
+            except Exception as e:
+                metrics.error(f"shard:{type(e).__name__}")
+                print(f"Échec du lot {path} : {e}")
+                queue.release(path, token, e)
+                continue
+            finally:
+                context.stop = None
+        if keeper.lost.is_set():
+            print(f"Bail perdu ou non renouvelé sur le lot {path}, lot laissé au travailleur suivant.")
+            continue
+        queue.complete(path, token, metrics.counters.get('groups', 0) - groups_before,
+                       metrics.counters.get('files_renamed', 0) - renamed_before)
+        processed += 1